@@ -52,7 +52,7 @@ from blinker import signal
 from . import __version__
 from .plugin_categories import Command
 from .nikola import Nikola
-from .utils import sys_decode, sys_encode, get_root_dir, req_missing, LOGGER, STRICT_HANDLER, STDERR_HANDLER, ColorfulStderrHandler
+from .utils import config_json_memo, sys_decode, sys_encode, get_root_dir, req_missing, LOGGER, STRICT_HANDLER, STDERR_HANDLER, ColorfulStderrHandler
 
 if sys.version_info[0] == 3:
     import importlib.machinery
@@ -259,9 +259,14 @@ class NikolaTaskLoader(TaskLoader):
         """Initialize the loader."""
         self.nikola = nikola
         self.quiet = quiet
+        self.initialized = False
 
     def load_tasks(self, cmd, opt_values, pos_args):
-        """Load Nikola tasks."""
+        """Load Nikola tasks.
+
+        Tasks can be loaded again (nikola auto does on rebuilds), but the
+        initialized signal is sent only the first time.
+        """
         if self.quiet:
             DOIT_CONFIG = {
                 'verbosity': 0,
@@ -274,13 +279,16 @@ class NikolaTaskLoader(TaskLoader):
             }
         DOIT_CONFIG['default_tasks'] = ['render_site', 'post_render']
         DOIT_CONFIG.update(self.nikola._doit_config)
-        tasks = generate_tasks(
-            'render_site',
-            self.nikola.gen_tasks('render_site', "Task", 'Group of tasks to render the site.'))
-        latetasks = generate_tasks(
-            'post_render',
-            self.nikola.gen_tasks('post_render', "LateTask", 'Group of tasks to be executed after site is rendered.'))
-        signal('initialized').send(self.nikola)
+        with config_json_memo():
+            tasks = generate_tasks(
+                'render_site',
+                self.nikola.gen_tasks('render_site', "Task", 'Group of tasks to render the site.'))
+            latetasks = generate_tasks(
+                'post_render',
+                self.nikola.gen_tasks('post_render', "LateTask", 'Group of tasks to be executed after site is rendered.'))
+        if not self.initialized:
+            self.initialized = True
+            signal('initialized').send(self.nikola)
         return tasks + latetasks, DOIT_CONFIG
 
 
@@ -360,7 +368,11 @@ class DoitNikola(DoitMain):
                 LOGGER.error("This command needs to run inside an "
                              "existing Nikola site.")
                 return 3
-        return super(DoitNikola, self).run(cmd_args)
+        result = super(DoitNikola, self).run(cmd_args)
+        cache_info = self.nikola.url_replacer_cache_info()
+        if cache_info['hits'] + cache_info['misses']:
+            LOGGER.debug('url_replacer cache: {hits} hits, {misses} misses, {hit_rate:.0%} hit rate'.format(**cache_info))
+        return result
 
     @staticmethod
     def print_version():
@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+
+# Copyright © 2012-2015 Roberto Alsina and others.
+
+# Permission is hereby granted, free of charge, to any
+# person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the
+# Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the
+# Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+# PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS
+# OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Compile post fragments in a pool of worker processes."""
+
+from __future__ import unicode_literals
+import atexit
+import io
+import os
+import shutil
+import tempfile
+import time
+
+from nikola import utils
+
+# Number of fragments sent to a worker process at once
+BATCH_SIZE = 8
+
+# Site used by worker processes (inherited when they are forked)
+_worker_site = None
+
+
+def compile_fragment(compiler, source, dest, is_two_file=True):
+    """Compile a post with a page compiler, without writing ``dest``.
+
+    The compiler writes into a temporary folder.  Returns the files it
+    wrote there (a dict of bytes, by path relative to the folder of
+    ``dest``, including the fragment), the dependencies it wrote into a
+    ``.dep`` file (or None) and the time compiling took.
+    """
+    tmpdir = tempfile.mkdtemp(prefix='nikola-compile-')
+    try:
+        tmp_dest = os.path.join(tmpdir, os.path.basename(dest))
+        start = time.time()
+        compiler.compile_html(source, tmp_dest, is_two_file)
+        elapsed = time.time() - start
+        deps = None
+        if os.path.isfile(tmp_dest + '.dep'):
+            with io.open(tmp_dest + '.dep', 'r', encoding='utf8') as inf:
+                deps = [p for p in inf.read().split('\n') if p and p != tmp_dest]
+            os.unlink(tmp_dest + '.dep')
+            # Files written next to the fragment will be in the folder of dest
+            dest_dir = os.path.dirname(dest)
+            deps = [os.path.join(dest_dir, os.path.relpath(p, tmpdir))
+                    if p.startswith(tmpdir + os.sep) else p for p in deps]
+        # Compilers may write more files than the fragment (images, for example)
+        files = {}
+        for root, _, names in os.walk(tmpdir):
+            for name in names:
+                path = os.path.join(root, name)
+                with open(path, 'rb') as inf:
+                    files[os.path.relpath(path, tmpdir)] = inf.read()
+        return files, deps, elapsed
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def _compile_batch(jobs):
+    """Compile a batch of fragments in a worker process.
+
+    A post that cannot be compiled gets None; the main process then
+    compiles it again, so errors are reported as usual.
+    """
+    results = []
+    for base_path, source, dest, is_two_file, lang in jobs:
+        try:
+            utils.LocaleBorg().set_locale(lang)
+            compiler = _worker_site.get_compiler(base_path)
+            results.append(compile_fragment(compiler, source, dest, is_two_file))
+        except (Exception, SystemExit):
+            results.append(None)
+    return results
+
+
+class CompilePipeline(object):
+    """Compile the fragments of a list of ``render_posts`` tasks in worker processes.
+
+    Jobs are added in the order of their tasks when tasks are generated.
+    When a task asks for its fragment, its job and the next jobs that look
+    out of date are sent to a process pool, in batches, so fragments are
+    compiled ahead of the tasks that need them.  The pool is forked from
+    the site, so compilers and their libraries are already loaded.  Files
+    are only written when their own task runs.
+
+    With one process (or outside POSIX systems), posts are compiled by
+    their tasks, as usual.
+
+    Compilers that convert posts faster in batches can have a
+    ``prefetch_posts(jobs)`` method.  When the first task asks for its
+    fragment, it gets the ``(post, lang)`` pairs of all their jobs, to
+    convert those that need it ahead (into a cache, for example).
+    """
+
+    def __init__(self, site, processes=1, logger=utils.LOGGER):
+        """Create a pipeline for a site."""
+        self.site = site
+        self.processes = processes
+        self.logger = logger
+        self.jobs = {}
+        self._index = {}
+        self._order = []
+        self._next = 0
+        self._pending = {}
+        self._results = {}
+        self._pool = None
+        self._prefetch_all = False
+        self._stats = {}
+        self._started = None
+        self._atexit_registered = False
+        self._prefetched_compilers = False
+
+    def add(self, post, lang, file_dep):
+        """Add the job of a task compiling ``post`` in ``lang``, depending on the ``file_dep`` files."""
+        dest = post.translated_base_path(lang)
+        if dest not in self.jobs:
+            self._index[dest] = len(self._order)
+            self._order.append(dest)
+        self.jobs[dest] = (post, lang, list(file_dep))
+
+    def compile(self, post, lang):
+        """Compile a post fragment, like ``Post.compile``."""
+        dest = post.translated_base_path(lang)
+        if not self._prefetched_compilers:
+            self._prefetched_compilers = True
+            self._prefetch_compilers()
+        result = None
+        if self.processes > 1 and dest in self.jobs:
+            result = self._get_result(dest)
+        try:
+            if result is None:
+                post.compile(lang)
+            else:
+                post.compile(lang, lambda source, dest, is_two_file: self._write(dest, *result))
+        finally:
+            if self._pool is not None and not self._pending and self._next >= len(self._order):
+                self.close()
+
+    def close(self):
+        """Stop the worker processes, and report how fast each compiler was."""
+        global _worker_site
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+        _worker_site = None
+        self._pending = {}
+        if self._stats:
+            elapsed = time.time() - self._started
+            self.logger.info("Compiled {0} fragments in {1:.1f} s with {2} processes".format(
+                sum(count for count, _ in self._stats.values()), elapsed, self.processes))
+            for name, (count, busy) in sorted(self._stats.items()):
+                self.logger.info("  {0}: {1} fragments, {2:.1f} per second and process".format(
+                    name, count, count / busy if busy else float(count)))
+            self._stats = {}
+            self._started = None
+
+    def _prefetch_compilers(self):
+        """Let compilers with a ``prefetch_posts`` method convert their posts ahead."""
+        jobs = {}
+        for dest in self._order:
+            post, lang, _ = self.jobs[dest]
+            if getattr(post.compiler, 'prefetch_posts', None) is not None:
+                jobs.setdefault(post.compiler, []).append((post, lang))
+        for compiler, compiler_jobs in jobs.items():
+            compiler.prefetch_posts(compiler_jobs)
+
+    def _write(self, dest, files, deps, elapsed):
+        """Write the files of a fragment compiled by a worker, and its ``.dep`` file."""
+        dest_dir = os.path.dirname(dest)
+        for name, data in files.items():
+            path = os.path.join(dest_dir, name)
+            utils.makedirs(os.path.dirname(path))
+            with open(path, 'wb') as outf:
+                outf.write(data)
+        deps_path = dest + '.dep'
+        if deps:
+            with io.open(deps_path, 'w+', encoding='utf8') as deps_file:
+                deps_file.write('\n'.join(p for p in deps if p != dest))
+        elif os.path.isfile(deps_path):
+            os.unlink(deps_path)
+        return True
+
+    def _get_result(self, dest):
+        """Get the compiled fragment of a job, waiting for it if needed.
+
+        Returns None if it has to be compiled in this process.
+        """
+        if dest not in self._pending and dest not in self._results:
+            if not self._looks_stale(dest):
+                # Tasks run even if their files look fine (configuration
+                # changes, for example): compile everything ahead.
+                self._prefetch_all = True
+            self._submit([dest])
+        self._prefetch(dest)
+        if dest in self._pending:
+            async_result, batch = self._pending[dest]
+            for done, result in zip(batch, async_result.get()):
+                self._pending.pop(done, None)
+                self._results[done] = result
+                if result is not None:
+                    name = self.jobs[done][0].compiler.name
+                    count, busy = self._stats.get(name, (0, 0.0))
+                    self._stats[name] = (count + 1, busy + result[2])
+        return self._results.pop(dest, None)
+
+    def _looks_stale(self, dest):
+        """Tell if a fragment is missing or older than a file it depends on."""
+        if not os.path.exists(dest):
+            return True
+        dest_mtime = os.stat(dest).st_mtime
+        return any(os.path.exists(dep) and os.stat(dep).st_mtime > dest_mtime
+                   for dep in self.jobs[dest][2])
+
+    def _submit(self, dests):
+        """Start compiling the fragments of some jobs in a worker process."""
+        global _worker_site
+        if self._pool is None:
+            _worker_site = self.site
+            try:
+                self._pool = utils.fork_pool(self.processes)
+            except Exception as e:
+                self.logger.warn("Cannot compile posts in parallel: {0}".format(e))
+            if self._pool is None:
+                self.processes = 1
+                _worker_site = None
+                return
+            if self._started is None:
+                self._started = time.time()
+            if not self._atexit_registered:
+                # Workers are stopped even if the build ends early
+                atexit.register(self.close)
+                self._atexit_registered = True
+        jobs = []
+        for dest in dests:
+            post, lang, _ = self.jobs[dest]
+            jobs.append((post.source_path, post.translated_source_path(lang), dest, post.is_two_file, lang))
+        async_result = self._pool.apply_async(_compile_batch, (jobs,))
+        for dest in dests:
+            self._pending[dest] = (async_result, dests)
+
+    def _prefetch(self, dest):
+        """Send the jobs following ``dest`` to the pool, a batch at a time."""
+        if self._pool is None:
+            return
+        window = self.processes * BATCH_SIZE * 2
+        self._next = max(self._next, self._index[dest] + 1)
+        batch = []
+        while self._next < len(self._order) and len(self._pending) + len(batch) < window:
+            next_dest = self._order[self._next]
+            self._next += 1
+            if next_dest in self._pending or next_dest in self._results:
+                continue
+            if self._prefetch_all or self._looks_stale(next_dest):
+                batch.append(next_dest)
+                if len(batch) == BATCH_SIZE:
+                    self._submit(batch)
+                    batch = []
+        if batch:
+            self._submit(batch)
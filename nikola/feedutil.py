@@ -27,7 +27,9 @@
 """Utility functions for feed"""
 
 from __future__ import unicode_literals
+import copy
 import os
+import re
 import sys
 try:
     from urlparse import urljoin
@@ -42,6 +44,7 @@ import lxml.html
 from lxml.html import fragment_fromstring
 import lxml.etree
 import html5lib
+from feedgen.entry import FeedEntry
 from feedgen.feed import FeedGenerator
 from .image_processing import ImageProcessor
 
@@ -50,32 +53,100 @@ from . import utils
 
 xml_dec_line = '<?xml version="1.0" encoding="utf-8"?>\n'
 xsl_line = '<?xml-stylesheet type="text/xsl" href="{0}" media="all"?>\n'
+# The XML declaration of feeds serialized by feedgen (replaced by xml_dec_line)
+xml_dec_re = re.compile(r'^\s*<\?xml[^>]*\?>\s*')
+
 
 class FeedUtil(object):
 
     """The utility class for feed."""
 
-    def __init__(self, site):
-        """Setup."""
+    def __init__(self, site, item_cache_size=5000):
+        """Setup, keeping at most ``item_cache_size`` rendered feed items in memory."""
         self.site = site
-
-    def atom_renderer(self, fg, output_path, atom_path, xsl_stylesheet_href):
-        """Render a Atom file."""
+        self._item_cache = utils.LRUCache(item_cache_size)
+        self.clear_cache()
+
+    def clear_cache(self):
+        """Forget the rendered feed items."""
+        self._item_cache.clear()
+        self._preview_image_cache = {}
+
+    def atom_renderer(self, fg, output_path, atom_path, xsl_stylesheet_href,
+                      entries=()):
+        """Render a Atom file.
+
+        ``fg`` has no entries; ``entries`` are feed entries (see
+        ``_write_feed``), written one by one to the file.
+        """
+        self._write_feed(fg.atom_str(pretty=True), None, output_path,
+                         xsl_stylesheet_href, entries)
+
+    def rss_renderer(self, fg, output_path, rss_path, xsl_stylesheet_href,
+                     entries=()):
+        """Render a RSS file.
+
+        ``fg`` has no entries; ``entries`` are feed items (see
+        ``_write_feed``), written one by one to the file.
+        """
+        self._write_feed(fg.rss_str(pretty=True), 'channel', output_path,
+                         xsl_stylesheet_href, entries)
+
+    def _write_feed(self, feed, parent_path, output_path, xsl_stylesheet_href,
+                    entries):
+        """Write a feed, adding the entries at the end of an element.
+
+        ``feed`` is a feed without entries, as serialized by feedgen (text
+        or UTF-8 bytes), and ``parent_path`` the path of the element the
+        entries belong to (None for the root).  ``entries`` are pairs of
+        an entry element and a dict where its serializations are kept.
+        Entries are serialized like feedgen does when they are part of the
+        feed, so the output is the same as the whole feed's.
+        """
+        if isinstance(feed, bytes):
+            feed = feed.decode('utf-8')
+        feed = xml_dec_re.sub('', feed, count=1)
+        root = lxml.etree.fromstring(feed.encode('utf-8'))
+        parent = root if parent_path is None else root.find(parent_path)
+        if parent is not None:
+            closing_tags = list(re.finditer(r'</(?:[^\s<>:]+:)?{0}\s*>'.format(
+                re.escape(lxml.etree.QName(parent).localname)), feed))
+        if parent is None or not closing_tags:
+            raise ValueError('Cannot find where entries go in {0}'.format(output_path))
+        # Entries go on their own lines, before the closing tag
+        split = closing_tags[-1].start()
+        line_start = feed.rfind('\n', 0, split) + 1
+        if not feed[line_start:split].strip():
+            split = line_start
+        head, tail = feed[:split], feed[split:]
+
+        depth = len(list(parent.iterancestors())) + 1
+        # Entries are serialized once for each kind of parent
+        context = repr((parent.tag, depth, sorted(parent.nsmap.items(), key=repr)))
         dst_dir = os.path.dirname(output_path)
         utils.makedirs(dst_dir)
-        with io.open(output_path, 'w+', encoding='utf-8') as atom_file:
-            atom_file.write(xml_dec_line)
-            atom_file.write(xsl_line.format(xsl_stylesheet_href))
-            atom_file.write(fg.atom_str(pretty=True))
-
-    def rss_renderer(self, fg, output_path, rss_path, xsl_stylesheet_href):
-        """Render a RSS file."""
-        dst_dir = os.path.dirname(output_path)
-        utils.makedirs(dst_dir)
-        with io.open(output_path, 'w+', encoding='utf-8') as rss_file:
-            rss_file.write(xml_dec_line)
-            rss_file.write(xsl_line.format(xsl_stylesheet_href))
-            rss_file.write(fg.rss_str(pretty=True))
+        with io.open(output_path, 'w+', encoding='utf-8') as feed_file:
+            feed_file.write(xml_dec_line)
+            feed_file.write(xsl_line.format(xsl_stylesheet_href))
+            feed_file.write(head)
+            for element, serialized in entries:
+                if context not in serialized:
+                    serialized[context] = self._entry_str(element, parent, depth)
+                feed_file.write(serialized[context])
+            feed_file.write(tail)
+
+    def _entry_str(self, element, parent, depth):
+        """Serialize a feed entry as a child of parent, which is at depth - 1 in its feed."""
+        # Wrapped in elements declaring the same namespaces and
+        # indented the same way as in the feed
+        inner = wrapper = lxml.etree.Element(parent.tag, nsmap=parent.nsmap)
+        for _ in range(depth - 1):
+            outer = lxml.etree.Element('wrapper')
+            outer.append(wrapper)
+            wrapper = outer
+        inner.append(copy.deepcopy(element))
+        lines = lxml.etree.tostring(wrapper, encoding='unicode', pretty_print=True).split('\n')
+        return '\n'.join(lines[depth:-depth - 1]) + '\n'
 
     def _tzdatetime(self, dt):
         """Get a datetime for feed."""
@@ -110,14 +181,7 @@ class FeedUtil(object):
                       enclosure_details[2].split('/')[0] == 'image'):
                     src = enclosure_details[0]
                 else:
-                    postdoc = html5lib.html5parser.parse(post.text(lang),
-                                                         treebuilder='lxml',
-                                                         namespaceHTMLElements=False)
-                    found = postdoc.xpath('//img')
-                    for img in found:
-                        src = img.attrib.get('src')
-                        if src:
-                            break
+                    src = self._first_image(post, lang)
                     if src is None and default_image:
                         src = default_image
                 if src is not None and src not in data:
@@ -142,6 +206,21 @@ class FeedUtil(object):
                 raise(e)
         return data
 
+    def _first_image(self, post, lang):
+        """Return the source of the first image in a post, or None."""
+        key = (post, lang, self._source_stamp(post, lang))
+        if key not in self._preview_image_cache:
+            src = None
+            postdoc = html5lib.html5parser.parse(post.text(lang),
+                                                 treebuilder='lxml',
+                                                 namespaceHTMLElements=False)
+            for img in postdoc.xpath('//img'):
+                src = img.attrib.get('src')
+                if src:
+                    break
+            self._preview_image_cache[key] = src
+        return self._preview_image_cache[key]
+
     def gen_urn(self, path):
         """Create a URN string."""
         if sys.version_info[0] == 3:
@@ -162,11 +241,7 @@ class FeedUtil(object):
         base_url = config["BASE_URL"]
         feed_links_append_query = config["FEED_LINKS_APPEND_QUERY"]
         blog_author = config["BLOG_AUTHOR"](lang)
-        feed_plain = config["FEED_PLAIN"]
-        feed_teasers = config["FEED_TEASERS"]
         feed_push = config["FEED_PUSH"]
-        feed_previewimage = config["FEED_PREVIEWIMAGE"]
-        feed_previewimage_default = config["FEED_PREVIEWIMAGE_DEFAULT"]
 
         fg = FeedGenerator()
         fg.load_extension('dc', atom=False,rss=True)
@@ -265,108 +340,167 @@ class FeedUtil(object):
             if len(rss_links):
                 fg.rss_atom_link(rss_links)
 
+        atom_entries = []
+        rss_entries = []
+        media_loaded = False
         for post in timeline:
-            entry_date = self._tzdatetime(post.date)
-            entry_updated = self._tzdatetime(post.updated)
+            item = self._feed_item(post, lang,
+                                   atom_append_query if atom_output_name else False,
+                                   rss_append_query if rss_output_name else False)
+            if item['media'] and not media_loaded:
+                fg.load_extension('media', atom=True, rss=True)
+                media_loaded = True
+            if atom_output_name:
+                atom_entries.append(item['atom'])
+            if rss_output_name:
+                rss_entries.append(item['rss'])
+
+        if atom_output_name:
+            self.atom_renderer(fg, atom_output_name, atom_path,
+                               self.site.url_replacer(atom_path,
+                                                      "/assets/xml/atom.xsl"),
+                               atom_entries)
+        if rss_output_name:
+            self.rss_renderer(fg, rss_output_name, rss_path,
+                              self.site.url_replacer(rss_path,
+                                                     "/assets/xml/rss.xsl"),
+                              rss_entries)
 
-            entry_id = self.gen_urn(post.permalink(lang, absolute=True))
+    def _feed_item(self, post, lang, atom_append_query, rss_append_query):
+        """Return the Atom and RSS entries of a post.
 
-            fe = fg.add_entry()
-            fe.id(entry_id)
-            fe.title(title=post.title(lang), type='text', cdata=False)
-            fe.updated(entry_updated)
-            fe.published(entry_date)
-            if post.author(lang):
-                fe.author({'name': post.author(lang)})
-            if post.description(lang):
-                fe.summary(summary=post.description(lang), type=None,
-                           cdata=False)
-            categories = set([])
-            if post.meta('category'):
-                categories.add(post.meta('category'))
-            tags = set(post._tags.get(lang, []))
-            categories.update(tags)
-            if len(categories):
-                fe.category([{'term': x} for x in categories])
-
-            # enclosure callback returns None if post has no enclosure, or a
-            # 3-tuple of (url, length (0 is valid), mimetype)
-            enclosure_details = self._enclosure(post=post, lang=lang)
-            if enclosure_details is not None:
-                feed_enclosure = config["FEED_ENCLOSURE"]
-                if feed_enclosure == 'link':
-                    fe.link([{
-                        'href': enclosure_details[0],
-                        'length': enclosure_details[1],
-                        'type': enclosure_details[2],
-                        'rel': 'enclosure'
-                    }])
-                elif feed_enclosure == 'media':
-                    fg.load_extension('media', atom=True, rss=True)
-                    fe.media.thumbnail([{
-                        'url': enclosure_details[0],
-                    }])
-            if feed_previewimage:
-                if 'previewimage' in post.meta[lang]:
-                    preview_image = post.meta[lang]['previewimage']
-                else:
-                    preview_image = None
-                default_image = feed_previewimage_default
+        Items are rendered once and shared by all the feeds the post
+        appears in.  An append query of False means there is no feed of
+        that type.
+        """
+        config = self.site.config
+        key = (post, lang, self._source_stamp(post, lang), atom_append_query, rss_append_query,
+               config["FEED_PLAIN"], config["FEED_TEASERS"],
+               config["FEED_PREVIEWIMAGE"], config["FEED_PREVIEWIMAGE_DEFAULT"],
+               config["FEED_ENCLOSURE"])
+        item = self._item_cache.get(key)
+        if item is None:
+            fe = self._feed_entry(post, lang, atom_append_query, rss_append_query)
+            item = {
+                'atom': (fe.atom_entry(), {}) if atom_append_query is not False else None,
+                'rss': (fe.rss_entry(), {}) if rss_append_query is not False else None,
+                'media': (config["FEED_ENCLOSURE"] == 'media' and
+                          self._enclosure(post=post, lang=lang) is not None),
+            }
+            self._item_cache[key] = item
+        return item
+
+    def _source_stamp(self, post, lang):
+        """Return the modification time and size of a post's source, to notice edits."""
+        try:
+            st = os.stat(post._translated_file_path(lang))
+        except OSError:
+            return None
+        return (st.st_mtime, st.st_size)
+
+    def _feed_entry(self, post, lang, atom_append_query, rss_append_query):
+        """Create the feed entry of a post."""
+        config = self.site.config
+        feed_plain = config["FEED_PLAIN"]
+        feed_teasers = config["FEED_TEASERS"]
+        feed_previewimage = config["FEED_PREVIEWIMAGE"]
+        feed_previewimage_default = config["FEED_PREVIEWIMAGE_DEFAULT"]
+
+        entry_date = self._tzdatetime(post.date)
+        entry_updated = self._tzdatetime(post.updated)
+
+        entry_id = self.gen_urn(post.permalink(lang, absolute=True))
+
+        fe = FeedEntry()
+        fe.load_extension('dc', atom=False, rss=True)
+        fe.id(entry_id)
+        fe.title(title=post.title(lang), type='text', cdata=False)
+        fe.updated(entry_updated)
+        fe.published(entry_date)
+        if post.author(lang):
+            fe.author({'name': post.author(lang)})
+        if post.description(lang):
+            fe.summary(summary=post.description(lang), type=None,
+                       cdata=False)
+        categories = set([])
+        if post.meta('category'):
+            categories.add(post.meta('category'))
+        tags = set(post._tags.get(lang, []))
+        categories.update(tags)
+        if len(categories):
+            fe.category([{'term': x} for x in categories])
+
+        # enclosure callback returns None if post has no enclosure, or a
+        # 3-tuple of (url, length (0 is valid), mimetype)
+        enclosure_details = self._enclosure(post=post, lang=lang)
+        if enclosure_details is not None:
+            feed_enclosure = config["FEED_ENCLOSURE"]
+            if feed_enclosure == 'link':
+                fe.link([{
+                    'href': enclosure_details[0],
+                    'length': enclosure_details[1],
+                    'type': enclosure_details[2],
+                    'rel': 'enclosure'
+                }])
+            elif feed_enclosure == 'media':
+                fe.load_extension('media', atom=True, rss=True)
+                fe.media.thumbnail([{
+                    'url': enclosure_details[0],
+                }])
+        if feed_previewimage:
+            if 'previewimage' in post.meta[lang]:
+                preview_image = post.meta[lang]['previewimage']
             else:
                 preview_image = None
-                default_image = None
+            default_image = feed_previewimage_default
+        else:
+            preview_image = None
+            default_image = None
 
-            if atom_output_name:
-                fe.link([{'href': post.permalink(
-                    lang, absolute=True, query=atom_append_query),
-                          'rel': 'alternate'}])
+        contents = {}
 
+        def content(append_query):
+            """Get the feed content of the post, once per append query."""
+            if append_query not in contents:
                 data = post.text(
                     lang, teaser_only=feed_teasers,
                     strip_html=feed_plain,
                     feed_read_more_link=True,
-                    feed_links_append_query=atom_append_query)
-                if data:
-                    # Massage the post's HTML (unless plain)
-                    if feed_plain:
-                        fe.content(content=data, src=None, type='text',
-                                   cdata=False)
-                    else:
-                        data = self.get_feed_content(data, lang, post,
-                                                     enclosure_details,
-                                                     preview_image,
-                                                     default_image)
-                        fe.content(content=data, src=None, type='html',
-                                   cdata=True)
+                    feed_links_append_query=append_query)
+                # Massage the post's HTML (unless plain)
+                if data and not feed_plain:
+                    data = self.get_feed_content(data, lang, post,
+                                                 enclosure_details,
+                                                 preview_image,
+                                                 default_image)
+                contents[append_query] = data
+            return contents[append_query]
+
+        if atom_append_query is not False:
+            fe.link([{'href': post.permalink(
+                lang, absolute=True, query=atom_append_query),
+                      'rel': 'alternate'}])
+
+            data = content(atom_append_query)
+            if data:
+                if feed_plain:
+                    fe.content(content=data, src=None, type='text',
+                               cdata=False)
+                else:
+                    fe.content(content=data, src=None, type='html',
+                               cdata=True)
 
-            if rss_output_name:
-                fe.rss_link(post.permalink(
-                    lang, absolute=True, query=rss_append_query))
+        if rss_append_query is not False:
+            fe.rss_link(post.permalink(
+                lang, absolute=True, query=rss_append_query))
 
-                data = post.text(
-                    lang, teaser_only=feed_teasers,
-                    strip_html=feed_plain,
-                    feed_read_more_link=True,
-                    feed_links_append_query=rss_append_query)
-                if data:
-                    # Massage the post's HTML (unless plain)
-                    if feed_plain:
-                        fe.rss_content(content=data, cdata=False)
-                    else:
-                        data = self.get_feed_content(data, lang, post,
-                                                     enclosure_details,
-                                                     preview_image,
-                                                     default_image)
-                        fe.rss_content(content=data, cdata=True)
-
-        if atom_output_name:
-            self.atom_renderer(fg, atom_output_name, atom_path,
-                               self.site.url_replacer(atom_path,
-                                                      "/assets/xml/atom.xsl"))
-        if rss_output_name:
-            self.rss_renderer(fg, rss_output_name, rss_path,
-                              self.site.url_replacer(rss_path,
-                                                     "/assets/xml/rss.xsl"))
+            data = content(rss_append_query)
+            if data:
+                if feed_plain:
+                    fe.rss_content(content=data, cdata=False)
+                else:
+                    fe.rss_content(content=data, cdata=True)
+        return fe
 
     def gallery_feed_generator(self, lang,
                                img_list, dest_img_list, img_titles,
@@ -451,13 +585,19 @@ class FeedUtil(object):
             if len(rss_links):
                 fg.rss_atom_link(rss_links)
 
+        atom_entries = []
+        rss_entries = []
+        feed_enclosure = config["FEED_ENCLOSURE"]
+        if feed_enclosure is not None and feed_enclosure == 'media':
+            fg.load_extension('media', atom=True, rss=True)
         for img, srcimg, imgtitle in zip(dest_img_list, img_list, img_titles):
             entry_date = self._tzdatetime(image_processor.image_date(srcimg))
 
             img_url = urljoin(self.site.config['BASE_URL'], img.lstrip('/'))
 
             entry_id = self.gen_urn(img_url)
-            fe = fg.add_entry()
+            fe = FeedEntry()
+            fe.load_extension('dc', atom=False, rss=True)
             fe.id(entry_id)
             fe.title(title=imgtitle, type='text', cdata=False)
             fe.updated(entry_date)
@@ -465,9 +605,8 @@ class FeedUtil(object):
 
             img_size = os.stat(img).st_size
 
-            feed_enclosure = config["FEED_ENCLOSURE"]
             if feed_enclosure is not None and feed_enclosure == 'media':
-                fg.load_extension('media', atom=True, rss=True)
+                fe.load_extension('media', atom=True, rss=True)
                 fe.media.add_content({
                     'url': img_url,
                     'type': mimetypes.guess_type(img)[0],
@@ -484,15 +623,19 @@ class FeedUtil(object):
 
             if atom_output_name:
                 fe.link([{'href': img_url, 'rel': 'alternate'}])
+                atom_entries.append((fe.atom_entry(), {}))
 
             if rss_output_name:
                 fe.rss_link(img_url)
+                rss_entries.append((fe.rss_entry(), {}))
 
         if atom_output_name:
             self.atom_renderer(fg, atom_output_name, atom_path,
                                self.site.url_replacer(atom_path,
-                                                      "/assets/xml/atom.xsl"))
+                                                      "/assets/xml/atom.xsl"),
+                               atom_entries)
         if rss_output_name:
             self.rss_renderer(fg, rss_output_name, rss_path,
                               self.site.url_replacer(rss_path,
-                                                     "/assets/xml/rss.xsl"))
+                                                     "/assets/xml/rss.xsl"),
+                              rss_entries)
@@ -26,7 +26,8 @@
 
 """Utility functions to help run filters on files."""
 
-from functools import wraps
+from functools import partial, wraps
+import hashlib
 import os
 import io
 import json
@@ -34,15 +35,35 @@ import shutil
 import subprocess
 import tempfile
 import shlex
+import types
 
+import html5lib
 import lxml
+import lxml.html
 try:
     import typogrify.filters as typo
 except ImportError:
     typo = None  # NOQA
+try:
+    import rcssmin as rcssmin_module
+except ImportError:
+    rcssmin_module = None  # NOQA
+try:
+    import rjsmin as rjsmin_module
+except ImportError:
+    rjsmin_module = None  # NOQA
 import requests
 
-from .utils import req_missing, LOGGER
+from . import __version__
+from .utils import req_missing, write_atomically, LRUCache, LOGGER, bytes_str, unicode_str
+
+# Folder where the results of filter chains are cached (set from
+# CACHE_FOLDER by Nikola; None disables the cache)
+FILTER_CACHE_FOLDER = None
+
+# Minified CSS and JavaScript texts, by kind and hash of the text (the
+# MINIFY_MEMO_SIZE most recently used ones)
+_minified = LRUCache(1000)
 
 
 def apply_to_binary_file(f):
@@ -60,6 +81,7 @@ def apply_to_binary_file(f):
         with open(fname, 'wb+') as outf:
             outf.write(data)
 
+    f_in_file.bytes_filter = f
     return f_in_file
 
 
@@ -78,9 +100,243 @@ def apply_to_text_file(f):
         with io.open(fname, 'w+', encoding='utf-8') as outf:
             outf.write(data)
 
+    f_in_file.text_filter = f
+    return f_in_file
+
+
+def apply_to_html_tree(f):
+    """Apply a filter to a parsed HTML document.
+
+    Take a function f that modifies an ``lxml.html`` document in place,
+    and returns a function that takes a filename and applies f to the
+    parsed file, in place.  The original function is kept as the
+    ``tree_filter`` attribute, so pages rendered by Nikola can run it
+    on the document they already parsed instead of reading the file back.
+
+    Text filters of HTML pages can also have a ``tree_serializer``
+    attribute: a function returning the page they would make out of a
+    parsed document, as text, which is used instead of serializing the
+    document for them.
+    """
+    @wraps(f)
+    def f_in_file(fname):
+        with open(fname, 'rb') as inf:
+            data = inf.read()
+        doc = parse_html(data)
+        f(doc)
+        data = serialize_html(doc)
+        with open(fname, 'wb+') as outf:
+            outf.write(data)
+
+    f_in_file.tree_filter = f
     return f_in_file
 
 
+def parse_html(data):
+    """Parse an HTML page into an ``lxml.html`` document, without blank text.
+
+    The page is parsed once, with lxml.  Pages lxml reports errors in
+    (other than tags it does not know, like HTML5 ones) are parsed with
+    html5lib instead, which repairs broken markup the way browsers do.
+    """
+    parser = lxml.html.HTMLParser(remove_blank_text=True)
+    try:
+        doc = lxml.html.document_fromstring(data, parser)
+    except (lxml.etree.ParserError, ValueError):  # Empty page, or encoding declaration in text
+        doc = None
+    if doc is None or any(error.type_name != 'HTML_UNKNOWN_TAG' for error in parser.error_log):
+        doc = html5lib.html5parser.parse(data, treebuilder='lxml',
+                                         namespaceHTMLElements=False)
+        doc = lxml.html.document_fromstring(lxml.html.tostring(doc), parser)
+    return doc
+
+
+def serialize_html(doc):
+    """Serialize an ``lxml.html`` document as an HTML5 page."""
+    return b'<!DOCTYPE html>\n' + lxml.html.tostring(doc, encoding='utf8', method='html', pretty_print=True)
+
+
+def _text_to_bytes(text):
+    """Encode the result of text filters, like writing a file in text mode."""
+    return text.replace('\n', os.linesep).encode('utf-8')
+
+
+def runs_in_memory(action):
+    """Tell if a filter can run on data in memory, instead of on a file."""
+    return any(getattr(action, kind, None) is not None
+               for kind in ('tree_filter', 'text_filter', 'bytes_filter'))
+
+
+def filter_html(doc, chain):
+    """Apply a list of filters to a parsed HTML page and serialize it.
+
+    Tree filters at the start of the list run on ``doc`` itself, and the
+    first text filter with a ``tree_serializer`` serializes it; the others
+    run on the serialized page, like ``apply_filter_chain`` would run them
+    on the written file.  All filters must run in memory (see
+    ``runs_in_memory``).  Returns the page, as bytes.
+    """
+    data, _ = _run_filter_chain(chain, None, None, doc)
+    return data
+
+
+def _function_identity(f):
+    """Describe what a function does, or return None if that cannot be told.
+
+    Functions are described by their name and code (with their default
+    arguments and the values they close over), so editing a filter
+    changes its identity.  Partials are described by their function and
+    arguments.  Other callables, and values without a stable ``repr``,
+    cannot be described.
+    """
+    if isinstance(f, partial):
+        inner = _function_identity(f.func)
+        if inner is None:
+            return None
+        parts = [inner, repr(f.args), repr(sorted((f.keywords or {}).items()))]
+    elif isinstance(f, types.FunctionType):
+        parts = [f.__module__, f.__name__, _code_identity(f.__code__), repr(f.__defaults__)]
+        for cell in f.__closure__ or ():
+            inner = getattr(cell.cell_contents, 'text_filter', None) or getattr(cell.cell_contents, 'bytes_filter', None)
+            value = cell.cell_contents if inner is None else inner
+            parts.append(_function_identity(value) if callable(value) else repr(value))
+    else:
+        return None
+    if any(part is None or ' at 0x' in part for part in parts):
+        return None
+    return '\n'.join(parts)
+
+
+def _code_identity(code):
+    """Describe a code object by a hash of its bytecode and constants."""
+    digest = hashlib.sha1(code.co_code)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            const = _code_identity(const)
+        digest.update(repr(const).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def filter_identity(action):
+    """Describe a filter, for caching its results, or return None if it cannot be cached."""
+    if isinstance(action, (bytes_str, unicode_str)):
+        return 'command:' + action
+    for kind in ('tree_filter', 'text_filter', 'bytes_filter'):
+        inner = getattr(action, kind, None)
+        if inner is not None:
+            identity = _function_identity(inner)
+            return None if identity is None else kind + ':' + identity
+    identity = _function_identity(action)
+    return None if identity is None else 'file:' + identity
+
+
+def apply_filter_chain(chain, fname):
+    """Apply a list of filters to a file.
+
+    Filters made with ``apply_to_text_file``, ``apply_to_binary_file`` and
+    ``apply_to_html_tree`` run one after another on the contents, in
+    memory, so the file is read once and written once.  Other filters
+    (commands and functions taking a file name) run on the file, which
+    is written before and read back after them.
+
+    Results are cached in ``FILTER_CACHE_FOLDER`` by the hash of the
+    input and the identity of the filters, so identical files are only
+    filtered once.  Symbolic links are left alone.
+    """
+    if os.path.islink(fname):
+        return
+    with open(fname, 'rb') as inf:
+        data = inf.read()
+    key = None
+    if FILTER_CACHE_FOLDER is not None:
+        identities = [filter_identity(action) for action in chain]
+        if None not in identities:
+            digest = hashlib.sha1(json.dumps([__version__, os.path.splitext(fname)[1], identities]).encode('utf-8'))
+            digest.update(data)
+            key = digest.hexdigest()
+    output = None if key is None else _read_cached_result(key)
+    on_disk = data
+    if output is None:
+        output, on_disk = _run_filter_chain(chain, fname, data)
+        if key is not None:
+            _write_cached_result(key, output)
+    if output != on_disk:
+        with open(fname, 'wb+') as outf:
+            outf.write(output)
+
+
+def _run_filter_chain(chain, fname, data, doc=None):
+    """Run filters on the contents of a file.
+
+    ``doc`` is the contents, if they are already parsed (see
+    ``parse_html``).  Consecutive tree filters, and the text filter that
+    follows them if it has a ``tree_serializer``, share one parsed
+    document.  Returns the output and what the file holds.
+    """
+    on_disk = data
+    text = None
+    for action in chain:
+        tree_filter = getattr(action, 'tree_filter', None)
+        tree_serializer = getattr(action, 'tree_serializer', None)
+        text_filter = getattr(action, 'text_filter', None)
+        bytes_filter = getattr(action, 'bytes_filter', None)
+        if doc is not None and tree_serializer is not None:
+            text = tree_serializer(doc)
+            doc = None
+            continue
+        if tree_filter is not None:
+            if doc is None:
+                if text is not None:
+                    data = _text_to_bytes(text)
+                    text = None
+                doc = parse_html(data)
+            tree_filter(doc)
+            continue
+        if doc is not None:
+            data = serialize_html(doc)
+            doc = None
+        if text_filter is not None:
+            if text is None:
+                # Like reading a file in text mode
+                text = data.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+            text = text_filter(text)
+            continue
+        if text is not None:
+            data = _text_to_bytes(text)
+            text = None
+        if bytes_filter is not None:
+            data = bytes_filter(data)
+        else:
+            if data != on_disk:
+                with open(fname, 'wb+') as outf:
+                    outf.write(data)
+            if callable(action):
+                action(fname)
+            else:
+                subprocess.check_call(action % fname, shell=True)
+            with open(fname, 'rb') as inf:
+                data = on_disk = inf.read()
+    if doc is not None:
+        data = serialize_html(doc)
+    elif text is not None:
+        data = _text_to_bytes(text)
+    return data, on_disk
+
+
+def _read_cached_result(key):
+    """Read a cached filter result, or return None if it is missing."""
+    try:
+        with open(os.path.join(FILTER_CACHE_FOLDER, key[:2], key), 'rb') as inf:
+            return inf.read()
+    except (IOError, OSError):
+        return None
+
+
+def _write_cached_result(key, data):
+    """Keep a filter result in the cache."""
+    write_atomically(os.path.join(FILTER_CACHE_FOLDER, key[:2], key), data)
+
+
 def list_replace(the_list, find, replacement):
     """Replace all occurrences of ``find`` with ``replacement`` in ``the_list``."""
     for i, v in enumerate(the_list):
@@ -239,9 +495,14 @@ def typogrify(data):
         req_missing(['typogrify'], 'use the typogrify filter', optional=True)
         return data
 
-    data = _normalize_html(data)
+    return _typogrify(_normalize_html(data))
+
+
+def _typogrify(data, widont=True):
+    """Prettify normalized HTML with typogrify."""
     data = typo.amp(data)
-    data = typo.widont(data)
+    if widont:
+        data = typo.widont(data)
     data = typo.smartypants(data)
     # Disabled because of typogrify bug where it breaks <title>
     # data = typo.caps(data)
@@ -257,13 +518,26 @@ def typogrify_sans_widont(data):
     if typo is None:
         req_missing(['typogrify'], 'use the typogrify_sans_widont filter')
 
-    data = _normalize_html(data)
-    data = typo.amp(data)
-    data = typo.smartypants(data)
-    # Disabled because of typogrify bug where it breaks <title>
-    # data = typo.caps(data)
-    data = typo.initial_quotes(data)
-    return data
+    return _typogrify(_normalize_html(data), widont=False)
+
+
+def _typogrify_tree(doc):
+    """Prettify a parsed page with typogrify."""
+    if typo is None:
+        req_missing(['typogrify'], 'use the typogrify filter', optional=True)
+        return serialize_html(doc).decode('utf-8')
+    return _typogrify(_serialize_normalized(doc))
+
+
+def _typogrify_sans_widont_tree(doc):
+    """Prettify a parsed page with typogrify, skipping the widont filter."""
+    if typo is None:
+        req_missing(['typogrify'], 'use the typogrify_sans_widont filter')
+    return _typogrify(_serialize_normalized(doc), widont=False)
+
+
+typogrify.tree_serializer = _typogrify_tree
+typogrify_sans_widont.tree_serializer = _typogrify_sans_widont_tree
 
 
 @apply_to_text_file
@@ -309,6 +583,43 @@ def jsminify(data):
         return data
 
 
+def minify(kind, data):
+    """Minify CSS (``kind='css'``, with rcssmin) or JavaScript (``'js'``, with rjsmin) text.
+
+    Minification runs in-process, and its results are kept in memory
+    by the hash of the text (the ``MINIFY_MEMO_SIZE`` most recently
+    used), so identical files are minified once.
+    ``/*! ... */`` comments (usually licenses) are kept.
+    """
+    key = (kind, hashlib.sha1(data.encode('utf-8')).hexdigest())
+    result = _minified.get(key)
+    if result is None:
+        if kind == 'css':
+            if rcssmin_module is None:
+                req_missing(['rcssmin'], 'use the rcssmin filter')
+            result = rcssmin_module.cssmin(data, keep_bang_comments=True)
+        elif kind == 'js':
+            if rjsmin_module is None:
+                req_missing(['rjsmin'], 'use the rjsmin filter')
+            result = rjsmin_module.jsmin(data, keep_bang_comments=True)
+        else:
+            raise ValueError('Unknown kind of file to minify: {0}'.format(kind))
+        _minified[key] = result
+    return result
+
+
+@apply_to_text_file
+def rcssmin(data):
+    """Minify CSS locally, with rcssmin."""
+    return minify('css', data)
+
+
+@apply_to_text_file
+def rjsmin(data):
+    """Minify JS locally, with rjsmin."""
+    return minify('js', data)
+
+
 @apply_to_text_file
 def jsonminify(data):
     """Minify JSON files (strip whitespace and use minimal separators)."""
@@ -333,4 +644,11 @@ def _normalize_html(data):
     return data
 
 
+def _serialize_normalized(doc):
+    """Serialize a parsed page the way ``_normalize_html`` cleans it up."""
+    # The page was parsed without blank text, so indent it like serialize_html
+    return lxml.html.tostring(doc, encoding='unicode', pretty_print=True).rstrip('\n')
+
+
 normalize_html = apply_to_text_file(_normalize_html)
+normalize_html.tree_serializer = _serialize_normalized
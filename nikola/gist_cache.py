@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+
+# Copyright © 2012-2015 Roberto Alsina and others.
+
+# Permission is hereby granted, free of charge, to any
+# person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the
+# Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the
+# Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+# PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS
+# OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Fetch GitHub gists through a cache shared by the page compilers."""
+
+from __future__ import unicode_literals
+import hashlib
+import io
+import json
+from multiprocessing.pool import ThreadPool
+import os
+import re
+import time
+
+from blinker import signal
+import requests
+from requests.adapters import HTTPAdapter
+
+from nikola.utils import get_logger, makedirs, write_atomically, STDERR_HANDLER
+
+LOGGER = get_logger('gist_cache', STDERR_HANDLER)
+
+GIST_RAW_URL = "https://gist.githubusercontent.com/raw/"
+
+# Gist embeds in post sources, by compiler name
+GIST_SOURCE_RES = {
+    'rest': [re.compile(r'(?m)^\.\.\s+gist::[ \t]*(?P<gist_id>\S+)[^\n]*'
+                        r'(?:\n[ \t]+:file:[ \t]*(?P<filename>\S.*?)[ \t]*$)?')],
+    'markdown': [re.compile(r'\[:gist:\s*(?P<gist_id>\S+)(?:\s*(?P<filename>.+?))?\s*\]'),
+                 re.compile(r'(?m)^\.\.\s*gist::\s*(?P<gist_id>[^\]\s]+)(?:\s*(?P<filename>.+?))?\s*$')],
+}
+
+
+class GistFetchException(Exception):
+    """Raised when attempt to fetch content of a Gist from github.com fails."""
+
+    def __init__(self, url, status_code, reason=None):
+        """Initialize the exception."""
+        Exception.__init__(self)
+        if reason is None:
+            reason = 'Received a {0} response from Gist URL'.format(status_code)
+        self.status_code = status_code
+        self.message = '{0}: {1}'.format(reason, url)
+
+
+def find_gists(text, compiler_name):
+    """Find the gists embedded in a post source, as (gist_id, filename) pairs."""
+    gists = set([])
+    for regex in GIST_SOURCE_RES.get(compiler_name, []):
+        # Markdown patterns match within a line, like inline patterns do
+        chunks = text.splitlines() if compiler_name == 'markdown' else [text]
+        for m in (m for chunk in chunks for m in regex.finditer(chunk)):
+            gist_id = m.group('gist_id')
+            if 'https://' in gist_id:
+                gist_id = gist_id.split('/')[-1]
+            gists.add((gist_id, m.group('filename') or None))
+    return gists
+
+
+def get_gist_cache(site):
+    """Get the gist cache of a site, creating it if needed.
+
+    Without a site (or a ``CACHE_FOLDER``), the cache is kept in memory
+    only.
+    """
+    if site is None:
+        return GistCache()
+    cache = getattr(site, 'gist_cache', None)
+    if cache is None:
+        cache_folder = site.config.get('CACHE_FOLDER')
+        cache = GistCache(
+            os.path.join(cache_folder, 'gists') if cache_folder else None,
+            site.config.get('GIST_CACHE_TTL', 86400),
+            site.config.get('GIST_OFFLINE', False),
+            site.config.get('GIST_THREADS', 8))
+        site.gist_cache = cache
+        signal('scanned').connect(cache.prefetch_posts, sender=site)
+    return cache
+
+
+class GistCache(object):
+    """Fetch raw gists, keeping them in a cache.
+
+    Gist texts are stored by the SHA1 of their contents in ``path`` (or
+    in memory if ``path`` is None), with an index of the URL, ETag and
+    fetch time of each gist.  Gists fetched less than ``ttl`` seconds
+    ago are served from the cache; older ones are revalidated with
+    their ETag, and kept if GitHub cannot be reached or answers with an
+    error.  In ``offline``
+    mode, only cached gists are served, however old they are.
+    """
+
+    def __init__(self, path=None, ttl=86400, offline=False, threads=8, raw_url=GIST_RAW_URL):
+        """Set up the cache."""
+        self.path = path
+        self.ttl = ttl
+        self.offline = offline
+        self.threads = max(threads, 1)
+        self.raw_url = raw_url
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.threads, pool_maxsize=self.threads)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._index = None
+        self._texts = {}
+
+    def url(self, gist_id, filename=None):
+        """Get the raw URL of a gist (or of a file in it)."""
+        if filename:
+            return '{0}{1}/{2}'.format(self.raw_url, gist_id, filename)
+        return '{0}{1}'.format(self.raw_url, gist_id)
+
+    def get(self, gist_id, filename=None):
+        """Get the raw text of a gist (or of a file in it)."""
+        url = self.url(gist_id, filename)
+        entry = self._load_index().get(url)
+        if self._is_fresh(entry):
+            return self._read(entry['digest'])
+        if self.offline:
+            raise GistFetchException(url, None, 'Gist not cached (offline mode)')
+        entry, text = self._fetch(url, entry)
+        self._store(url, entry, text)
+        self._save_index()
+        return text
+
+    def prefetch(self, gists):
+        """Fetch the gists (gist_id, filename pairs) that are not fresh in the cache.
+
+        Gists are fetched concurrently; errors are ignored here and
+        reported when the gist is used.
+        """
+        if self.offline:
+            return []
+        index = self._load_index()
+        now = time.time()
+        missing = []
+        for gist_id, filename in sorted(gists, key=lambda g: (g[0], g[1] or '')):
+            url = self.url(gist_id, filename)
+            if url not in missing and not self._is_fresh(index.get(url), now):
+                missing.append(url)
+        # Most builds need no request at all, so no threads either
+        if not missing:
+            return []
+
+        def fetch(url):
+            try:
+                return self._fetch(url, index.get(url))
+            except GistFetchException:
+                return None, None
+
+        if len(missing) > 1 and self.threads > 1:
+            pool = ThreadPool(min(self.threads, len(missing)))
+            try:
+                fetched = pool.map(fetch, missing)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            fetched = [fetch(url) for url in missing]
+
+        for url, (entry, text) in zip(missing, fetched):
+            if entry is not None:
+                self._store(url, entry, text)
+        self._save_index()
+        return missing
+
+    def prefetch_posts(self, site, delta=None, **kwargs):
+        """Prefetch the gists of posts that will be compiled.
+
+        Connected to the ``scanned`` signal; after a partial scan (when
+        ``delta`` is not None), only the added posts are looked at.  Only
+        the sources of posts whose compiled fragments are missing or older
+        than their sources are read.
+        """
+        posts = site.timeline if delta is None else delta['added']
+        gists = set([])
+        for post in posts:
+            compiler_name = getattr(post.compiler, 'name', None)
+            if compiler_name not in GIST_SOURCE_RES:
+                continue
+            for lang in post.translated_to:
+                source = post.translated_source_path(lang)
+                dest = post.translated_base_path(lang)
+                try:
+                    if os.path.isfile(dest) and os.stat(dest).st_mtime >= os.stat(source).st_mtime:
+                        continue
+                    with io.open(source, 'r', encoding='utf-8-sig') as inf:
+                        text = inf.read()
+                except (IOError, OSError):
+                    continue
+                if 'gist' in text:
+                    gists.update(find_gists(text, compiler_name))
+        if gists:
+            fetched = self.prefetch(gists)
+            if fetched:
+                LOGGER.info('Fetched {0} gists'.format(len(fetched)))
+
+    def _fetch(self, url, entry=None):
+        """Fetch a gist, revalidating a cached entry if given.
+
+        Returns the new index entry and the gist text.
+        """
+        headers = {}
+        if entry is not None and self._read(entry['digest']) is None:
+            # Nothing to revalidate
+            entry = None
+        if entry is not None and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        try:
+            resp = self.session.get(url, headers=headers)
+        except requests.exceptions.RequestException as exc:
+            return self._fetch_failed(url, entry, GistFetchException(url, None, 'Cannot get gist ({0})'.format(exc)))
+
+        if resp.status_code == 304 and entry is not None:
+            return dict(entry, time=time.time()), self._read(entry['digest'])
+        if not resp.ok:
+            return self._fetch_failed(url, entry, GistFetchException(url, resp.status_code))
+        text = resp.text
+        entry = {
+            'time': time.time(),
+            'etag': resp.headers.get('ETag'),
+            'digest': hashlib.sha1(text.encode('utf-8')).hexdigest(),
+        }
+        return entry, text
+
+    def _fetch_failed(self, url, entry, exc):
+        """Fall back to the cached copy of a gist that cannot be fetched, or raise exc."""
+        text = self._read(entry['digest']) if entry is not None else None
+        if text is None:
+            raise exc
+        LOGGER.warn('{0}; using the cached copy'.format(exc.message))
+        return entry, text
+
+    def _is_fresh(self, entry, now=None):
+        """Tell if a cached gist can be used without asking GitHub."""
+        if entry is None:
+            return False
+        if not self.offline and (now or time.time()) - entry['time'] >= self.ttl:
+            return False
+        return self._read(entry['digest']) is not None
+
+    def _store(self, url, entry, text):
+        """Keep a fetched gist in the cache."""
+        digest = entry['digest']
+        if digest not in self._texts:
+            self._texts[digest] = text
+            if self.path:
+                makedirs(self.path)
+                text_path = os.path.join(self.path, digest + '.txt')
+                if not os.path.isfile(text_path):
+                    with io.open(text_path, 'w', encoding='utf-8') as outf:
+                        outf.write(text)
+        self._load_index()[url] = entry
+
+    def _read(self, digest):
+        """Read a cached gist text, or return None if it is missing."""
+        if digest not in self._texts and self.path:
+            try:
+                with io.open(os.path.join(self.path, digest + '.txt'), 'r', encoding='utf-8') as inf:
+                    self._texts[digest] = inf.read()
+            except (IOError, OSError):
+                return None
+        return self._texts.get(digest)
+
+    def _load_index(self):
+        """Load the index of cached gists."""
+        if self._index is None:
+            self._index = {}
+            if self.path:
+                try:
+                    with io.open(os.path.join(self.path, 'index.json'), 'r', encoding='utf-8') as inf:
+                        self._index = json.load(inf)
+                except (IOError, OSError, ValueError):
+                    pass
+        return self._index
+
+    def _save_index(self):
+        """Save the index of cached gists."""
+        if not self.path:
+            return
+        write_atomically(os.path.join(self.path, 'index.json'), json.dumps(self._index, sort_keys=True))
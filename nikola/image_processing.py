@@ -27,11 +27,15 @@
 """Process images."""
 
 from __future__ import unicode_literals
+import atexit
 import datetime
+import io
+import json
 import os
 import lxml
 import re
 import gzip
+import time
 
 from nikola import utils
 
@@ -47,50 +51,342 @@ except ImportError:
         pass
 
 
+def _exif_rotate(im):
+    """Rotate an image as told by its EXIF orientation."""
+    try:
+        exif = im._getexif()
+    except Exception:
+        exif = None
+    if exif is not None:
+        for tag, value in list(exif.items()):
+            decoded = ExifTags.TAGS.get(tag, tag)
+
+            if decoded == 'Orientation':
+                if value == 3:
+                    im = im.rotate(180)
+                elif value == 6:
+                    im = im.rotate(270)
+                elif value == 8:
+                    im = im.rotate(90)
+                break
+    return im
+
+
+def _thumbnail_size(w, h, max_size, bigger_panoramas):
+    """Return the size to thumbnail an image to, or None if it is small enough."""
+    if w > max_size or h > max_size:
+        size = max_size, max_size
+
+        # Panoramas get larger thumbnails because they look *awful*
+        if bigger_panoramas and w > 2 * h:
+            size = min(w, max_size * 4), min(w, max_size * 4)
+        return size
+
+
+def resize_image_data(src, targets, bigger_panoramas=True):
+    """Resize an image to several sizes, decoding it once.
+
+    ``targets`` is a list of ``(dst, max_size)`` pairs.  Returns a dict
+    mapping each ``dst`` to a ``(data, error)`` pair, where ``data`` is
+    the encoded image, or None if the original has to be copied instead
+    (because it is small enough, or because of the ``error`` message).
+
+    The result is the same as resizing the image once per target.
+    """
+    results = {}
+    im = Image.open(src)
+    w, h = im.size
+    decoded = None
+    Image.init()
+    for dst, max_size in targets:
+        size = _thumbnail_size(w, h, max_size, bigger_panoramas)
+        if size is None:  # Image is small
+            results[dst] = (None, None)
+            continue
+        if decoded is None:
+            decoded = _exif_rotate(im)
+        try:
+            if decoded is im and im.format == 'JPEG':
+                # Unrotated JPEGs are decoded at reduced scale by
+                # thumbnail(), which needs a freshly opened image.
+                thumb = Image.open(src)
+            else:
+                decoded.load()
+                thumb = decoded.copy()
+            thumb.thumbnail(size, Image.ANTIALIAS)
+            ext = os.path.splitext(dst)[1].lower()
+            out = io.BytesIO()
+            thumb.save(out, Image.EXTENSION[ext])
+            results[dst] = (out.getvalue(), None)
+        except Exception as e:
+            results[dst] = (None, '{0}'.format(e))
+    return results
+
+
+def _resize_job(job):
+    """Resize the images of a job in a worker process."""
+    src, targets, bigger_panoramas = job
+    start = time.time()
+    results = resize_image_data(src, targets, bigger_panoramas)
+    return results, time.time() - start
+
+
+class ImagePipeline(object):
+    """Resize images for a list of tasks, decoding each source image once.
+
+    Jobs are added in the order of their tasks when tasks are generated.
+    When a task asks for its images, its job and the next few jobs that
+    look out of date are sent to a process pool, so images are resized
+    ahead of the tasks that need them.  Files are only written when their
+    own task runs.
+
+    The worker processes are kept until ``close()`` is called (or the
+    process exits), so they are not forked again for every gallery.
+    """
+
+    def __init__(self, processor, processes=1):
+        """Create a pipeline using the processor's logger and fallbacks."""
+        self.processor = processor
+        self.processes = processes
+        self.jobs = {}
+        self._order = []
+        self._pending = {}
+        self._results = {}
+        self._pool = None
+        self._prefetch_all = False
+        self._done = 0
+        self._atexit_registered = False
+
+    def add(self, src, targets, bigger_panoramas=True):
+        """Add a job: resize ``src`` to every ``(dst, max_size)`` in ``targets``."""
+        if src not in self.jobs:
+            self._order.append(src)
+        self.jobs[src] = (list(targets), bigger_panoramas)
+
+    def resize(self, src, dsts=None):
+        """Write the resized images of a job (all of them, or those in ``dsts``)."""
+        targets, bigger_panoramas = self.jobs[src]
+        if dsts is None:
+            dsts = [dst for dst, _ in targets]
+        if not Image or os.path.splitext(src)[1] in ['.svg', '.svgz']:
+            for dst, max_size in targets:
+                if dst in dsts:
+                    self.processor.resize_image(src, dst, max_size, bigger_panoramas)
+            return
+
+        results = self._get_results(src, dsts)
+        for dst in dsts:
+            self.processor.write_resized_image(src, dst, *results.pop(dst))
+        if not results:
+            del self._results[src]
+
+    def close(self):
+        """Stop the worker processes, and forget the results no task used."""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+        self._pending = {}
+        self._results = {}
+
+    def _get_results(self, src, dsts):
+        """Get the resized data of a job, waiting for it if needed."""
+        results = self._results.get(src, {})
+        if src not in self._pending and not all(dst in results for dst in dsts):
+            if not self._looks_stale(src):
+                # Tasks run even if their files look fine (configuration
+                # changes, for example): resize everything ahead.
+                self._prefetch_all = True
+            self._submit(src)
+        self._prefetch(src)
+        if src in self._pending:
+            results, elapsed = self._pending.pop(src).get()
+            self._results[src] = results
+            self._done += 1
+            self.processor.logger.debug("Resized {0} in {1:.0f} ms [{2}/{3}]".format(
+                src, elapsed * 1000, self._done, len(self._order)))
+        return self._results[src]
+
+    def _looks_stale(self, src):
+        """Tell if some resized image of a job is missing or older than its source."""
+        src_mtime = os.stat(src).st_mtime
+        for dst, _ in self.jobs[src][0]:
+            if not os.path.exists(dst) or os.stat(dst).st_mtime < src_mtime:
+                return True
+        return False
+
+    def _submit(self, src):
+        """Start resizing the images of a job."""
+        targets, bigger_panoramas = self.jobs[src]
+        job = (src, targets, bigger_panoramas)
+        if self.processes > 1 and self._pool is None:
+            try:
+                self._pool = utils.fork_pool(self.processes)
+            except Exception as e:
+                self.processor.logger.warn("Cannot resize images in parallel: {0}".format(e))
+            if self._pool is None:
+                self.processes = 1
+            elif not self._atexit_registered:
+                atexit.register(self.close)
+                self._atexit_registered = True
+        if self._pool is not None:
+            self._pending[src] = self._pool.apply_async(_resize_job, (job,))
+        else:
+            self._pending[src] = _ImmediateResult(_resize_job(job))
+
+    def _prefetch(self, src):
+        """Send the jobs following ``src`` to the pool, a few at a time."""
+        if self._pool is None:
+            return
+        index = self._order.index(src)
+        window = self.processes * 2
+        for next_src in self._order[index + 1:]:
+            if len(self._pending) >= window:
+                break
+            if next_src in self._pending or next_src in self._results:
+                continue
+            if os.path.splitext(next_src)[1] in ['.svg', '.svgz']:
+                continue
+            if self._prefetch_all or self._looks_stale(next_src):
+                self._submit(next_src)
+
+
+class _ImmediateResult(object):
+    """A result computed right away, with the interface of AsyncResult."""
+
+    def __init__(self, value):
+        """Keep the value."""
+        self.value = value
+
+    def get(self):
+        """Return the value."""
+        return self.value
+
+
+def _exif_date(exif):
+    """Get the date an image was taken from its EXIF data, as a string."""
+    for tag, value in list(exif.items()):
+        decoded = ExifTags.TAGS.get(tag, tag)
+        if decoded in ('DateTimeOriginal', 'DateTimeDigitized'):
+            try:
+                if isinstance(value, tuple):
+                    value = value[0]
+                date = datetime.datetime.strptime(value, '%Y:%m:%d %H:%M:%S')
+                return date.strftime('%Y-%m-%d %H:%M:%S')
+            except ValueError:  # Invalid EXIF date.
+                pass
+
+
+def _exif_orientation(exif):
+    """Get the orientation of an image (1 to 8) from its EXIF data."""
+    for tag, value in list(exif.items()):
+        if ExifTags.TAGS.get(tag, tag) == 'Orientation':
+            return value if value in range(1, 9) else None
+
+
+def read_image_info(src):
+    """Read the EXIF date and orientation, size and format of an image.
+
+    The size is the one of the image as shown, turned as told by its
+    orientation.  Only the image headers are read.  Values that cannot be
+    found are None.
+    """
+    info = {'date': None, 'orientation': None, 'width': None, 'height': None, 'format': None}
+    try:
+        im = Image.open(src)
+    except Exception:
+        return info
+    info['width'], info['height'] = im.size
+    info['format'] = im.format
+    try:
+        exif = im._getexif()
+    except Exception:
+        exif = None
+    if exif is not None:
+        info['date'] = _exif_date(exif)
+        info['orientation'] = _exif_orientation(exif)
+    if info['orientation'] in (5, 6, 7, 8):
+        # Turned a quarter
+        info['width'], info['height'] = info['height'], info['width']
+    return info
+
+
+class ImageIndex(object):
+    """An index of image information (see read_image_info), kept on disk.
+
+    Entries are keyed by path, and are used while the modification time
+    and size of the file do not change, so images are not opened again
+    on every run.  New entries are saved once, when the process exits
+    (or when ``save()`` is called).
+    """
+
+    def __init__(self, path):
+        """Use the index stored in ``path``."""
+        self.path = path
+        self.entries = None
+        self.changed = {}
+        self._save_registered = False
+
+    def get(self, src):
+        """Return the information about an image, reading it if needed."""
+        if self.entries is None:
+            self.entries = self._load()
+        st = os.stat(src)
+        stamp = [st.st_mtime, st.st_size]
+        entry = self.entries.get(src)
+        # Entries without an orientation were saved by older versions
+        if entry is None or entry['stamp'] != stamp or 'orientation' not in entry:
+            entry = read_image_info(src)
+            entry['stamp'] = stamp
+            self.entries[src] = entry
+            self.changed[src] = entry
+            if not self._save_registered:
+                atexit.register(self.save)
+                self._save_registered = True
+        return entry
+
+    def save(self):
+        """Save the new entries, keeping those saved meanwhile by other processes."""
+        if not self.changed:
+            return
+        entries = self._load()
+        entries.update(self.changed)
+        utils.write_atomically(self.path, json.dumps(entries))
+        self.changed = {}
+
+    def _load(self):
+        """Load the saved entries."""
+        try:
+            with io.open(self.path, 'r', encoding='utf-8') as inf:
+                return json.load(inf)
+        except (IOError, OSError, ValueError):
+            return {}
+
+
 class ImageProcessor(object):
     """Apply image operations."""
 
     image_ext_list_builtin = ['.jpg', '.png', '.jpeg', '.gif', '.svg', '.bmp', '.tiff']
+    image_index = None
 
     def resize_image(self, src, dst, max_size, bigger_panoramas=True):
         """Make a copy of the image in the requested size."""
         if not Image or os.path.splitext(src)[1] in ['.svg', '.svgz']:
             self.resize_svg(src, dst, max_size, bigger_panoramas)
             return
-        im = Image.open(src)
-        w, h = im.size
-        if w > max_size or h > max_size:
-            size = max_size, max_size
-
-            # Panoramas get larger thumbnails because they look *awful*
-            if bigger_panoramas and w > 2 * h:
-                size = min(w, max_size * 4), min(w, max_size * 4)
+        results = resize_image_data(src, [(dst, max_size)], bigger_panoramas)
+        self.write_resized_image(src, dst, *results[dst])
 
-            try:
-                exif = im._getexif()
-            except Exception:
-                exif = None
-            if exif is not None:
-                for tag, value in list(exif.items()):
-                    decoded = ExifTags.TAGS.get(tag, tag)
-
-                    if decoded == 'Orientation':
-                        if value == 3:
-                            im = im.rotate(180)
-                        elif value == 6:
-                            im = im.rotate(270)
-                        elif value == 8:
-                            im = im.rotate(90)
-                        break
-            try:
-                im.thumbnail(size, Image.ANTIALIAS)
-                im.save(dst)
-            except Exception as e:
-                self.logger.warn("Can't thumbnail {0}, using original "
-                                 "image as thumbnail ({1})".format(src, e))
-                utils.copy_file(src, dst)
-        else:  # Image is small
+    def write_resized_image(self, src, dst, data, error=None):
+        """Write an image resized by resize_image_data (or a copy of the original)."""
+        if error is not None:
+            self.logger.warn("Can't thumbnail {0}, using original "
+                             "image as thumbnail ({1})".format(src, error))
+        if data is None:
             utils.copy_file(src, dst)
+        else:
+            with open(dst, 'wb') as outf:
+                outf.write(data)
 
     def resize_svg(self, src, dst, max_size, bigger_panoramas):
         """Make a copy of an svg at the requested size."""
@@ -134,26 +430,21 @@ class ImageProcessor(object):
             self.logger.warn("No width/height in %s. Original exception: %s" % (src, e))
             utils.copy_file(src, dst)
 
+    def image_info(self, src):
+        """Return the EXIF date, size and format of an image.
+
+        The ``image_index`` (an ImageIndex) is used, if there is one.
+        """
+        if self.image_index is not None:
+            return self.image_index.get(src)
+        return read_image_info(src)
+
     def image_date(self, src):
         """Try to figure out the date of the image."""
         if src not in self.dates:
-            try:
-                im = Image.open(src)
-                exif = im._getexif()
-            except Exception:
-                exif = None
-            if exif is not None:
-                for tag, value in list(exif.items()):
-                    decoded = ExifTags.TAGS.get(tag, tag)
-                    if decoded in ('DateTimeOriginal', 'DateTimeDigitized'):
-                        try:
-                            if isinstance(value, tuple):
-                                value = value[0]
-                            self.dates[src] = datetime.datetime.strptime(
-                                value, '%Y:%m:%d %H:%M:%S')
-                            break
-                        except ValueError:  # Invalid EXIF date.
-                            pass
+            date = self.image_info(src)['date']
+            if date is not None:
+                self.dates[src] = datetime.datetime.strptime(date, '%Y-%m-%d %H:%M:%S')
         if src not in self.dates:
             self.dates[src] = datetime.datetime.fromtimestamp(
                 os.stat(src).st_mtime)
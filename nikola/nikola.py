@@ -49,14 +49,12 @@ except ImportError:
 
 import dateutil.tz
 import logging
-import lxml.etree
-import lxml.html
-import html5lib
 from yapsy.PluginManager import PluginManager
 from blinker import signal
 
 from .post import Post  # NOQA
-from . import DEBUG, utils
+from . import DEBUG, filters, utils
+from . import post as post_module
 from .plugin_categories import (
     Command,
     LateTask,
@@ -72,6 +70,7 @@ from .plugin_categories import (
     PostScanner,
 )
 from .feedutil import FeedUtil
+from .timeline_index import TimelineIndex
 
 if DEBUG:
     logging.basicConfig(level=logging.DEBUG)
@@ -85,6 +84,9 @@ DEFAULT_FEED_READ_MORE_LINK = '<p><a href="{link}">{read_more}…</a> ({min_rema
 # Default pattern for translation files' names
 DEFAULT_TRANSLATIONS_PATTERN = '{path}.{lang}.{ext}'
 
+# Maximum number of memoized url_replacer results
+URL_CACHE_SIZE = 100000
+
 
 config_changed = utils.config_changed
 
@@ -312,6 +314,8 @@ class Nikola(object):
         self.timeline = []
         self.pages = []
         self._scanned = False
+        self._timeline_index = None
+        self._clear_url_caches()
         self._template_system = None
         self._THEMES = None
         self.debug = DEBUG
@@ -361,6 +365,7 @@ class Nikola(object):
             'COMMENT_SYSTEM': 'disqus',
             'COMMENTS_IN_GALLERIES': False,
             'COMMENTS_IN_STORIES': False,
+            'COMPILE_PROCESSES': 1,
             'COMPILERS': {
                 "rest": ('.txt', '.rst'),
                 "markdown": ('.md', '.mdown', '.markdown'),
@@ -389,14 +394,20 @@ class Nikola(object):
             'ENABLE_AUTHOR_PAGES': True,
             'EXTRA_HEAD_DATA': '',
             'FAVICONS': (),
+            'FEED_ITEM_CACHE_SIZE': 5000,
             'FEED_LENGTH': 10,
             'FILE_METADATA_REGEXP': None,
             'ADDITIONAL_METADATA': {},
             'FILES_FOLDERS': {'files': ''},
             'FILTERS': {},
+            'FILTER_CACHE': True,
             'FORCE_ISO8601': False,
+            'FRAGMENT_CACHE_SIZE': 1000,
             'GALLERY_FOLDERS': {'galleries': 'galleries'},
             'GALLERY_SORT_BY_DATE': True,
+            'GIST_CACHE_TTL': 86400,
+            'GIST_OFFLINE': False,
+            'GIST_THREADS': 8,
             'GLOBAL_CONTEXT_FILLER': [],
             'GZIP_COMMAND': None,
             'GZIP_FILES': False,
@@ -410,6 +421,7 @@ class Nikola(object):
             'INDEX_FILE': 'index.html',
             'INDEX_TEASERS': False,
             'IMAGE_THUMBNAIL_SIZE': 400,
+            'IMAGE_PROCESSES': 1,
             'INDEXES_TITLE': "",
             'INDEXES_PAGES': "",
             'INDEXES_PAGES_MAIN': False,
@@ -419,7 +431,12 @@ class Nikola(object):
             'IPYNB_CONFIG': {},
             'LESS_COMPILER': 'lessc',
             'LESS_OPTIONS': [],
+            'JINJA_PRECOMPILE_TEMPLATES': False,
             'LICENSE': '',
+            'LINK_CHECK_CACHE_TTL': 86400,
+            'LINK_CHECK_PER_HOST': 2,
+            'LINK_CHECK_PROCESSES': 1,
+            'LINK_CHECK_THREADS': 8,
             'LINK_CHECK_WHITELIST': [],
             'LISTINGS_FOLDERS': {'listings': 'listings'},
             'LOGO_URL': '',
@@ -427,6 +444,7 @@ class Nikola(object):
             'MARKDOWN_EXTENSIONS': ['fenced_code', 'codehilite'],  # FIXME: Add 'extras' in v8
             'MAX_IMAGE_SIZE': 1280,
             'MATHJAX_CONFIG': '',
+            'MINIFY_MEMO_SIZE': 1000,
             'OLD_THEME_SUPPORT': True,
             'OUTPUT_FOLDER': 'output',
             'POSTS': (("posts/*.txt", "posts", "post.tmpl"),),
@@ -437,7 +455,9 @@ class Nikola(object):
             'POSTS_SECTION_NAME': "",
             'POSTS_SECTION_TITLE': "{name}",
             'PAGES': (("stories/*.txt", "stories", "story.tmpl"),),
+            'PANDOC_BATCH_SIZE': 50,
             'PANDOC_OPTIONS': [],
+            'PANDOC_PROCESSES': 1,
             'PRETTY_URLS': False,
             'FUTURE_IS_NOW': False,
             'INDEX_READ_MORE_LINK': DEFAULT_INDEX_READ_MORE_LINK,
@@ -458,6 +478,8 @@ class Nikola(object):
             'RSS_PATH': '',
             'SASS_COMPILER': 'sass',
             'SASS_OPTIONS': [],
+            'SCAN_POSTS_CACHE': False,
+            'SCAN_POSTS_PROCESSES': 1,
             'SEARCH_FORM': '',
             'SHOW_BLOG_TITLE': True,
             'SHOW_SOURCELINK': True,
@@ -590,6 +612,16 @@ class Nikola(object):
         # propagate USE_SLUGIFY
         utils.USE_SLUGIFY = self.config['USE_SLUGIFY']
 
+        # Cache filter results in CACHE_FOLDER
+        if self.config['FILTER_CACHE']:
+            filters.FILTER_CACHE_FOLDER = os.path.join(self.config['CACHE_FOLDER'], 'filters')
+        else:
+            filters.FILTER_CACHE_FOLDER = None
+
+        # Sizes of the in-memory caches shared by all sites
+        filters._minified.size = self.config['MINIFY_MEMO_SIZE']
+        post_module._FRAGMENT_CACHE.size = self.config['FRAGMENT_CACHE_SIZE']
+
         # Make sure we have pyphen installed if we are using it
         if self.config.get('HYPHENATE') and pyphen is None:
             utils.LOGGER.warn('To use the hyphenation, you have to install '
@@ -805,7 +837,7 @@ class Nikola(object):
             else:
                 self.bad_compilers.add(k)
 
-        self.feedutil = FeedUtil(self)
+        self.feedutil = FeedUtil(self, self.config['FEED_ITEM_CACHE_SIZE'])
         self._set_global_context()
 
     def init_plugins(self, commands_only=False):
@@ -1078,6 +1110,15 @@ class Nikola(object):
 
     template_system = property(_get_template_system)
 
+    def _get_timeline_index(self):
+        """Get the index of the scanned timeline, building it if needed."""
+        if self._timeline_index is None:
+            self.scan_posts()
+            self._timeline_index = TimelineIndex(self)
+        return self._timeline_index
+
+    timeline_index = property(_get_timeline_index)
+
     def get_compiler(self, source_name):
         """Get the correct compiler for a post from `conf.COMPILERS`.
 
@@ -1114,7 +1155,7 @@ class Nikola(object):
 
         return compile_html
 
-    def render_template(self, template_name, output_name, context):
+    def render_template(self, template_name, output_name, context, page_filters=None):
         """Render a template with the global context.
 
         If ``output_name`` is None, will return a string and all URL
@@ -1122,6 +1163,12 @@ class Nikola(object):
         If ``output_name`` is a string, URLs will be normalized and
         the resultant HTML will be saved to the named file (path must
         start with OUTPUT_FOLDER).
+
+        ``page_filters`` are filters (for the output file) that can run
+        in memory, see ``utils.apply_filters``.  They run on the rendered
+        page before it is written, and tree filters among them (see
+        ``filters.apply_to_html_tree``) on the document parsed to rewrite
+        links.
         """
         local_context = {}
         local_context["template_name"] = template_name
@@ -1156,12 +1203,9 @@ class Nikola(object):
         src = "/".join(src.split(os.sep))
 
         utils.makedirs(os.path.dirname(output_name))
-        parser = lxml.html.HTMLParser(remove_blank_text=True)
-        doc = html5lib.html5parser.parse(data, treebuilder='lxml',
-                                         namespaceHTMLElements=False)
-        doc = lxml.html.document_fromstring(lxml.html.tostring(doc), parser)
+        doc = filters.parse_html(data)
         self.rewrite_links(doc, src, context['lang'])
-        data = b'<!DOCTYPE html>\n' + lxml.html.tostring(doc, encoding='utf8', method='html', pretty_print=True)
+        data = filters.filter_html(doc, page_filters or [])
         with open(output_name, "wb+") as post_file:
             post_file.write(data)
 
@@ -1191,22 +1235,82 @@ class Nikola(object):
         dst is the link to be mangled
         lang is used for language-sensitive URLs in link://
         url_type is used to determine final link appearance, defaulting to URL_TYPE from config
+
+        Results are memoized by the folder of the source and the
+        destination, so links repeated on a page or on pages of the same
+        folder are only mangled once, and link:// targets are resolved
+        once for the whole site.  See ``url_replacer_cache_info``.
         """
-        parsed_src = urlsplit(src)
-        src_elems = parsed_src.path.split('/')[1:]
-        dst_url = urlparse(dst)
         if lang is None:
             lang = self.default_lang
         if url_type is None:
             url_type = self.config.get('URL_TYPE')
 
+        src_info = self._url_src_cache.get(src)
+        if src_info is None:
+            parsed_src = urlsplit(src)
+            src_folder, _, src_name = parsed_src.path.rpartition('/')
+            src_info = (parsed_src, parsed_src.path.split('/')[1:],
+                        (parsed_src.scheme, parsed_src.netloc, src_folder), src_name)
+            self._url_src_cache[src] = src_info
+        parsed_src, src_elems, src_folder, src_name = src_info
+
+        # Links are relative to the folder of the source, except empty,
+        # query-only and params-only links (the source itself), and links
+        # that may point to the source (which become "#")
+        dst_name = dst.partition('#')[0].partition('?')[0].rpartition('/')[2]
+        if not src_name or not dst or dst[0] in '?;' or dst_name == src_name:
+            key = (src, dst, lang, url_type)
+        else:
+            key = (src_folder, dst, lang, url_type)
+        result = self._url_cache.get(key)
+        if result is not None:
+            self._url_cache_stats['hits'] += 1
+            return result
+        self._url_cache_stats['misses'] += 1
+
+        result = self._replace_url(parsed_src, src_elems, src, dst, lang, url_type)
+        self._url_cache[key] = result
+        return result
+
+    def url_replacer_cache_info(self):
+        """Return hits, misses, size and hit rate of the url_replacer cache."""
+        hits = self._url_cache_stats['hits']
+        misses = self._url_cache_stats['misses']
+        return {
+            'hits': hits,
+            'misses': misses,
+            'size': len(self._url_cache),
+            'hit_rate': hits / float(hits + misses) if hits + misses else 0.0,
+        }
+
+    def _clear_url_caches(self):
+        """Forget memoized url_replacer results and link:// targets."""
+        self._url_cache = utils.LRUCache(URL_CACHE_SIZE)
+        self._url_src_cache = utils.LRUCache(URL_CACHE_SIZE)
+        self._url_link_cache = {}
+        self._url_cache_stats = {'hits': 0, 'misses': 0}
+
+    def _resolve_magic_link(self, kind, name, lang):
+        """Resolve a link:// URL, using the index of already resolved links."""
+        key = (kind, name, lang)
+        try:
+            return self._url_link_cache[key]
+        except KeyError:
+            link = self._url_link_cache[key] = self.link(kind, name, lang)
+            return link
+
+    def _replace_url(self, parsed_src, src_elems, src, dst, lang, url_type):
+        """Mangle a URL, see ``url_replacer``."""
+        dst_url = urlparse(dst)
+
         if dst_url.scheme and dst_url.scheme not in ['http', 'https', 'link']:
             return dst
 
         # Refuse to replace links that are full URLs.
         if dst_url.netloc:
             if dst_url.scheme == 'link':  # Magic link
-                dst = self.link(dst_url.netloc, dst_url.path.lstrip('/'), lang)
+                dst = self._resolve_magic_link(dst_url.netloc, dst_url.path.lstrip('/'), lang)
             # Assuming the site is served over one of these, and
             # since those are the only URLs we want to rewrite...
             else:
@@ -1558,11 +1662,24 @@ class Nikola(object):
         # Next, flatten the hierarchy
         self.category_hierarchy = utils.flatten_tree_structure(root_list)
 
-    def scan_posts(self, really=False, ignore_quit=False, quiet=False):
+    def scan_posts(self, really=False, ignore_quit=False, quiet=False, changed=None):
         """Scan all the posts.
 
         The `quiet` option is ignored.
+
+        If ``changed`` is a collection of source paths (of posts, their
+        translations or their .meta files) that were changed, added or
+        removed, and posts were already scanned, only the posts using
+        those files are scanned again, and the timeline and the other
+        post lists are updated in place.  The ``scanned`` signal then gets
+        a ``delta`` keyword argument, a dict with the ``removed`` and
+        ``added`` posts (a changed post is removed and added again); it is
+        None after a full scan.
         """
+        if changed is not None and self._scanned:
+            if self._rescan_posts(changed, ignore_quit):
+                return
+            really = True
         if self._scanned and not really:
             return
 
@@ -1578,6 +1695,10 @@ class Nikola(object):
         self.post_per_file = {}
         self.timeline = []
         self.pages = []
+        self._slugged_tags = set([])
+        self._timeline_index = None
+        self._clear_url_caches()
+        self.feedutil.clear_cache()
 
         for p in self.plugin_manager.getPluginsOfCategory('PostScanner'):
             timeline = p.plugin_object.scan()
@@ -1586,73 +1707,179 @@ class Nikola(object):
 
         quit = False
         # Classify posts per year/tag/month/whatever
-        slugged_tags = set([])
         for post in self.timeline:
-            if post.use_in_feeds:
-                self.posts.append(post)
-                self.posts_per_year[str(post.date.year)].append(post)
-                self.posts_per_month[
-                    '{0}/{1:02d}'.format(post.date.year, post.date.month)].append(post)
-                for tag in post.alltags:
-                    _tag_slugified = utils.slugify(tag)
-                    if _tag_slugified in slugged_tags:
-                        if tag not in self.posts_per_tag:
-                            # Tags that differ only in case
-                            other_tag = [existing for existing in self.posts_per_tag.keys() if utils.slugify(existing) == _tag_slugified][0]
-                            utils.LOGGER.error('You have tags that are too similar: {0} and {1}'.format(tag, other_tag))
-                            utils.LOGGER.error('Tag {0} is used in: {1}'.format(tag, post.source_path))
-                            utils.LOGGER.error('Tag {0} is used in: {1}'.format(other_tag, ', '.join([p.source_path for p in self.posts_per_tag[other_tag]])))
-                            quit = True
-                    else:
-                        slugged_tags.add(utils.slugify(tag))
-                    self.posts_per_tag[tag].append(post)
-                for lang in self.config['TRANSLATIONS'].keys():
-                    self.tags_per_language[lang].extend(post.tags_for_language(lang))
-                self._add_post_to_category(post, post.meta('category'))
+            if not self._classify_post(post):
+                quit = True
 
-            if post.is_post:
-                # unpublished posts
-                self.all_posts.append(post)
-            else:
-                self.pages.append(post)
+        # Sort everything.
+        self._sort_posts()
+        self._sort_category_hierarchy()
+        self._link_posts()
 
-            for lang in self.config['TRANSLATIONS'].keys():
-                dest = post.destination_path(lang=lang)
-                src_dest = post.destination_path(lang=lang, extension=post.source_ext())
-                if dest in self.post_per_file:
-                    utils.LOGGER.error('Two posts are trying to generate {0}: {1} and {2}'.format(
-                        dest,
-                        self.post_per_file[dest].source_path,
-                        post.source_path))
-                    quit = True
-                if (src_dest in self.post_per_file) and self.config['COPY_SOURCES']:
-                    utils.LOGGER.error('Two posts are trying to generate {0}: {1} and {2}'.format(
-                        src_dest,
-                        self.post_per_file[dest].source_path,
-                        post.source_path))
-                    quit = True
-                self.post_per_file[dest] = post
-                self.post_per_file[src_dest] = post
-                # deduplicate tags_per_language
-                self.tags_per_language[lang] = list(set(self.tags_per_language[lang]))
+        self._scanned = True
+        if not self.quiet:
+            print("done!", file=sys.stderr)
+        if quit and not ignore_quit:
+            sys.exit(1)
+        signal('scanned').send(self, delta=None)
 
-        # Sort everything.
+    def _rescan_posts(self, changed, ignore_quit=False):
+        """Scan again only the posts using the changed source paths.
+
+        Returns False if a post scanner cannot do that, and everything
+        needs to be scanned again.
+        """
+        changed = set(os.path.normpath(path) for path in changed)
+        new_posts = []
+        for p in self.plugin_manager.getPluginsOfCategory('PostScanner'):
+            posts = p.plugin_object.rescan(changed)
+            if posts is None:
+                return False
+            new_posts.extend(posts)
+
+        new_sources = set(post.source_path for post in new_posts)
+        removed = [post for post in self.timeline
+                   if post.source_path in new_sources or changed.intersection(self._post_source_files(post))]
+        for post in removed:
+            self._unclassify_post(post)
+            self.timeline.remove(post)
+
+        # The category tree was sorted into a list; it is rebuilt below
+        self.category_hierarchy = {}
+        quit = False
+        for post in new_posts:
+            self.timeline.append(post)
+            if not self._classify_post(post):
+                quit = True
+
+        self._sort_posts()
+        # Rebuild the category tree from the remaining categories
+        self.category_hierarchy = {}
+        for category_name in self.posts_per_category:
+            subtree = self.category_hierarchy
+            for current in self.parse_category_name(category_name):
+                subtree = subtree.setdefault(current, {})
+        self._sort_category_hierarchy()
+        self._link_posts()
+        self._timeline_index = None
+        self._clear_url_caches()
+        self.feedutil.clear_cache()
+
+        if quit and not ignore_quit:
+            sys.exit(1)
+        signal('scanned').send(self, delta={'removed': removed, 'added': new_posts})
+        return True
 
+    def _post_source_files(self, post):
+        """Return the normalized paths of all the source files of a post."""
+        paths = [post.source_path, post.metadata_path]
+        for lang in self.config['TRANSLATIONS']:
+            paths.append(utils.get_translation_candidate(self.config, post.source_path, lang))
+            paths.append(utils.get_translation_candidate(self.config, post.metadata_path, lang))
+        return set(os.path.normpath(path) for path in paths)
+
+    def _classify_post(self, post):
+        """Add a post to the post lists, tags, categories and such.
+
+        Returns False if the post conflicts with other posts.
+        """
+        ok = True
+        if post.use_in_feeds:
+            self.posts.append(post)
+            self.posts_per_year[str(post.date.year)].append(post)
+            self.posts_per_month[
+                '{0}/{1:02d}'.format(post.date.year, post.date.month)].append(post)
+            for tag in post.alltags:
+                _tag_slugified = utils.slugify(tag)
+                if _tag_slugified in self._slugged_tags:
+                    if tag not in self.posts_per_tag:
+                        # Tags that differ only in case
+                        other_tag = [existing for existing in self.posts_per_tag.keys() if utils.slugify(existing) == _tag_slugified][0]
+                        utils.LOGGER.error('You have tags that are too similar: {0} and {1}'.format(tag, other_tag))
+                        utils.LOGGER.error('Tag {0} is used in: {1}'.format(tag, post.source_path))
+                        utils.LOGGER.error('Tag {0} is used in: {1}'.format(other_tag, ', '.join([p.source_path for p in self.posts_per_tag[other_tag]])))
+                        ok = False
+                else:
+                    self._slugged_tags.add(utils.slugify(tag))
+                self.posts_per_tag[tag].append(post)
+            for lang in self.config['TRANSLATIONS'].keys():
+                self.tags_per_language[lang].extend(post.tags_for_language(lang))
+            self._add_post_to_category(post, post.meta('category'))
+
+        if post.is_post:
+            # unpublished posts
+            self.all_posts.append(post)
+        else:
+            self.pages.append(post)
+
+        for lang in self.config['TRANSLATIONS'].keys():
+            dest = post.destination_path(lang=lang)
+            src_dest = post.destination_path(lang=lang, extension=post.source_ext())
+            if dest in self.post_per_file:
+                utils.LOGGER.error('Two posts are trying to generate {0}: {1} and {2}'.format(
+                    dest,
+                    self.post_per_file[dest].source_path,
+                    post.source_path))
+                ok = False
+            if (src_dest in self.post_per_file) and self.config['COPY_SOURCES']:
+                utils.LOGGER.error('Two posts are trying to generate {0}: {1} and {2}'.format(
+                    src_dest,
+                    self.post_per_file[dest].source_path,
+                    post.source_path))
+                ok = False
+            self.post_per_file[dest] = post
+            self.post_per_file[src_dest] = post
+            # deduplicate tags_per_language
+            self.tags_per_language[lang] = list(set(self.tags_per_language[lang]))
+        return ok
+
+    def _unclassify_post(self, post):
+        """Remove a post from everything _classify_post added it to."""
+        def remove_from(mapping, key):
+            if post in mapping.get(key, []):
+                mapping[key].remove(post)
+                if not mapping[key]:
+                    del mapping[key]
+
+        if post in self.posts:
+            self.posts.remove(post)
+            remove_from(self.posts_per_year, str(post.date.year))
+            remove_from(self.posts_per_month, '{0}/{1:02d}'.format(post.date.year, post.date.month))
+            for tag in post.alltags:
+                remove_from(self.posts_per_tag, tag)
+                if tag not in self.posts_per_tag:
+                    self._slugged_tags.discard(utils.slugify(tag))
+            for lang in self.config['TRANSLATIONS'].keys():
+                still_used = set(tag for p in self.posts for tag in p.tags_for_language(lang))
+                self.tags_per_language[lang] = [tag for tag in self.tags_per_language[lang] if tag in still_used]
+            category_path = self.parse_category_name(post.meta('category'))
+            for i in range(len(category_path)):
+                remove_from(self.posts_per_category, self.category_path_to_category_name(category_path[:i + 1]))
+
+        if post in self.all_posts:
+            self.all_posts.remove(post)
+        if post in self.pages:
+            self.pages.remove(post)
+
+        for dest, p in list(self.post_per_file.items()):
+            if p is post:
+                del self.post_per_file[dest]
+
+    def _sort_posts(self):
+        """Sort the timeline and the post lists, newest first."""
         for thing in self.timeline, self.posts, self.all_posts, self.pages:
             thing.sort(key=lambda p: (p.date, p.source_path))
             thing.reverse()
-        self._sort_category_hierarchy()
 
+    def _link_posts(self):
+        """Set the previous and next post of each post."""
+        if self.posts:
+            self.posts[0].next_post = None
+            self.posts[-1].prev_post = None
         for i, p in enumerate(self.posts[1:]):
             p.next_post = self.posts[i]
         for i, p in enumerate(self.posts[:-1]):
             p.prev_post = self.posts[i + 1]
-        self._scanned = True
-        if not self.quiet:
-            print("done!", file=sys.stderr)
-        if quit and not ignore_quit:
-            sys.exit(1)
-        signal('scanned').send(self)
 
     def generic_page_renderer(self, lang, post, filters, context=None):
         """Render post fragments to final HTML pages."""
@@ -1799,18 +2026,16 @@ class Nikola(object):
         kw['site_url'] = self.config['SITE_URL']
         kw['base_url'] = self.config['BASE_URL']
 
-        # Split in smaller lists
-        lists = []
+        # Split in smaller lists (posts may be a list or a TimelineView)
+        per_page = kw["index_display_post_count"]
         if kw["indexes_static"]:
-            lists.append(posts[:kw["index_display_post_count"]])
-            posts = posts[kw["index_display_post_count"]:]
-            while posts:
-                lists.append(posts[-kw["index_display_post_count"]:])
-                posts = posts[:-kw["index_display_post_count"]]
+            # The first page has the newest posts, the others are filled
+            # from the oldest posts on, so they do not change
+            lists = [posts[:per_page]]
+            lists.extend(posts[max(per_page, end - per_page):end]
+                         for end in range(len(posts), per_page, -per_page))
         else:
-            while posts:
-                lists.append(posts[:kw["index_display_post_count"]])
-                posts = posts[kw["index_display_post_count"]:]
+            lists = [posts[start:start + per_page] for start in range(0, len(posts), per_page)]
         num_pages = len(lists)
         if kw['generate_atom'] or kw['generate_rss']:
             description = context_source.get('description', None)
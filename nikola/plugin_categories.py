@@ -89,6 +89,14 @@ class PostScanner(BasePlugin):
         """Create a list of posts from some source. Returns a list of Post objects."""
         raise NotImplementedError()
 
+    def rescan(self, paths):
+        """Create the posts that use any of the given (changed) source paths.
+
+        Returns a list of Post objects, or None if the scanner cannot do
+        that, in which case everything is scanned again.
+        """
+        return None
+
 
 class Command(BasePlugin, DoitCommand):
     """Doit command implementation."""
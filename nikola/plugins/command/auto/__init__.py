@@ -34,7 +34,9 @@ import os
 import re
 import subprocess
 import sys
+import threading
 import time
+import traceback
 try:
     from urlparse import urlparse
     from urllib2 import unquote
@@ -45,6 +47,8 @@ from wsgiref.simple_server import make_server
 import wsgiref.util
 
 from blinker import signal
+from doit.cmd_base import TaskLoader
+from doit.doit_cmd import DoitMain
 try:
     from ws4py.websocket import WebSocket
     from ws4py.server.wsgirefserver import WSGIServer, WebSocketWSGIRequestHandler, WebSocketWSGIHandler
@@ -67,6 +71,8 @@ from nikola.utils import dns_sd, req_missing, get_logger, get_theme_path, STDERR
 LRJS_PATH = os.path.join(os.path.dirname(__file__), 'livereload.js')
 error_signal = signal('error')
 refresh_signal = signal('refresh')
+# Seconds without file system events before rebuilding
+DEBOUNCE_DELAY = 0.2
 
 ERROR_N = '''<html>
 <head>
@@ -127,6 +133,13 @@ class CommandAuto(Command):
             'type': bool,
             'help': 'Disable the server, automate rebuilds only'
         },
+        {
+            'name': 'subprocess',
+            'long': 'subprocess',
+            'default': False,
+            'type': bool,
+            'help': 'Rebuild the site in a new "nikola build" process on every change (slower)'
+        },
     ]
 
     def _execute(self, options, args):
@@ -145,8 +158,21 @@ class CommandAuto(Command):
         if self.site.configuration_filename != 'conf.py':
             self.cmd_arguments = ['--conf=' + self.site.configuration_filename] + self.cmd_arguments
 
+        # Rebuild with the already loaded site, unless the configuration
+        # or the plugins change (see do_rebuild)
+        self.in_process = not options.get('subprocess')
+        self.rebuild_lock = threading.Lock()
+        self.pending_lock = threading.Lock()
+        self.pending_paths = set([])
+        self.rebuild_timer = None
+        self.conf_path = os.path.abspath(self.site.configuration_filename or 'conf.py')
+        self.plugins_path = os.path.abspath('plugins')
+
         # Run an initial build so we are up-to-date
-        subprocess.call(self.cmd_arguments)
+        if self.in_process:
+            self.build_in_process()
+        else:
+            subprocess.call(self.cmd_arguments)
 
         port = options and options.get('port')
         self.snippet = '''<script>document.write('<script src="http://'
@@ -258,7 +284,11 @@ class CommandAuto(Command):
                 os.kill(os.getpid(), 15)
 
     def do_rebuild(self, event):
-        """Rebuild the site."""
+        """Schedule a rebuild of the site.
+
+        Events are coalesced: the site is rebuilt once no new events came
+        for DEBOUNCE_DELAY seconds, and never by two threads at once.
+        """
         # Move events have a dest_path, some editors like gedit use a
         # move on larger save operations for write protection
         event_path = event.dest_path if hasattr(event, 'dest_path') else event.src_path
@@ -269,7 +299,62 @@ class CommandAuto(Command):
                 event_path.endswith(('.pyc', '.pyo', '.pyd')) or
                 os.path.isdir(event_path)):  # Skip on folders, these are usually duplicates
             return
-        self.logger.info('REBUILDING SITE (from {0})'.format(event_path))
+        with self.pending_lock:
+            self.pending_paths.add(event_path)
+            if event_path != event.src_path:  # The old path is gone
+                self.pending_paths.add(event.src_path)
+            if self.rebuild_timer is not None:
+                self.rebuild_timer.cancel()
+            self.rebuild_timer = threading.Timer(DEBOUNCE_DELAY, self.run_rebuild)
+            self.rebuild_timer.daemon = True
+            self.rebuild_timer.start()
+
+    def run_rebuild(self):
+        """Rebuild the site for the changes seen so far."""
+        with self.rebuild_lock:
+            with self.pending_lock:
+                paths = self.pending_paths
+                self.pending_paths = set([])
+                self.rebuild_timer = None
+            if not paths:  # Already handled by a previous rebuild
+                return
+            self.logger.info('REBUILDING SITE (from {0})'.format(', '.join(sorted(paths))))
+            if self.in_process and any(path == self.conf_path or path.startswith(self.plugins_path + os.sep)
+                                       for path in paths):
+                self.logger.warn('The configuration or the plugins changed, the site is now rebuilt '
+                                 'in a new process every time; restart "nikola auto" to avoid that.')
+                self.in_process = False
+            if not self.in_process or not self.build_in_process(paths):
+                self.build_in_subprocess()
+
+    def build_in_process(self, paths=None):
+        """Build the site with the already loaded site object.
+
+        If ``paths`` are given, only the posts using them are scanned
+        again, and the tasks depending on them run before the others, so
+        the changed pages are refreshed first.
+
+        Returns False if the build could not be done in this process.
+        """
+        try:
+            changed = None
+            if paths:
+                changed = [os.path.relpath(path) for path in paths]
+                self.site.scan_posts(changed=changed, ignore_quit=True)
+            tasks, doit_config = self.site.doit.task_loader.load_tasks(None, {}, [])
+            first = affected_tasks(tasks, changed) if changed else []
+            loader = LoadedTaskLoader(tasks, doit_config)
+            result = DoitMain(loader).run(['run'] + first + list(doit_config['default_tasks']))
+        # doit exits on some errors, which must not end the rebuild thread
+        except (Exception, SystemExit):
+            self.logger.error('Cannot rebuild the site in this process:\n{0}'.format(traceback.format_exc()))
+            return False
+        if result != 0:
+            error_signal.send(error='Build failed, see the output of "nikola auto" for details.')
+        return True
+
+    def build_in_subprocess(self):
+        """Rebuild the site in a new "nikola build" process."""
         p = subprocess.Popen(self.cmd_arguments, stderr=subprocess.PIPE)
         error = p.stderr.read()
         errord = error.decode('utf-8')
@@ -341,6 +426,42 @@ class CommandAuto(Command):
         return data
 
 
+def affected_tasks(tasks, paths):
+    """Return the names of the tasks depending on the given paths.
+
+    Tasks depending on the targets of those tasks are included, and so on.
+    """
+    paths = set(os.path.normpath(path) for path in paths)
+    names = []
+    remaining = [task for task in tasks if task.file_dep]
+    found = True
+    while found:
+        found = False
+        rest = []
+        for task in remaining:
+            if paths.intersection(os.path.normpath(dep) for dep in task.file_dep):
+                names.append(task.name)
+                paths.update(os.path.normpath(target) for target in task.targets)
+                found = True
+            else:
+                rest.append(task)
+        remaining = rest
+    return names
+
+
+class LoadedTaskLoader(TaskLoader):
+    """A doit task loader for tasks that were already generated."""
+
+    def __init__(self, tasks, doit_config):
+        """Initialize the loader."""
+        self.tasks = tasks
+        self.doit_config = doit_config
+
+    def load_tasks(self, cmd, opt_values, pos_args):
+        """Return the tasks."""
+        return self.tasks, self.doit_config
+
+
 pending = []
 
 
@@ -28,9 +28,13 @@
 
 from __future__ import print_function
 from collections import defaultdict
+import io
+import json
+from multiprocessing.pool import ThreadPool
 import os
 import re
 import sys
+import threading
 import time
 try:
     from urllib import unquote
@@ -41,9 +45,10 @@ except ImportError:
 from doit.loader import generate_tasks
 import lxml.html
 import requests
+from requests.adapters import HTTPAdapter
 
 from nikola.plugin_categories import Command
-from nikola.utils import get_logger, STDERR_HANDLER
+from nikola.utils import get_logger, fork_pool, write_atomically, STDERR_HANDLER
 
 
 def _call_nikola_list(site, cache=None):
@@ -99,6 +104,161 @@ def fs_relpath_from_url_path(url_path):
     return url_path
 
 
+def extract_links(filename):
+    """Return the link targets in a generated file, or None if its type is not supported."""
+    if '.html' == filename[-5:]:
+        d = lxml.html.fromstring(open(filename, 'rb').read())
+        extra_objs = lxml.html.fromstring('<html/>')
+
+        # Turn elements with a srcset attribute into individual img elements with src attributes
+        for obj in list(d.xpath('(*//img|*//source)')):
+            if 'srcset' in obj.attrib:
+                for srcset_item in obj.attrib['srcset'].split(','):
+                    extra_objs.append(lxml.etree.Element('img', src=srcset_item.strip().split(' ')[0]))
+        link_elements = list(d.iterlinks()) + list(extra_objs.iterlinks())
+    # Extract links from XML formats to minimal HTML, allowing those to go through the link checks
+    elif '.atom' == filename[-5:]:
+        d = lxml.etree.parse(filename)
+        link_elements = lxml.html.fromstring('<html/>')
+        for elm in d.findall('*//{http://www.w3.org/2005/Atom}link'):
+            feed_link = elm.attrib['href'].split('?')[0].strip()  # strip FEED_LINKS_APPEND_QUERY
+            link_elements.append(lxml.etree.Element('a', href=feed_link))
+        link_elements = list(link_elements.iterlinks())
+    elif filename.endswith('sitemap.xml') or filename.endswith('sitemapindex.xml'):
+        d = lxml.etree.parse(filename)
+        link_elements = lxml.html.fromstring('<html/>')
+        for elm in d.getroot().findall("*//{http://www.sitemaps.org/schemas/sitemap/0.9}loc"):
+            link_elements.append(lxml.etree.Element('a', href=elm.text.strip()))
+        link_elements = list(link_elements.iterlinks())
+    else:  # unsupported file type
+        return None
+    return [link[2] for link in link_elements]
+
+
+def _extract_links_in_worker(filename):
+    """Extract links in a worker process; errors are reported by the main process."""
+    try:
+        return extract_links(filename)
+    except Exception:
+        return False
+
+
+class RemoteLinkChecker(object):
+    """Check remote links concurrently.
+
+    All requests share a pool of connections, at most ``per_host``
+    requests go to the same host at the same time, and working links
+    checked less than ``ttl`` seconds ago are read from the cache in
+    ``cache_path`` (if any) instead of being checked again.
+
+    Results are dicts with the final HTTP ``status``, the ``redirect``
+    status (None if there was no redirect), the final ``url`` and an
+    ``error`` message if the link could not be checked at all.
+    """
+
+    headers = {'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64; rv:45.0) Gecko/20100101 Firefox/45.0 (Nikola)'}  # I’m a real boy!
+
+    def __init__(self, threads=8, per_host=2, ttl=0, cache_path=None, delay=0.5):
+        """Set up the checker."""
+        self.threads = max(threads, 1)
+        self.per_host = max(per_host, 1)
+        self.ttl = ttl
+        self.cache_path = cache_path
+        self.delay = delay
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.threads, pool_maxsize=self.threads)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._host_locks = {}
+        self._lock = threading.Lock()
+        self._cache = None
+
+    def check(self, targets):
+        """Check remote links, returning a dict of results by link."""
+        results = {}
+        cache = self._load_cache()
+        now = time.time()
+        missing = []
+        for target in targets:
+            if target in results:
+                continue
+            cached = cache.get(target)
+            if cached is not None and now - cached['time'] < self.ttl:
+                results[target] = cached['result']
+            else:
+                results[target] = None
+                missing.append(target)
+
+        if len(missing) > 1 and self.threads > 1:
+            pool = ThreadPool(min(self.threads, len(missing)))
+            try:
+                checked = pool.map(self.check_one, missing)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            checked = [self.check_one(target) for target in missing]
+
+        for target, result in zip(missing, checked):
+            results[target] = result
+            if result['error'] is None and result['status'] <= 399:
+                cache[target] = {'time': now, 'result': result}
+        self._save_cache()
+        return results
+
+    def check_one(self, target):
+        """Check a remote link."""
+        result = {'status': None, 'redirect': None, 'url': target, 'error': None}
+        with self._host_lock(urlparse(target).netloc):
+            try:
+                resp = self.session.head(target, headers=self.headers, allow_redirects=False)
+
+                # Retry client errors (4xx) as GET requests because many servers are broken
+                if resp.status_code >= 400 and resp.status_code <= 499:
+                    time.sleep(self.delay)
+                    resp = self.session.get(target, headers=self.headers, allow_redirects=False)
+
+                # Follow redirects and see where they lead
+                if resp.status_code in [301, 302, 307, 308]:
+                    result['redirect'] = resp.status_code
+                    time.sleep(self.delay)
+                    # Known redirects are retested using GET because IIS servers otherwise get HEADaches
+                    resp = self.session.get(target, headers=self.headers, allow_redirects=True)
+                    result['url'] = resp.url
+                result['status'] = resp.status_code
+            except Exception as exc:
+                result['error'] = '{0}'.format(exc)
+        return result
+
+    def _host_lock(self, host):
+        """Get the semaphore limiting concurrent requests to a host."""
+        with self._lock:
+            if host not in self._host_locks:
+                self._host_locks[host] = threading.BoundedSemaphore(self.per_host)
+            return self._host_locks[host]
+
+    def _load_cache(self):
+        """Load the results of previous checks."""
+        if self._cache is None:
+            self._cache = {}
+            if self.cache_path and self.ttl > 0:
+                try:
+                    with io.open(self.cache_path, 'r', encoding='utf-8') as inf:
+                        self._cache = json.load(inf)
+                except (IOError, OSError, ValueError):
+                    pass
+        return self._cache
+
+    def _save_cache(self):
+        """Save the results of working links, forgetting expired ones."""
+        if not self.cache_path or self.ttl <= 0:
+            return
+        now = time.time()
+        cache = dict((target, entry) for target, entry in self._cache.items()
+                     if now - entry['time'] < self.ttl)
+        write_atomically(self.cache_path, json.dumps(cache))
+
+
 class CommandCheck(Command):
     """Check the generated site."""
 
@@ -179,16 +339,71 @@ class CommandCheck(Command):
 
     existing_targets = set([])
     checked_remote_targets = {}
+    remote_results = {}
+    remote_checker = None
     cache = {}
 
-    def analyze(self, fname, find_sources=False, check_remote=False):
-        """Analyze links on a page."""
-        rv = False
+    def _setup_link_checks(self):
+        """Prepare what analyze needs, once."""
         self.whitelist = [re.compile(x) for x in self.site.config['LINK_CHECK_WHITELIST']]
         self.internal_redirects = [urljoin('/', _[0]) for _ in self.site.config['REDIRECTIONS']]
-        base_url = urlparse(self.site.config['BASE_URL'])
         self.existing_targets.add(self.site.config['SITE_URL'])
         self.existing_targets.add(self.site.config['BASE_URL'])
+        if self.remote_checker is None:
+            self.remote_checker = RemoteLinkChecker(
+                self.site.config['LINK_CHECK_THREADS'],
+                self.site.config['LINK_CHECK_PER_HOST'],
+                self.site.config['LINK_CHECK_CACHE_TTL'],
+                os.path.join(self.site.config['CACHE_FOLDER'], 'check_links.json'))
+
+    def _remote_target(self, target):
+        """Return a link target as analyze checks it, and whether it is a remote link."""
+        base_url = urlparse(self.site.config['BASE_URL'])
+        url_type = self.site.config['URL_TYPE']
+        target = urldefrag(target)[0]
+        # absolute URL to root-relative
+        if target.startswith(base_url.geturl()):
+            target = target.replace(base_url.geturl(), '/')
+        parsed = urlparse(target)
+        # Absolute links to other domains, skip
+        # Absolute links when using only paths, skip.
+        remote = ((parsed.scheme or target.startswith('//')) and parsed.netloc != base_url.netloc) or \
+            ((parsed.scheme or target.startswith('//')) and url_type in ('rel_path', 'full_path'))
+        return target, bool(remote)
+
+    def _is_example(self, target):
+        """Tell if a link goes to an example domain."""
+        return any([urlparse(target).netloc.endswith(_) for _ in ['example.com', 'example.net', 'example.org']])
+
+    def check_remote_links(self, links):
+        """Check all the remote links in a list of link targets at once.
+
+        Results are used by analyze, instead of checking links one by one.
+        """
+        self._setup_link_checks()
+        targets = []
+        for target in links:
+            if target == "#" or self._is_example(urldefrag(target)[0]):
+                continue
+            target, remote = self._remote_target(target)
+            if not remote or urlparse(target).scheme not in ["http", "https"]:
+                continue
+            if target in self.remote_results or any(re.search(_, target) for _ in self.whitelist):
+                continue
+            targets.append(target)
+        if targets:
+            self.logger.info("Checking {0} remote links".format(len(set(targets))))
+            self.remote_results.update(self.remote_checker.check(targets))
+
+    def analyze(self, fname, find_sources=False, check_remote=False, links=None):
+        """Analyze links on a page.
+
+        ``links`` are the link targets in the page, if they were already
+        extracted.
+        """
+        rv = False
+        self._setup_link_checks()
+        base_url = urlparse(self.site.config['BASE_URL'])
         url_type = self.site.config['URL_TYPE']
 
         deps = {}
@@ -211,47 +426,20 @@ class CommandCheck(Command):
                 # Quietly ignore files that don’t exist; use `nikola check -f` instead (Issue #1831)
                 return False
 
-            if '.html' == fname[-5:]:
-                d = lxml.html.fromstring(open(filename, 'rb').read())
-                extra_objs = lxml.html.fromstring('<html/>')
-
-                # Turn elements with a srcset attribute into individual img elements with src attributes
-                for obj in list(d.xpath('(*//img|*//source)')):
-                    if 'srcset' in obj.attrib:
-                        for srcset_item in obj.attrib['srcset'].split(','):
-                            extra_objs.append(lxml.etree.Element('img', src=srcset_item.strip().split(' ')[0]))
-                link_elements = list(d.iterlinks()) + list(extra_objs.iterlinks())
-            # Extract links from XML formats to minimal HTML, allowing those to go through the link checks
-            elif '.atom' == filename[-5:]:
-                d = lxml.etree.parse(filename)
-                link_elements = lxml.html.fromstring('<html/>')
-                for elm in d.findall('*//{http://www.w3.org/2005/Atom}link'):
-                    feed_link = elm.attrib['href'].split('?')[0].strip()  # strip FEED_LINKS_APPEND_QUERY
-                    link_elements.append(lxml.etree.Element('a', href=feed_link))
-                link_elements = list(link_elements.iterlinks())
-            elif filename.endswith('sitemap.xml') or filename.endswith('sitemapindex.xml'):
-                d = lxml.etree.parse(filename)
-                link_elements = lxml.html.fromstring('<html/>')
-                for elm in d.getroot().findall("*//{http://www.sitemaps.org/schemas/sitemap/0.9}loc"):
-                    link_elements.append(lxml.etree.Element('a', href=elm.text.strip()))
-                link_elements = list(link_elements.iterlinks())
-            else:  # unsupported file type
+            if links is None:
+                links = extract_links(filename)
+            if links is None:  # unsupported file type
                 return False
 
-            for l in link_elements:
-                target = l[2]
+            for target in links:
                 if target == "#":
                     continue
-                target = urldefrag(target)[0]
 
-                if any([urlparse(target).netloc.endswith(_) for _ in ['example.com', 'example.net', 'example.org']]):
-                    self.logger.info("Not testing example address \"{0}\".".format(target))
+                if self._is_example(urldefrag(target)[0]):
+                    self.logger.info("Not testing example address \"{0}\".".format(urldefrag(target)[0]))
                     continue
 
-                # absolute URL to root-relative
-                if target.startswith(base_url.geturl()):
-                    target = target.replace(base_url.geturl(), '/')
-
+                target, remote = self._remote_target(target)
                 parsed = urlparse(target)
 
                 # Warn about links from https to http (mixed-security)
@@ -260,21 +448,17 @@ class CommandCheck(Command):
 
                 # Link to an internal REDIRECTIONS page
                 if target in self.internal_redirects:
-                    redir_status_code = 301
                     redir_target = [_dest for _target, _dest in self.site.config['REDIRECTIONS'] if urljoin('/', _target) == target][0]
                     self.logger.warn("Remote link moved PERMANENTLY to \"{0}\" and should be updated in {1}: {2} [HTTP: 301]".format(redir_target, filename, target))
 
-                # Absolute links to other domains, skip
-                # Absolute links when using only paths, skip.
-                if ((parsed.scheme or target.startswith('//')) and parsed.netloc != base_url.netloc) or \
-                        ((parsed.scheme or target.startswith('//')) and url_type in ('rel_path', 'full_path')):
+                if remote:
                     if not check_remote or parsed.scheme not in ["http", "https"]:
                         continue
                     if target in self.checked_remote_targets:  # already checked this exact target
                         if self.checked_remote_targets[target] in [301, 308]:
                             self.logger.warn("Remote link PERMANENTLY redirected in {0}: {1} [Error {2}]".format(filename, target, self.checked_remote_targets[target]))
                         elif self.checked_remote_targets[target] in [302, 307]:
-                            self.logger.notice("Remote link temporarily redirected in {1}: {2} [HTTP: {3}]".format(filename, target, self.checked_remote_targets[target]))
+                            self.logger.notice("Remote link temporarily redirected in {0}: {1} [HTTP: {2}]".format(filename, target, self.checked_remote_targets[target]))
                         elif self.checked_remote_targets[target] > 399:
                             self.logger.error("Broken link in {0}: {1} [Error {2}]".format(filename, target, self.checked_remote_targets[target]))
                         continue
@@ -283,38 +467,32 @@ class CommandCheck(Command):
                     if any(re.search(_, target) for _ in self.whitelist):
                         continue
 
-                    # Check the remote link works
-                    req_headers = {'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64; rv:45.0) Gecko/20100101 Firefox/45.0 (Nikola)'}  # I’m a real boy!
-                    resp = requests.head(target, headers=req_headers, allow_redirects=False)
-
-                    # Retry client errors (4xx) as GET requests because many servers are broken
-                    if resp.status_code >= 400 and resp.status_code <= 499:
-                        time.sleep(0.5)
-                        resp = requests.get(target, headers=req_headers, allow_redirects=False)
-
-                    # Follow redirects and see where they lead, redirects to errors will be reported twice
-                    if resp.status_code in [301, 302, 307, 308]:
-                        redir_status_code = resp.status_code
-                        time.sleep(0.5)
-                        # Known redirects are retested using GET because IIS servers otherwise get HEADaches
-                        resp = requests.get(target, headers=req_headers, allow_redirects=True)
+                    # Check the remote link works (unless check_remote_links already did)
+                    if target not in self.remote_results:
+                        self.remote_results.update(self.remote_checker.check([target]))
+                    result = self.remote_results[target]
+
+                    if result['error'] is not None:
+                        self.logger.warn("Could not check remote link in {0}: {1} [{2}]".format(filename, target, result['error']))
+                        continue
+
+                    # Redirects to errors will be reported twice
+                    redir_status_code = result['redirect']
+                    if redir_status_code is not None:
                         # Permanent redirects should be updated
                         if redir_status_code in [301, 308]:
-                            self.logger.warn("Remote link moved PERMANENTLY to \"{0}\" and should be updated in {1}: {2} [HTTP: {3}]".format(resp.url, filename, target, redir_status_code))
+                            self.logger.warn("Remote link moved PERMANENTLY to \"{0}\" and should be updated in {1}: {2} [HTTP: {3}]".format(result['url'], filename, target, redir_status_code))
                         if redir_status_code in [302, 307]:
-                            self.logger.notice("Remote link temporarily redirected to \"{0}\" in {1}: {2} [HTTP: {3}]".format(resp.url, filename, target, redir_status_code))
-                        self.checked_remote_targets[resp.url] = resp.status_code
+                            self.logger.notice("Remote link temporarily redirected to \"{0}\" in {1}: {2} [HTTP: {3}]".format(result['url'], filename, target, redir_status_code))
+                        self.checked_remote_targets[result['url']] = result['status']
                         self.checked_remote_targets[target] = redir_status_code
                     else:
-                        self.checked_remote_targets[target] = resp.status_code
+                        self.checked_remote_targets[target] = result['status']
 
-                    if resp.status_code > 399:  # Error
-                        self.logger.error("Broken link in {0}: {1} [Error {2}]".format(filename, target, resp.status_code))
-                        continue
-                    elif resp.status_code <= 399:  # The address leads *somewhere* that is not an error
-                        self.logger.debug("Successfully checked remote link in {0}: {1} [HTTP: {2}]".format(filename, target, resp.status_code))
-                        continue
-                    self.logger.warn("Could not check remote link in {0}: {1} [Unknown problem]".format(filename, target))
+                    if result['status'] > 399:  # Error
+                        self.logger.error("Broken link in {0}: {1} [Error {2}]".format(filename, target, result['status']))
+                    else:  # The address leads *somewhere* that is not an error
+                        self.logger.debug("Successfully checked remote link in {0}: {1} [HTTP: {2}]".format(filename, target, result['status']))
                     continue
 
                 if url_type == 'rel_path':
@@ -356,6 +534,29 @@ class CommandCheck(Command):
             self.logger.error(u"Error with: {0} {1}".format(filename, exc))
         return rv
 
+    def extract_all_links(self, fnames):
+        """Extract the links of many files, in worker processes if LINK_CHECK_PROCESSES > 1.
+
+        Only parsing runs in the workers: the links are then checked by
+        analyze, in this process.  Returns a dict of link lists by file name.  Files that cannot be
+        parsed are left out, so analyze parses them again and reports the
+        problem.
+        """
+        fnames = [fname for fname in fnames
+                  if not fname.startswith(self.site.config['CACHE_FOLDER']) and os.path.exists(fname)]
+        processes = self.site.config['LINK_CHECK_PROCESSES']
+        results = None
+        pool = fork_pool(processes) if len(fnames) > 1 else None
+        if pool is not None:
+            try:
+                results = pool.map(_extract_links_in_worker, fnames, chunksize=16)
+            finally:
+                pool.close()
+                pool.join()
+        if results is None:
+            results = [_extract_links_in_worker(fname) for fname in fnames]
+        return dict((fname, links) for fname, links in zip(fnames, results) if links is not False)
+
     def scan_links(self, find_sources=False, check_remote=False):
         """Check links on the site."""
         self.logger.info("Checking Links:")
@@ -368,17 +569,20 @@ class CommandCheck(Command):
         if urlparse(self.site.config['BASE_URL']).netloc == 'example.com':
             self.logger.error("You've not changed the SITE_URL (or BASE_URL) setting from \"example.com\"!")
 
-        for fname in _call_nikola_list(self.site, self.cache)[0]:
-            if fname.startswith(output_folder):
-                if '.html' == fname[-5:]:
-                    if self.analyze(fname, find_sources, check_remote):
-                        failure = True
-                if '.atom' == fname[-5:]:
-                    if self.analyze(fname, find_sources, False):
-                        failure = True
-                if fname.endswith('sitemap.xml') or fname.endswith('sitemapindex.xml'):
-                    if self.analyze(fname, find_sources, False):
-                        failure = True
+        fnames = [fname for fname in _call_nikola_list(self.site, self.cache)[0]
+                  if fname.startswith(output_folder) and
+                  ('.html' == fname[-5:] or '.atom' == fname[-5:] or
+                   fname.endswith('sitemap.xml') or fname.endswith('sitemapindex.xml'))]
+        all_links = self.extract_all_links(fnames)
+
+        if check_remote:
+            # Remote links are only checked in HTML files
+            self.check_remote_links([target for fname in fnames if '.html' == fname[-5:]
+                                     for target in all_links.get(fname) or []])
+
+        for fname in fnames:
+            if self.analyze(fname, find_sources, check_remote and '.html' == fname[-5:], all_links.get(fname)):
+                failure = True
         if not failure:
             self.logger.info("All links checked.")
         return failure
@@ -28,7 +28,9 @@
 
 from __future__ import unicode_literals, print_function
 import io
+import json
 import os
+import re
 import sys
 
 try:
@@ -51,6 +53,146 @@ except ImportError:
 from nikola.plugin_categories import PageCompiler
 from nikola.utils import makedirs, req_missing, get_logger, STDERR_HANDLER
 
+_WHITESPACE = re.compile(br'[ \t\n\r]*')
+_STRUCTURE = re.compile(br'[\[\]{}]')
+_SCALAR_END = re.compile(br'[,\]}\s]')
+
+
+class _JSONStream(object):
+    """Read a JSON document from a binary file in chunks, skipping values without decoding them.
+
+    Only ASCII bytes matter to the structure of a JSON document, and
+    they never appear inside multibyte UTF-8 characters, so the bytes
+    are scanned without decoding them.
+    """
+
+    def __init__(self, stream, chunk_size=1 << 20):
+        """Initialize the reader."""
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.buf = b''
+        self.pos = 0
+        # Start of the text being captured, which is kept in the buffer
+        self.mark = None
+
+    def fill(self):
+        """Read another chunk, dropping what was consumed; return False at the end."""
+        chunk = self.stream.read(self.chunk_size)
+        if not chunk:
+            return False
+        keep = self.pos if self.mark is None else self.mark
+        self.buf = self.buf[keep:] + chunk
+        self.pos -= keep
+        if self.mark is not None:
+            self.mark -= keep
+        return True
+
+    def peek(self):
+        """Skip whitespace and return the next byte (b'' at the end)."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos:self.pos + 1]
+            if not self.fill():
+                return b''
+
+    def expect(self, char):
+        """Consume the next byte, which must be char."""
+        if self.peek() != char:
+            raise ValueError('Expected {0!r} in notebook'.format(char))
+        self.pos += 1
+
+    def skip_string(self):
+        """Skip a string (the next byte is its opening quote)."""
+        self.pos += 1
+        while True:
+            quote = self.buf.find(b'"', self.pos)
+            if quote == -1:
+                # Keep trailing backslashes, which may escape a quote
+                end = len(self.buf)
+                while end > self.pos and self.buf[end - 1:end] == b'\\':
+                    end -= 1
+                self.pos = end
+                if not self.fill():
+                    raise ValueError('Unterminated string in notebook')
+                continue
+            backslash = quote
+            while backslash > self.pos and self.buf[backslash - 1:backslash] == b'\\':
+                backslash -= 1
+            self.pos = quote + 1
+            if (quote - backslash) % 2 == 0:
+                return
+
+    def skip_value(self):
+        """Skip the next value."""
+        char = self.peek()
+        if char == b'"':
+            self.skip_string()
+        elif char in (b'[', b'{'):
+            self.pos += 1
+            depth = 1
+            while depth:
+                quote = self.buf.find(b'"', self.pos)
+                end = len(self.buf) if quote == -1 else quote
+                # No strings before the quote: count brackets up to it
+                for m in _STRUCTURE.finditer(self.buf, self.pos, end):
+                    depth += 1 if m.group() in (b'[', b'{') else -1
+                    if not depth:
+                        self.pos = m.end()
+                        return
+                self.pos = end
+                if quote != -1:
+                    self.skip_string()
+                elif not self.fill():
+                    raise ValueError('Unterminated array or object in notebook')
+        elif char:
+            while True:
+                m = _SCALAR_END.search(self.buf, self.pos)
+                if m is not None:
+                    self.pos = m.start()
+                    return
+                self.pos = len(self.buf)
+                if not self.fill():
+                    return
+        else:
+            raise ValueError('Expected a value in notebook')
+
+    def read_value(self):
+        """Read and decode the next value."""
+        self.peek()
+        self.mark = self.pos
+        self.skip_value()
+        text = self.buf[self.mark:self.pos]
+        self.mark = None
+        return json.loads(text.decode('utf-8'))
+
+
+def read_notebook_metadata(stream, chunk_size=1 << 20):
+    """Read the top-level ``metadata`` object of a notebook from a binary file.
+
+    The notebook is read in chunks and only the metadata is decoded;
+    cells (and their outputs) are skipped without building them.
+    """
+    reader = _JSONStream(stream, chunk_size)
+    if reader.peek() == b'\xef':
+        reader.expect(b'\xef')
+        reader.expect(b'\xbb')
+        reader.expect(b'\xbf')
+    reader.expect(b'{')
+    if reader.peek() == b'}':
+        return {}
+    while True:
+        if reader.peek() != b'"':
+            raise ValueError('Expected an object key in notebook')
+        key = reader.read_value()
+        reader.expect(b':')
+        if key == 'metadata':
+            return reader.read_value()
+        reader.skip_value()
+        if reader.peek() == b'}':
+            return {}
+        reader.expect(b',')
+
 
 class CompileIPynb(PageCompiler):
     """Compile IPynb into HTML."""
@@ -63,6 +205,8 @@ class CompileIPynb(PageCompiler):
     def set_site(self, site):
         """Set Nikola site."""
         self.logger = get_logger('compile_ipynb', STDERR_HANDLER)
+        # {source path: (mtime, size, nikola metadata)}
+        self._metadata_cache = {}
         super(CompileIPynb, self).set_site(site)
 
     def compile_html_string(self, source, is_two_file=True):
@@ -87,16 +231,25 @@ class CompileIPynb(PageCompiler):
         """Read metadata directly from ipynb file.
 
         As ipynb file support arbitrary metadata as json, the metadata used by Nikola
-        will be assume to be in the 'nikola' subfield.
+        will be assume to be in the 'nikola' subfield.  Only the notebook
+        metadata is read (not the cells), and it is kept while the file
+        is unchanged, as it is asked for once per language.
         """
-        if flag is None:
-            req_missing(['ipython[notebook]>=2.0.0'], 'build this site (compile ipynb)')
         source = post.source_path
-        with io.open(source, "r", encoding="utf8") as in_file:
-            nb_json = nbformat.read(in_file, current_nbformat)
+        st = os.stat(source)
+        cache = getattr(self, '_metadata_cache', None)
+        if cache is None:
+            cache = self._metadata_cache = {}
+        cached = cache.get(source)
+        if cached is not None and cached[:2] == (st.st_mtime, st.st_size):
+            return dict(cached[2])
+        with io.open(source, "rb") as in_file:
+            nb_metadata = read_notebook_metadata(in_file)
         # Metadata might not exist in two-file posts or in hand-crafted
         # .ipynb files.
-        return nb_json.get('metadata', {}).get('nikola', {})
+        meta = nb_metadata.get('nikola', {}) if isinstance(nb_metadata, dict) else {}
+        cache[source] = (st.st_mtime, st.st_size, meta)
+        return dict(meta)
 
     def create_post(self, path, **kw):
         """Create a new post."""
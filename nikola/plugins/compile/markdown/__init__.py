@@ -32,9 +32,9 @@ import io
 import os
 
 try:
-    from markdown import markdown
+    from markdown import Markdown
 except ImportError:
-    markdown = None  # NOQA
+    Markdown = None  # NOQA
     nikola_extension = None
     gist_extension = None
     podcast_extension = None
@@ -51,30 +51,36 @@ class CompileMarkdown(PageCompiler):
     demote_headers = True
     extensions = []
     site = None
+    converter = None
 
     def set_site(self, site):
         """Set Nikola site."""
         super(CompileMarkdown, self).set_site(site)
         self.config_dependencies = []
+        self.extensions = []
         for plugin_info in self.get_compiler_extensions():
             self.config_dependencies.append(plugin_info.name)
             self.extensions.append(plugin_info.plugin_object)
             plugin_info.plugin_object.short_help = plugin_info.description
 
         self.config_dependencies.append(str(sorted(site.config.get("MARKDOWN_EXTENSIONS"))))
+        self.extensions += site.config.get("MARKDOWN_EXTENSIONS")
+        if Markdown is not None:
+            # One converter, reset between documents, with the extensions
+            # loaded once
+            self.converter = Markdown(extensions=self.extensions)
 
     def compile_html(self, source, dest, is_two_file=True):
         """Compile source file into HTML and save as dest."""
-        if markdown is None:
+        if Markdown is None:
             req_missing(['markdown'], 'build this site (compile Markdown)')
         makedirs(os.path.dirname(dest))
-        self.extensions += self.site.config.get("MARKDOWN_EXTENSIONS")
         with io.open(dest, "w+", encoding="utf8") as out_file:
             with io.open(source, "r", encoding="utf8") as in_file:
                 data = in_file.read()
             if not is_two_file:
                 _, data = self.split_metadata(data)
-            output = markdown(data, self.extensions)
+            output = self.converter.reset().convert(data)
             out_file.write(output)
 
     def create_post(self, path, **kw):
@@ -200,58 +200,34 @@ except ImportError:
     # the markdown compiler will fail first
     Extension = Pattern = object
 
+from nikola.gist_cache import get_gist_cache, GistFetchException  # NOQA
 from nikola.plugin_categories import MarkdownExtension
 from nikola.utils import get_logger, STDERR_HANDLER
 
-import requests
-
 LOGGER = get_logger('compile_markdown.mdx_gist', STDERR_HANDLER)
 
 GIST_JS_URL = "https://gist.github.com/{0}.js"
 GIST_FILE_JS_URL = "https://gist.github.com/{0}.js?file={1}"
-GIST_RAW_URL = "https://gist.githubusercontent.com/raw/{0}"
-GIST_FILE_RAW_URL = "https://gist.githubusercontent.com/raw/{0}/{1}"
 
 GIST_MD_RE = r'\[:gist:\s*(?P<gist_id>\S+)(?:\s*(?P<filename>.+?))?\s*\]'
 GIST_RST_RE = r'(?m)^\.\.\s*gist::\s*(?P<gist_id>[^\]\s]+)(?:\s*(?P<filename>.+?))?\s*$'
 
 
-class GistFetchException(Exception):
-    """Raised when attempt to fetch content of a Gist from github.com fails."""
-
-    def __init__(self, url, status_code):
-        """Initialize the exception."""
-        Exception.__init__(self)
-        self.message = 'Received a {0} response from Gist URL: {1}'.format(
-            status_code, url)
-
-
 class GistPattern(Pattern):
     """InlinePattern for footnote markers in a document's body text."""
 
-    def __init__(self, pattern, configs):
+    def __init__(self, pattern, configs, gist_cache=None):
         """Initialize the pattern."""
         Pattern.__init__(self, pattern)
+        self.gist_cache = gist_cache if gist_cache is not None else get_gist_cache(None)
 
     def get_raw_gist_with_filename(self, gist_id, filename):
         """Get raw gist text for a filename."""
-        url = GIST_FILE_RAW_URL.format(gist_id, filename)
-        resp = requests.get(url)
-
-        if not resp.ok:
-            raise GistFetchException(url, resp.status_code)
-
-        return resp.text
+        return self.gist_cache.get(gist_id, filename)
 
     def get_raw_gist(self, gist_id):
         """Get raw gist text."""
-        url = GIST_RAW_URL.format(gist_id)
-        resp = requests.get(url)
-
-        if not resp.ok:
-            raise GistFetchException(url, resp.status_code)
-
-        return resp.text
+        return self.gist_cache.get(gist_id)
 
     def handleMatch(self, m):
         """Handle pattern match."""
@@ -290,6 +266,8 @@ class GistPattern(Pattern):
 class GistExtension(MarkdownExtension, Extension):
     """Gist extension for Markdown."""
 
+    gist_cache = None
+
     def __init__(self, configs={}):
         """Initialize the extension."""
         # set extension defaults
@@ -299,13 +277,20 @@ class GistExtension(MarkdownExtension, Extension):
         for key, value in configs:
             self.setConfig(key, value)
 
+    def set_site(self, site):
+        """Set Nikola site."""
+        self.gist_cache = get_gist_cache(site)
+        return super(GistExtension, self).set_site(site)
+
     def extendMarkdown(self, md, md_globals):
         """Extend Markdown."""
-        gist_md_pattern = GistPattern(GIST_MD_RE, self.getConfigs())
+        if self.gist_cache is None:
+            self.gist_cache = get_gist_cache(None)
+        gist_md_pattern = GistPattern(GIST_MD_RE, self.getConfigs(), self.gist_cache)
         gist_md_pattern.md = md
         md.inlinePatterns.add('gist', gist_md_pattern, "<not_strong")
 
-        gist_rst_pattern = GistPattern(GIST_RST_RE, self.getConfigs())
+        gist_rst_pattern = GistPattern(GIST_RST_RE, self.getConfigs(), self.gist_cache)
         gist_rst_pattern.md = md
         md.inlinePatterns.add('gist-rst', gist_rst_pattern, ">gist")
 
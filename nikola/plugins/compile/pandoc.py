@@ -31,12 +31,61 @@ You will need, of course, to install pandoc
 
 from __future__ import unicode_literals
 
+import errno
+import hashlib
 import io
+import json
+from multiprocessing.pool import ThreadPool
 import os
+import shutil
 import subprocess
+import tempfile
+import uuid
 
 from nikola.plugin_categories import PageCompiler
-from nikola.utils import req_missing, makedirs, write_metadata
+from nikola.utils import req_missing, makedirs, write_atomically, write_metadata, get_logger, STDERR_HANDLER
+
+# Options that pandoc applies through its reader and writer options
+# (which documents converted in a batch get too), with ``True`` for
+# options followed by a separate argument
+BATCH_SAFE_OPTIONS = {
+    '-f': True, '-r': True, '--from': True, '--read': True,
+    '-t': True, '-w': True, '--to': True, '--write': True,
+    '--wrap': True, '--columns': True, '--tab-stop': True,
+    '--highlight-style': True, '--email-obfuscation': True,
+    '--indented-code-classes': True, '--default-image-extension': True,
+    '--track-changes': True, '--markdown-headings': True,
+    '--mathjax': False, '--katex': False, '--webtex': False, '--mathml': False,
+    '--no-highlight': False, '--html-q-tags': False, '--ascii': False,
+    '--preserve-tabs': False, '--strip-comments': False, '--quiet': False,
+}
+
+# Lua filter converting the documents listed in a file, each on its own
+# with the reader and writer options of the pandoc run; the outputs,
+# separated by a marker line, replace the (empty) input document.
+# Needs pandoc 2.17 or newer (and 3.1 or newer without ``-f``).
+BATCH_FILTER = """
+function Pandoc(doc)
+  local outputs = {}
+  for name in io.lines(os.getenv('NIKOLA_PANDOC_BATCH')) do
+    local f = assert(io.open(name, 'rb'))
+    local text = f:read('a')
+    f:close()
+    local from = os.getenv('NIKOLA_PANDOC_FROM')
+    if from == '' then
+      from = pandoc.format.from_path(name)
+    end
+    local to = os.getenv('NIKOLA_PANDOC_TO')
+    if to == '' then
+      to = FORMAT
+    end
+    local document = pandoc.read(text, from, PANDOC_READER_OPTIONS)
+    outputs[#outputs + 1] = pandoc.write(document, to, PANDOC_WRITER_OPTIONS)
+  end
+  local marker = os.getenv('NIKOLA_PANDOC_MARKER')
+  return pandoc.Pandoc({pandoc.RawBlock('html', table.concat(outputs, '\\n' .. marker .. '\\n'))})
+end
+"""
 
 
 class CompilePandoc(PageCompiler):
@@ -48,16 +97,236 @@ class CompilePandoc(PageCompiler):
     def set_site(self, site):
         """Set Nikola site."""
         self.config_dependencies = [str(site.config['PANDOC_OPTIONS'])]
+        self.logger = get_logger('compile_pandoc', STDERR_HANDLER)
+        cache_folder = site.config.get('CACHE_FOLDER')
+        self.cache_path = os.path.join(cache_folder, 'pandoc') if cache_folder else None
+        self._settings = None
         super(CompilePandoc, self).set_site(site)
 
     def compile_html(self, source, dest, is_two_file=True):
         """Compile source file into HTML and save as dest."""
         makedirs(os.path.dirname(dest))
+        with io.open(source, 'rb') as in_file:
+            key = self._cache_key(source, in_file.read())
+        output = self._read_cache(key)
+        if output is not None:
+            with io.open(dest, 'wb') as out_file:
+                out_file.write(output)
+            return
         try:
             subprocess.check_call(['pandoc', '-o', dest, source] + self.site.config['PANDOC_OPTIONS'])
         except OSError as e:
-            if e.strreror == 'No such file or directory':
+            if e.errno == errno.ENOENT:
                 req_missing(['pandoc'], 'build this site (compile with pandoc)', python=False)
+            raise
+        with io.open(dest, 'rb') as in_file:
+            self._write_cache(key, in_file.read())
+
+    def prefetch_posts(self, posts):
+        """Convert the posts that will be compiled, in batches, ahead of their tasks.
+
+        Called by the ``render_posts`` tasks (see ``CompilePipeline``) with
+        the ``(post, lang)`` pairs they compile.  Those whose fragments are
+        missing or older than their sources (or all of them, if pandoc or
+        ``PANDOC_OPTIONS`` changed) and are not in the cache are
+        converted, ``PANDOC_BATCH_SIZE`` documents per pandoc run, in
+        ``PANDOC_PROCESSES`` concurrent runs.
+        """
+        if self.site.config.get('PANDOC_BATCH_SIZE', 1) <= 1 or not self._can_batch() or not posts:
+            return
+        settings_changed = self._settings_changed()
+        jobs = {}
+        for post, lang in posts:
+            source = post.translated_source_path(lang)
+            dest = post.translated_base_path(lang)
+            try:
+                fresh = os.path.isfile(dest) and os.stat(dest).st_mtime >= os.stat(source).st_mtime
+                if fresh and not settings_changed:
+                    continue
+                with io.open(source, 'rb') as in_file:
+                    data = in_file.read()
+            except (IOError, OSError):
+                continue
+            key = self._cache_key(source, data)
+            if key not in jobs and self._read_cache(key) is None:
+                jobs[key] = (os.path.splitext(source)[1], data)
+        if jobs:
+            converted = self.convert_many(jobs)
+            self.logger.info('Converted {0} documents with pandoc'.format(converted))
+
+    def convert_many(self, jobs):
+        """Convert documents in batches, and cache them.
+
+        ``jobs`` maps cache keys to the extension and the contents of
+        the documents.  Returns the number of converted documents.
+        """
+        by_extension = {}
+        for key, (extension, data) in sorted(jobs.items()):
+            by_extension.setdefault(extension, []).append((key, data))
+        batch_size = self.site.config.get('PANDOC_BATCH_SIZE', 1)
+        batches = []
+        for extension, docs in sorted(by_extension.items()):
+            for i in range(0, len(docs), batch_size):
+                batches.append((extension, docs[i:i + batch_size]))
+        processes = min(self.site.config.get('PANDOC_PROCESSES', 1), len(batches))
+        if processes > 1:
+            pool = ThreadPool(processes)
+            try:
+                results = pool.map(self._convert_batch, batches)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            results = [self._convert_batch(batch) for batch in batches]
+        converted = 0
+        for result in results:
+            for key, output in result.items():
+                self._write_cache(key, output)
+                converted += 1
+        return converted
+
+    def _convert_batch(self, batch):
+        """Convert documents with the same extension in one pandoc run.
+
+        A Lua filter converts every document separately (so they come
+        out as if converted alone) and joins the outputs with a marker,
+        which the output is split at.  If the batch cannot be converted
+        that way, documents are converted one at a time.  Returns a dict
+        of cache keys and outputs.
+        """
+        extension, docs = batch
+        marker = 'nikola-pandoc-batch-' + uuid.uuid4().hex
+        tmpdir = tempfile.mkdtemp(prefix='nikola-pandoc-')
+        try:
+            names = []
+            for i, (key, data) in enumerate(docs):
+                names.append('{0}{1}'.format(i, extension))
+                with io.open(os.path.join(tmpdir, names[-1]), 'wb') as out_file:
+                    out_file.write(data)
+            outputs = None
+            if len(docs) > 1:
+                with io.open(os.path.join(tmpdir, 'batch.txt'), 'w', encoding='utf-8') as out_file:
+                    out_file.write(''.join(name + '\n' for name in names))
+                with io.open(os.path.join(tmpdir, 'batch.lua'), 'w', encoding='utf-8') as out_file:
+                    out_file.write(BATCH_FILTER)
+                with io.open(os.path.join(tmpdir, 'empty' + extension), 'wb'):
+                    pass
+                env = dict(os.environ)
+                env.update({
+                    'NIKOLA_PANDOC_BATCH': 'batch.txt',
+                    'NIKOLA_PANDOC_MARKER': marker,
+                    'NIKOLA_PANDOC_FROM': self._option_value('-f', '-r', '--from', '--read'),
+                    'NIKOLA_PANDOC_TO': self._option_value('-t', '-w', '--to', '--write'),
+                })
+                output = self._run(['empty' + extension, '--lua-filter=batch.lua'], tmpdir, env)
+                if output is not None:
+                    outputs = [text + '\n' for text in output.decode('utf-8')[:-1].split('\n{0}\n'.format(marker))]
+                    if len(outputs) != len(docs):
+                        self.logger.warn('Cannot split the output of pandoc, converting documents one at a time')
+                        outputs = None
+            results = {}
+            for i, (key, data) in enumerate(docs):
+                if outputs is not None:
+                    results[key] = outputs[i].encode('utf-8')
+                else:
+                    output = self._run([names[i]], tmpdir)
+                    if output is not None:
+                        results[key] = output
+            return results
+        finally:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+    def _run(self, inputs, cwd, env=None):
+        """Run pandoc on some input files, returning the output (or None if it fails)."""
+        output_path = os.path.join(cwd, 'nikola-output.html')
+        try:
+            proc = subprocess.Popen(['pandoc', '-o', output_path] + inputs + self.site.config['PANDOC_OPTIONS'],
+                                    cwd=cwd, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            proc.communicate()
+        except OSError:
+            return None
+        if proc.returncode != 0 or not os.path.isfile(output_path):
+            return None
+        with io.open(output_path, 'rb') as in_file:
+            return in_file.read()
+
+    def _parse_options(self):
+        """Parse PANDOC_OPTIONS into (name, value) pairs."""
+        options = iter(self.site.config['PANDOC_OPTIONS'])
+        parsed = []
+        for option in options:
+            name, _, value = option.partition('=')
+            if name[:1] == '-' and name[1:2] != '-' and len(name) > 2:
+                name, value = name[:2], name[2:]
+            if BATCH_SAFE_OPTIONS.get(name) and not value:
+                value = next(options, '')
+            parsed.append((name, value))
+        return parsed
+
+    def _option_value(self, *names):
+        """Get the value of the last of some options in PANDOC_OPTIONS ('' if not set)."""
+        value = ''
+        for name, option_value in self._parse_options():
+            if name in names:
+                value = option_value
+        return value
+
+    def _can_batch(self):
+        """Tell if PANDOC_OPTIONS allow converting several documents in one run."""
+        for name, value in self._parse_options():
+            if name not in BATCH_SAFE_OPTIONS:
+                return False
+        to = self._option_value('-t', '-w', '--to', '--write')
+        return not to or to.startswith('html')
+
+    def _pandoc_settings(self):
+        """Get the pandoc version and options the output depends on."""
+        if self._settings is None:
+            try:
+                version = subprocess.check_output(['pandoc', '--version']).decode('utf-8', 'replace').split('\n')[0]
+            except (OSError, subprocess.CalledProcessError):
+                version = None
+            self._settings = json.dumps([version, self.site.config['PANDOC_OPTIONS']])
+        return self._settings
+
+    def _settings_changed(self):
+        """Tell if pandoc or PANDOC_OPTIONS changed since the last build, remembering them."""
+        if not self.cache_path:
+            return False
+        settings_path = os.path.join(self.cache_path, 'settings.json')
+        settings = self._pandoc_settings()
+        try:
+            with io.open(settings_path, 'r', encoding='utf-8') as in_file:
+                changed = in_file.read() != settings
+        except (IOError, OSError):
+            changed = False
+        if changed or not os.path.isfile(settings_path):
+            write_atomically(settings_path, settings)
+        return changed
+
+    def _cache_key(self, source, data):
+        """Get the cache key of a document, from its contents, extension and the pandoc settings."""
+        digest = hashlib.sha1(self._pandoc_settings().encode('utf-8'))
+        digest.update(os.path.splitext(source)[1].encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(data)
+        return digest.hexdigest()
+
+    def _read_cache(self, key):
+        """Read the cached output of a document, or return None if it is missing."""
+        if not self.cache_path:
+            return None
+        try:
+            with io.open(os.path.join(self.cache_path, key + '.html'), 'rb') as in_file:
+                return in_file.read()
+        except (IOError, OSError):
+            return None
+
+    def _write_cache(self, key, output):
+        """Keep the output of a document in the cache."""
+        if not self.cache_path:
+            return
+        write_atomically(os.path.join(self.cache_path, key + '.html'), output)
 
     def create_post(self, path, **kw):
         """Create a new post."""
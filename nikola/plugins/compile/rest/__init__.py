@@ -27,6 +27,7 @@
 """reStructuredText compiler for Nikola."""
 
 from __future__ import unicode_literals
+import copy
 import io
 import os
 import docutils.core
@@ -176,11 +177,14 @@ class NikolaReader(docutils.readers.standalone.Reader):
     def __init__(self, *args, **kwargs):
         """Initialize the reader."""
         self.transforms = kwargs.pop('transforms', [])
+        self._all_transforms = None
         docutils.readers.standalone.Reader.__init__(self, *args, **kwargs)
 
     def get_transforms(self):
         """Get docutils transforms."""
-        return docutils.readers.standalone.Reader(self).get_transforms() + self.transforms
+        if self._all_transforms is None:
+            self._all_transforms = docutils.readers.standalone.Reader(self).get_transforms() + self.transforms
+        return self._all_transforms
 
     def new_document(self):
         """Create and return a new empty document tree (root node)."""
@@ -230,6 +234,67 @@ def add_node(node, visit_function=None, depart_function=None):
         setattr(htmlwriter.HTMLTranslator, 'depart_' + node.__name__, depart_function)
 
 
+class RestContext(object):
+    """The docutils setup shared by the reST documents compiled in a process.
+
+    Building the settings (which needs an option parser with the settings
+    of every component), the reader and its transforms takes longer than
+    parsing most posts, so it is done once.  Each document gets a copy of
+    the settings with a new list of dependencies.
+    """
+
+    def __init__(self, transforms, parser_name, writer, settings_spec, settings_overrides, config_section):
+        """Set up the reader, the parser and the settings."""
+        self.reader = NikolaReader(transforms=list(transforms))
+        self.writer = writer
+        pub = docutils.core.Publisher(self.reader, None, writer,
+                                      source_class=docutils.io.StringInput,
+                                      destination_class=docutils.io.StringOutput)
+        pub.set_components(None, parser_name, None)
+        pub.process_programmatic_settings(settings_spec, settings_overrides, config_section)
+        self.parser = pub.parser
+        self.settings = pub.settings
+        self.busy = False
+
+    def publish(self, source, source_path, destination_path, enable_exit_status, l_settings):
+        """Compile a document, like ``rst2html`` does."""
+        settings = copy.copy(self.settings)
+        if isinstance(settings.record_dependencies, docutils.utils.DependencyList):
+            settings.record_dependencies = docutils.utils.DependencyList()
+        settings._nikola_source_path = source_path
+        self.reader.l_settings = l_settings
+        pub = docutils.core.Publisher(self.reader, self.parser, self.writer, settings=settings,
+                                      source_class=docutils.io.StringInput,
+                                      destination_class=docutils.io.StringOutput)
+        pub.set_source(source, None)
+        pub.set_destination(None, destination_path)
+        self.busy = True
+        try:
+            pub.publish(enable_exit_status=enable_exit_status)
+        finally:
+            self.busy = False
+        return pub
+
+
+# Contexts by transforms, writer and settings; see RestContext
+_contexts = {}
+
+
+def get_rest_context(transforms=(), parser_name='restructuredtext', writer=None,
+                     settings_spec=None, settings_overrides=None, config_section=None):
+    """Return the shared context for these components and settings, or None if it is in use."""
+    writer = writer or _htmlwriter
+    key = (tuple(transforms), parser_name, id(writer), settings_spec, config_section,
+           repr(sorted((settings_overrides or {}).items())))
+    context = _contexts.get(key)
+    if context is None:
+        context = _contexts[key] = RestContext(transforms, parser_name, writer, settings_spec,
+                                               settings_overrides, config_section)
+    elif context.busy:  # A document compiled while compiling another one
+        return None
+    return context
+
+
 def rst2html(source, source_path=None, source_class=docutils.io.StringInput,
              destination_path=None, reader=None,
              parser=None, parser_name='restructuredtext', writer=None,
@@ -251,16 +316,27 @@ def rst2html(source, source_path=None, source_class=docutils.io.StringInput,
 
     WARNING: `reader` should be None (or NikolaReader()) if you want Nikola to report
              reStructuredText syntax errors.
+
+    Unless a reader, a parser, settings or another source class are
+    given, the docutils setup is shared with the previous documents (see
+    ``RestContext``).
     """
+    # For our custom logging, we have special needs and special settings we
+    # specify here.
+    # logger    a logger from Nikola
+    # source   source filename (docutils gets a string)
+    # add_ln   amount of metadata lines (see comment in compile_html above)
+    l_settings = {'logger': logger, 'source': source_path, 'add_ln': l_add_ln}
+    if reader is None and parser is None and settings is None and source_class is docutils.io.StringInput:
+        context = get_rest_context(transforms or (), parser_name, writer, settings_spec,
+                                   settings_overrides, config_section)
+        if context is not None:
+            pub = context.publish(source, source_path, destination_path, enable_exit_status, l_settings)
+            return pub.writer.parts['docinfo'] + pub.writer.parts['fragment'], pub.document.reporter.max_level, pub.settings.record_dependencies
+
     if reader is None:
         reader = NikolaReader(transforms=transforms)
-        # For our custom logging, we have special needs and special settings we
-        # specify here.
-        # logger    a logger from Nikola
-        # source   source filename (docutils gets a string)
-        # add_ln   amount of metadata lines (see comment in compile_html above)
-        reader.l_settings = {'logger': logger, 'source': source_path,
-                             'add_ln': l_add_ln}
+        reader.l_settings = l_settings
 
     if writer is None:
         writer = _htmlwriter
@@ -3,11 +3,14 @@
 
 """Gist directive for reStructuredText."""
 
-import requests
 from docutils.parsers.rst import Directive, directives
 from docutils import nodes
 
+from nikola.gist_cache import get_gist_cache, GistFetchException
 from nikola.plugin_categories import RestExtension
+from nikola.utils import get_logger, STDERR_HANDLER
+
+LOGGER = get_logger('compile_rest.gist', STDERR_HANDLER)
 
 
 class Plugin(RestExtension):
@@ -19,6 +22,7 @@ class Plugin(RestExtension):
         """Set Nikola site."""
         self.site = site
         directives.register_directive('gist', GitHubGist)
+        GitHubGist.gist_cache = get_gist_cache(site)
         return super(Plugin, self).set_site(site)
 
 
@@ -39,19 +43,17 @@ class GitHubGist(Directive):
     option_spec = {'file': directives.unchanged}
     final_argument_whitespace = True
     has_content = False
+    gist_cache = None
 
     def get_raw_gist_with_filename(self, gistID, filename):
         """Get raw gist text for a filename."""
-        url = '/'.join(("https://gist.github.com/raw", gistID, filename))
-        return requests.get(url).text
+        return self.get_raw_gist(gistID, filename)
 
-    def get_raw_gist(self, gistID):
+    def get_raw_gist(self, gistID, filename=None):
         """Get raw gist text."""
-        url = "https://gist.github.com/raw/{0}".format(gistID)
-        try:
-            return requests.get(url).text
-        except requests.exceptions.RequestException:
-            raise self.error('Cannot get gist for url={0}'.format(url))
+        if self.gist_cache is None:
+            GitHubGist.gist_cache = get_gist_cache(None)
+        return self.gist_cache.get(gistID, filename)
 
     def run(self):
         """Run the gist directive."""
@@ -59,20 +61,24 @@ class GitHubGist(Directive):
             gistID = self.arguments[0].split('/')[-1].strip()
         else:
             gistID = self.arguments[0].strip()
-        embedHTML = ""
-        rawGist = ""
-
-        if 'file' in self.options:
-            filename = self.options['file']
-            rawGist = (self.get_raw_gist_with_filename(gistID, filename))
+        filename = self.options.get('file')
+        if filename:
             embedHTML = ('<script src="https://gist.github.com/{0}.js'
                          '?file={1}"></script>').format(gistID, filename)
         else:
-            rawGist = (self.get_raw_gist(gistID))
             embedHTML = ('<script src="https://gist.github.com/{0}.js">'
                          '</script>').format(gistID)
 
-        reqnode = nodes.literal_block('', rawGist)
+        try:
+            if filename:
+                rawGist = self.get_raw_gist_with_filename(gistID, filename)
+            else:
+                rawGist = self.get_raw_gist(gistID)
+            reqnode = nodes.literal_block('', rawGist)
+        except GistFetchException as e:
+            # The embedded script still works; only the noscript copy is missing
+            LOGGER.warn(e.message)
+            reqnode = nodes.raw('', '<!-- WARNING: {0} -->'.format(e.message), format='html')
 
         return [nodes.raw('', embedHTML, format='html'),
                 nodes.raw('', '<noscript>', format='html'),
@@ -30,13 +30,13 @@ from __future__ import unicode_literals
 
 import os
 import uuid
-import natsort
 
 from docutils import nodes
 from docutils.parsers.rst import Directive, directives
 
 from nikola import utils
 from nikola.plugin_categories import RestExtension
+from nikola.timeline_index import PostListQuery
 
 # WARNING: the directive name is post-list
 #          (with a DASH instead of an UNDERSCORE)
@@ -132,6 +132,13 @@ class PostList(Directive):
         'id': directives.unchanged,
     }
 
+    # Rendered post lists, by query, template and date format, for the
+    # timeline index they were made from; they are rendered with the id
+    # placeholder, replaced by the id of each list
+    _rendered = {}
+    _rendered_index = None
+    _id_placeholder = 'post_list_' + uuid.uuid4().hex
+
     def run(self):
         """Run post-list directive."""
         start = self.options.get('start')
@@ -152,60 +159,39 @@ class PostList(Directive):
         else:
             post_list_id = self.options.get('id', 'post_list_' + uuid.uuid4().hex)
 
-        filtered_timeline = []
-        posts = []
-        step = -1 if reverse is None else None
-        if show_all is None:
-            timeline = [p for p in self.site.timeline]
-        else:
-            timeline = [p for p in self.site.timeline if p.use_in_feeds]
-
-        if categories:
-            timeline = [p for p in timeline if p.meta('category', lang=lang).lower() in categories]
-
-        for post in timeline:
-            if tags:
-                cont = True
-                tags_lower = [t.lower() for t in post.tags]
-                for tag in tags:
-                    if tag in tags_lower:
-                        cont = False
-
-                if cont:
-                    continue
-
-            filtered_timeline.append(post)
-
-        if sort:
-            filtered_timeline = natsort.natsorted(filtered_timeline, key=lambda post: post.meta[lang][sort], alg=natsort.ns.F | natsort.ns.IC)
-
-        for post in filtered_timeline[start:stop:step]:
-            if slugs:
-                cont = True
-                for slug in slugs:
-                    if slug == post.meta('slug'):
-                        cont = False
-
-                if cont:
-                    continue
-
+        timeline_index = self.site.timeline_index
+        query = PostListQuery(
+            show_all is None, tuple(categories), tuple(tags),
+            # Tags are matched in the current language
+            utils.LocaleBorg().current_lang,
+            tuple(slugs), sort, lang, start, stop, reverse is None)
+        posts = timeline_index.post_list(query)
+
+        record_dependencies = self.state.document.settings.record_dependencies
+        record_dependencies.add(query.dependency())
+        for post in posts:
             bp = post.translated_base_path(lang)
             if os.path.exists(bp):
-                self.state.document.settings.record_dependencies.add(bp)
-
-            posts += [post]
+                record_dependencies.add(bp)
 
         if not posts:
             return []
-        self.state.document.settings.record_dependencies.add("####MAGIC####TIMELINE")
-
-        template_data = {
-            'lang': lang,
-            'posts': posts,
-            # Need to provide str, not TranslatableSetting (Issue #2104)
-            'date_format': self.site.GLOBAL_CONTEXT.get('date_format')[lang],
-            'post_list_id': post_list_id,
-        }
-        output = self.site.template_system.render_template(
-            template, None, template_data)
+
+        # Need to provide str, not TranslatableSetting (Issue #2104)
+        date_format = self.site.GLOBAL_CONTEXT.get('date_format')[lang]
+        if PostList._rendered_index is not timeline_index:
+            PostList._rendered = {}
+            PostList._rendered_index = timeline_index
+        key = (query, template, date_format)
+        output = PostList._rendered.get(key)
+        if output is None:
+            template_data = {
+                'lang': lang,
+                'posts': list(posts),
+                'date_format': date_format,
+                'post_list_id': self._id_placeholder,
+            }
+            output = PostList._rendered[key] = self.site.template_system.render_template(
+                template, None, template_data)
+        output = output.replace(self._id_placeholder, post_list_id)
         return [nodes.raw('', output, format='html')]
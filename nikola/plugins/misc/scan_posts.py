@@ -27,14 +27,45 @@
 """The default post scanner."""
 
 from __future__ import unicode_literals, print_function
+import fnmatch
 import glob
+import io
+import json
 import os
 import sys
 
 from nikola.plugin_categories import PostScanner
-from nikola import utils
+from nikola import utils, __version__
 from nikola.post import Post
 
+# Site used by worker processes (inherited when they are forked)
+_worker_site = None
+_worker_messages = None
+_worker_dir_listings = None
+
+
+def _read_metadata_in_worker(args):
+    """Read the metadata of a post in a worker process.
+
+    Returns None if the post cannot be created; the main process then
+    tries again, so errors are reported as usual.
+    """
+    base_path, dest_dir, use_in_feeds, template_name = args
+    try:
+        post = Post(
+            base_path,
+            _worker_site.config,
+            dest_dir,
+            use_in_feeds,
+            _worker_messages,
+            template_name,
+            _worker_site.get_compiler(base_path),
+            dir_listings=_worker_dir_listings
+        )
+    except (Exception, SystemExit):
+        return None
+    return post.raw_metadata
+
 
 class ScanPosts(PostScanner):
     """Scan posts in the site."""
@@ -48,13 +79,17 @@ class ScanPosts(PostScanner):
             print("Scanning posts", end='', file=sys.stderr)
 
         timeline = []
+        sources = []
+        # Directory contents, to check post files without a stat() each
+        dir_listings = {}
 
         for wildcard, destination, template_name, use_in_feeds in \
                 self.site.config['post_pages']:
             if not self.site.quiet:
                 print(".", end='', file=sys.stderr)
             dirname = os.path.dirname(wildcard)
-            for dirpath, _, _ in os.walk(dirname, followlinks=True):
+            for dirpath, dirnames, filenames in os.walk(dirname, followlinks=True):
+                dir_listings[dirpath] = set(dirnames + filenames)
                 dest_dir = os.path.normpath(os.path.join(destination,
                                             os.path.relpath(dirpath, dirname)))  # output/destination/foo/
                 # Get all the untranslated paths
@@ -87,15 +122,174 @@ class ScanPosts(PostScanner):
                         continue
                     else:
                         seen.add(base_path)
-                    post = Post(
-                        base_path,
-                        self.site.config,
-                        dest_dir,
-                        use_in_feeds,
-                        self.site.MESSAGES,
-                        template_name,
-                        self.site.get_compiler(base_path)
-                    )
-                    timeline.append(post)
+                    sources.append((base_path, dest_dir, use_in_feeds, template_name))
+
+        messages = self.site.MESSAGES
+        stamps = {}
+        if self.site.config['SCAN_POSTS_CACHE']:
+            # Taken before reading anything, so changes made while scanning are noticed next time
+            stamps = dict((source[0], self._file_stamps(source[0])) for source in sources)
+        metadata = self._get_metadata(sources, messages, stamps, dir_listings)
+        for base_path, dest_dir, use_in_feeds, template_name in sources:
+            post = Post(
+                base_path,
+                self.site.config,
+                dest_dir,
+                use_in_feeds,
+                messages,
+                template_name,
+                self.site.get_compiler(base_path),
+                metadata.get(base_path),
+                dir_listings
+            )
+            timeline.append(post)
+
+        if self.site.config['SCAN_POSTS_CACHE']:
+            self._save_cache(timeline, stamps)
 
         return timeline
+
+    def rescan(self, paths):
+        """Create the posts that use any of the given (changed) source paths."""
+        config = self.site.config
+        candidates = set([])
+        for path in paths:
+            if path.endswith('.meta'):
+                # Any post file next to the .meta file may be using it
+                dirpath, basename = os.path.split(path[:-len('.meta')])
+                try:
+                    names = os.listdir(dirpath or '.')
+                except OSError:
+                    names = []
+                candidates.update(os.path.join(dirpath, name) for name in names
+                                  if name.startswith(basename + '.') and not name.endswith('.meta'))
+            else:
+                candidates.add(path)
+
+        base_paths = set([])
+        for path in candidates:
+            # A changed (or deleted) translation belongs to the untranslated post
+            base_path = utils.get_translation_candidate(config, path, config['DEFAULT_LANG'])
+            if os.path.isfile(base_path):
+                base_paths.add(base_path)
+            elif os.path.isfile(path):
+                # Translations without an untranslated file are posts on their own
+                base_paths.add(path)
+
+        seen = set([])
+        sources = []
+        for wildcard, destination, template_name, use_in_feeds in config['post_pages']:
+            dirname = os.path.dirname(wildcard)
+            for base_path in sorted(base_paths - seen):
+                dirpath = os.path.dirname(base_path)
+                relpath = os.path.relpath(dirpath, dirname)
+                if relpath.split(os.sep)[0] == os.pardir or any(x.startswith('.') for x in base_path.split(os.sep)):
+                    continue
+                if not fnmatch.fnmatch(os.path.basename(base_path), os.path.basename(wildcard)):
+                    continue
+                seen.add(base_path)
+                dest_dir = os.path.normpath(os.path.join(destination, relpath))
+                sources.append((base_path, dest_dir, use_in_feeds, template_name))
+
+        dir_listings = {}
+        return [Post(base_path, config, dest_dir, use_in_feeds, self.site.MESSAGES,
+                     template_name, self.site.get_compiler(base_path), dir_listings=dir_listings)
+                for base_path, dest_dir, use_in_feeds, template_name in sources]
+
+    def _get_metadata(self, sources, messages, stamps, dir_listings=None):
+        """Get the raw metadata of posts that can be read without creating them one by one.
+
+        Metadata comes from the cache when the post files did not change
+        since it was saved, and from worker processes otherwise (if
+        SCAN_POSTS_PROCESSES is more than 1).
+        """
+        metadata = {}
+        if self.site.config['SCAN_POSTS_CACHE']:
+            cache = self._load_cache()
+            for source in sources:
+                entry = cache.get(source[0])
+                if entry and entry['stamps'] == stamps[source[0]]:
+                    metadata[source[0]] = entry['metadata']
+
+        missing = [source for source in sources if source[0] not in metadata]
+        processes = self.site.config['SCAN_POSTS_PROCESSES']
+        if processes > 1 and len(missing) > 1 and os.name == 'posix':
+            global _worker_site, _worker_messages, _worker_dir_listings
+            # Resolve compilers here, so workers never have to exit because of them
+            for source in missing:
+                self.site.get_compiler(source[0])
+            _worker_site, _worker_messages, _worker_dir_listings = self.site, messages, dir_listings
+            pool = utils.fork_pool(processes)
+            try:
+                results = pool.map(_read_metadata_in_worker, missing, chunksize=16)
+            except Exception as e:
+                utils.LOGGER.warn("Cannot read post metadata in parallel: {0}".format(e))
+                results = []
+            finally:
+                pool.close()
+                pool.join()
+                _worker_site = _worker_messages = _worker_dir_listings = None
+            for source, result in zip(missing, results):
+                if result is not None:
+                    metadata[source[0]] = result
+        return metadata
+
+    def _cache_path(self):
+        """Return the path of the metadata cache."""
+        return os.path.join(self.site.config['CACHE_FOLDER'], 'scan_posts.json')
+
+    def _cache_key(self):
+        """Identify the settings the cached metadata depends on."""
+        return repr([
+            __version__,
+            sorted(self.site.config['TRANSLATIONS'].keys()),
+            self.site.config['DEFAULT_LANG'],
+            self.site.config['TRANSLATIONS_PATTERN'],
+            self.site.config['FILE_METADATA_REGEXP'],
+            self.site.config['UNSLUGIFY_TITLES'],
+            sorted((k, sorted(v)) for k, v in self.site.config['COMPILERS'].items()),
+            # Compilers may read metadata from posts, depending on their settings
+            sorted((name, type(compiler).__name__, sorted(compiler.config_dependencies))
+                   for name, compiler in self.site.compilers.items()),
+        ])
+
+    def _file_stamps(self, source_path):
+        """Return modification time and size of all files a post's metadata is read from."""
+        metadata_path = os.path.splitext(source_path)[0] + '.meta'
+        paths = [source_path, metadata_path]
+        for lang in sorted(self.site.config['TRANSLATIONS'].keys()):
+            if lang != self.site.config['DEFAULT_LANG']:
+                paths.append(utils.get_translation_candidate(self.site.config, source_path, lang))
+                paths.append(utils.get_translation_candidate(self.site.config, metadata_path, lang))
+        stamps = []
+        for path in paths:
+            try:
+                st = os.stat(path)
+                stamps.append([path, st.st_mtime, st.st_size])
+            except OSError:
+                stamps.append([path, None, None])
+        return stamps
+
+    def _load_cache(self):
+        """Load cached metadata, or return an empty cache if it is stale or unreadable."""
+        try:
+            with io.open(self._cache_path(), 'r', encoding='utf-8') as inf:
+                data = json.load(inf)
+        except (IOError, OSError, ValueError):
+            return {}
+        if data.get('key') != self._cache_key():
+            return {}
+        return data.get('posts', {})
+
+    def _save_cache(self, timeline, stamps):
+        """Save the raw metadata of posts, along with the state of their files."""
+        posts = {}
+        for post in timeline:
+            entry = {'stamps': stamps[post.source_path], 'metadata': post.raw_metadata}
+            try:
+                json.dumps(entry)
+            except (TypeError, ValueError):
+                # Compilers may return metadata that JSON cannot store
+                continue
+            posts[post.source_path] = entry
+        utils.write_atomically(self._cache_path(), json.dumps({'key': self._cache_key(), 'posts': posts}))
@@ -292,19 +292,18 @@ class Archive(Task):
         if (kw['create_monthly_archive'] and kw['create_single_archive']) and not kw['create_full_archives']:
             raise Exception('Cannot create monthly and single archives at the same time.')
 
+        timeline_index = self.site.timeline_index
         for lang in kw["translations"]:
             deps_translatable = {}
             for k in self.site._GLOBAL_CONTEXT_TRANSLATABLE:
                 deps_translatable[k] = self.site.GLOBAL_CONTEXT[k](lang)
+            # Filter untranslated posts (Issue #1360)
+            translated_only = not kw["show_untranslated_posts"]
 
             if kw['create_single_archive'] or kw['create_full_archives']:
-                posts = self.site.posts
-                # Filter untranslated posts (Issue #1360)
-                if not kw["show_untranslated_posts"]:
-                    posts = [p for p in posts if lang in p.translated_to]
-                    if len(posts) == 0:
-                        continue
-                posts = sorted(posts, key=lambda a: a.date, reverse=True)
+                posts = list(timeline_index.view('posts', None, lang, translated_only))
+                if translated_only and len(posts) == 0:
+                    continue
                 title = kw["messages"][lang]["Archive"]
                 yield self._generate_posts_task(kw, None, lang, posts, title,
                                                 deps_translatable)
@@ -316,14 +315,10 @@ class Archive(Task):
             years = list(archdata.keys())
 
             for year in years[:]:
-                posts = archdata[year]
-                # Filter untranslated posts (Issue #1360)
-                if not kw["show_untranslated_posts"]:
-                    posts = [p for p in posts if lang in p.translated_to]
-                    if len(posts) == 0:
-                        years.remove(year)
-                        continue
-                posts = sorted(posts, key=lambda a: a.date, reverse=True)
+                posts = list(timeline_index.view('year', year, lang, translated_only))
+                if len(posts) == 0:
+                    years.remove(year)
+                    continue
                 # Add archive per year or total archive
                 title = kw["messages"][lang]["Posts for year %s"] % year
                 archdata[year] = [posts, title, deps_translatable, None, None, None, None]
@@ -346,14 +341,10 @@ class Archive(Task):
             ymarchdata = self.site.posts_per_month.copy()
             yearmonths = list(ymarchdata.keys())
             for yearmonth in yearmonths[:]:
-                posts = self.site.posts_per_month[yearmonth]
-                # Filter untranslated posts (via Issue #1360)
-                if not kw["show_untranslated_posts"]:
-                    posts = [p for p in posts if lang in p.translated_to]
-                    if len(posts) == 0:
-                        yearmonths.remove(yearmonth)
-                        continue
-                posts = sorted(posts, key=lambda a: a.date, reverse=True)
+                posts = list(timeline_index.view('month', yearmonth, lang, translated_only))
+                if len(posts) == 0:
+                    yearmonths.remove(yearmonth)
+                    continue
                 # Add archive per month
                 year, month = yearmonth.split('/')
                 title = kw["messages"][lang]["Posts for {month} {year}"].format(
@@ -33,7 +33,6 @@ try:
     from urlparse import urljoin
 except ImportError:
     from urllib.parse import urljoin  # NOQA
-from collections import defaultdict
 
 from nikola.plugin_categories import Task
 from nikola import utils
@@ -43,7 +42,6 @@ class RenderAuthors(Task):
     """Render the author pages and feeds."""
 
     name = "render_authors"
-    posts_per_author = None
 
     def set_site(self, site):
         """Set Nikola site."""
@@ -91,17 +89,12 @@ class RenderAuthors(Task):
             if not self._posts_per_author():  # this may be self.site.posts_per_author
                 return
 
-            author_list = list(self._posts_per_author().items())
+            timeline_index = self.site.timeline_index
 
-            def render_lists(author, posts):
+            def render_lists(author):
                 """Render author pages as RSS files and lists/indexes."""
-                post_list = sorted(posts, key=lambda a: a.date)
-                post_list.reverse()
                 for lang in kw["translations"]:
-                    if kw["show_untranslated_posts"]:
-                        filtered_posts = post_list
-                    else:
-                        filtered_posts = [x for x in post_list if x.is_translation_available(lang)]
+                    filtered_posts = timeline_index.view('author', author, lang, not kw["show_untranslated_posts"])
                     if kw["generate_atom"] or kw["generate_rss"]:
                         targets = []
                         kind = "author"
@@ -157,10 +150,10 @@ class RenderAuthors(Task):
                     if kw['author_pages_are_indexes']:
                         yield self.author_page_as_index(author, lang, filtered_posts, kw)
                     else:
-                        yield self.author_page_as_list(author, lang, filtered_posts, kw)
+                        yield self.author_page_as_list(author, lang, list(filtered_posts), kw)
 
-            for author, posts in author_list:
-                for task in render_lists(author, posts):
+            for author in self._posts_per_author():
+                for task in render_lists(author):
                     yield task
 
     def _create_authors_page(self, kw):
@@ -335,10 +328,7 @@ class RenderAuthors(Task):
                 _f]
 
     def _posts_per_author(self):
-        """Return a dict of posts per author."""
-        if self.posts_per_author is None:
-            self.posts_per_author = defaultdict(list)
-            for post in self.site.timeline:
-                if post.is_post:
-                    self.posts_per_author[post.author()].append(post)
-        return self.posts_per_author
+        """Return a dict of posts per author, newest first."""
+        timeline_index = self.site.timeline_index
+        return dict((author, timeline_index.view('author', author))
+                    for author in timeline_index.keys('author'))
@@ -48,11 +48,9 @@ except ImportError:
 
 from nikola.plugin_categories import Task
 from nikola import utils
-from nikola.image_processing import ImageProcessor
+from nikola.image_processing import ImageProcessor, ImagePipeline, ImageIndex
 from nikola.post import Post
 
-_image_size_cache = {}
-
 
 class Galleries(Task, ImageProcessor):
     """Render image galleries."""
@@ -103,6 +101,10 @@ class Galleries(Task, ImageProcessor):
             appearing_paths.add(source)
             appearing_paths.add(dest)
 
+        image_index_path = os.path.join(self.kw['cache_folder'], 'image_index.json')
+        if self.image_index is None or self.image_index.path != image_index_path:
+            self.image_index = ImageIndex(image_index_path)
+
         # Find all galleries we need to process
         self.find_galleries()
         # Create self.gallery_links
@@ -189,6 +191,9 @@ class Galleries(Task, ImageProcessor):
         """Render image galleries."""
         self.image_ext_list = self.image_ext_list_builtin
         self.image_ext_list.extend(self.site.config.get('EXTRA_IMAGE_EXTENSIONS', []))
+        if getattr(self, 'image_pipeline', None) is not None:
+            self.image_pipeline.close()
+        self.image_pipeline = ImagePipeline(self, self.site.config['IMAGE_PROCESSES'])
 
         for k, v in self.site.GLOBAL_CONTEXT['template_hooks'].items():
             self.kw['||template_hooks|{0}||'.format(k)] = v._items
@@ -507,14 +512,16 @@ class Galleries(Task, ImageProcessor):
             ".thumbnail".join([fname, ext]))
         # thumb_path is "output/GALLERY_PATH/name/image_name.jpg"
         orig_dest_path = os.path.join(output_gallery, img_name)
+        # Both sizes are made from a single decode of the image
+        self.image_pipeline.add(img, [(thumb_path, self.kw['thumbnail_size']),
+                                      (orig_dest_path, self.kw['max_image_size'])])
         yield utils.apply_filters({
             'basename': self.name,
             'name': thumb_path,
             'file_dep': [img],
             'targets': [thumb_path],
             'actions': [
-                (self.resize_image,
-                    (img, thumb_path, self.kw['thumbnail_size']))
+                (self.image_pipeline.resize, (img, [thumb_path]))
             ],
             'clean': True,
             'uptodate': [utils.config_changed({
@@ -528,8 +535,7 @@ class Galleries(Task, ImageProcessor):
             'file_dep': [img],
             'targets': [orig_dest_path],
             'actions': [
-                (self.resize_image,
-                    (img, orig_dest_path, self.kw['max_image_size']))
+                (self.image_pipeline.resize, (img, [orig_dest_path]))
             ],
             'clean': True,
             'uptodate': [utils.config_changed({
@@ -592,14 +598,11 @@ class Galleries(Task, ImageProcessor):
 
         photo_array = []
         for img, thumb, title in zip(img_list, thumbs, img_titles):
-            w, h = _image_size_cache.get(thumb, (None, None))
-            if w is None:
-                if os.path.splitext(thumb)[1] in ['.svg', '.svgz']:
-                    w, h = 200, 200
-                else:
-                    im = Image.open(thumb)
-                    w, h = im.size
-                    _image_size_cache[thumb] = w, h
+            if os.path.splitext(thumb)[1] in ['.svg', '.svgz']:
+                w, h = 200, 200
+            else:
+                info = self.image_info(thumb)
+                w, h = info['width'], info['height']
             # Thumbs are files in output, we need URLs
             photo_array.append({
                 'url': url_from_path(img),
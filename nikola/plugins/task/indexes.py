@@ -61,10 +61,7 @@ class Indexes(Task):
         If show_untranslated_posts is True, will only include posts which
         are translated to the given language. Otherwise, returns all posts.
         """
-        if show_untranslated_posts:
-            return self.site.posts
-        else:
-            return [x for x in self.site.posts if x.is_translation_available(lang)]
+        return self.site.timeline_index.view('posts', None, lang, not show_untranslated_posts)
 
     def _compute_number_of_pages(self, filtered_posts, posts_count):
         """Given a list of posts and the maximal number of posts per page, computes the number of pages needed."""
@@ -130,9 +127,9 @@ class Indexes(Task):
                 kw["posts_section_are_indexes"] = self.site.config['POSTS_SECTION_ARE_INDEXES']
                 index_len = len(kw['index_file'])
 
-                groups = defaultdict(list)
-                for p in filtered_posts:
-                    groups[p.section_slug(lang)].append(p)
+                translated_only = not kw["show_untranslated_posts"]
+                groups = dict((section_slug, self.site.timeline_index.view('section', section_slug, lang, translated_only))
+                              for section_slug in self.site.timeline_index.keys('section', lang, translated_only))
 
                 # don't build sections when there is only one, aka. default setups
                 if not len(groups.items()) > 1:
@@ -182,7 +179,7 @@ class Indexes(Task):
                     else:
                         context["pagekind"].append("list")
                         output_name = os.path.join(kw['output_folder'], section_slug, kw['index_file'])
-                        task = self.site.generic_post_list_renderer(lang, post_list, output_name, "list.tmpl", kw['filters'], context)
+                        task = self.site.generic_post_list_renderer(lang, list(post_list), output_name, "list.tmpl", kw['filters'], context)
                         task['uptodate'] = [utils.config_changed(kw, 'nikola.plugins.task.indexes')]
                         task['basename'] = self.name
                     yield task
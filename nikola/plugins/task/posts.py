@@ -31,6 +31,8 @@ import os
 
 from nikola.plugin_categories import Task
 from nikola import filters, utils
+from nikola.compile_pipeline import CompilePipeline
+from nikola.timeline_index import POST_LIST_DEPENDENCY, PostListQuery
 
 
 def update_deps(post, lang, task):
@@ -59,6 +61,10 @@ class RenderPosts(Task):
             "demote_headers": self.site.config['DEMOTE_HEADERS'],
         }
         self.tl_changed = False
+        if getattr(self, 'compile_pipeline', None) is not None:
+            self.compile_pipeline.close()
+        self.compile_pipeline = CompilePipeline(self.site, self.site.config['COMPILE_PROCESSES'],
+                                                utils.get_logger('render_posts', utils.STDERR_HANDLER))
 
         yield self.group_task()
 
@@ -78,24 +84,29 @@ class RenderPosts(Task):
             for post in kw['timeline']:
                 if not post.is_translation_available(lang) and not self.site.config['SHOW_UNTRANSLATED_POSTS']:
                     continue
-                # Extra config dependencies picked from config
+                # Extra config dependencies picked from config, and the
+                # results of the post lists in the post
+                post_deps_dict = copy(deps_dict)
                 for p in post.fragment_deps(lang):
                     if p.startswith('####MAGIC####CONFIG:'):
                         k = p.split('####MAGIC####CONFIG:', 1)[-1]
-                        deps_dict[k] = self.site.config.get(k)
+                        post_deps_dict[k] = self.site.config.get(k)
+                    elif p.startswith(POST_LIST_DEPENDENCY):
+                        post_deps_dict[p] = self.site.timeline_index.post_list(PostListQuery.from_dependency(p))
                 dest = post.translated_base_path(lang)
                 file_dep = [p for p in post.fragment_deps(lang) if not p.startswith("####MAGIC####")]
+                self.compile_pipeline.add(post, lang, file_dep)
                 task = {
                     'basename': self.name,
                     'name': dest,
                     'file_dep': file_dep,
                     'targets': [dest],
-                    'actions': [(post.compile, (lang, )),
+                    'actions': [(self.compile_pipeline.compile, (post, lang, )),
                                 (update_deps, (post, lang, )),
                                 ],
                     'clean': True,
                     'uptodate': [
-                        utils.config_changed(deps_dict, 'nikola.plugins.task.posts'),
+                        utils.config_changed(post_deps_dict, 'nikola.plugins.task.posts'),
                         lambda p=post, l=lang: self.dependence_on_timeline(p, l)
                     ] + post.fragment_deps_uptodate(lang),
                     'task_dep': ['render_posts:timeline_changes']
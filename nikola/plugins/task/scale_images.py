@@ -29,7 +29,7 @@
 import os
 
 from nikola.plugin_categories import Task
-from nikola.image_processing import ImageProcessor
+from nikola.image_processing import ImageProcessor, ImagePipeline
 from nikola import utils
 
 
@@ -61,18 +61,21 @@ class ScaleImage(Task, ImageProcessor):
                 dst_file = os.path.join(dst_dir, src_name)
                 src_file = os.path.join(root, src_name)
                 thumb_file = '.thumbnail'.join(os.path.splitext(dst_file))
+                self.image_pipeline.add(src_file, [(dst_file, self.kw['max_image_size']),
+                                                   (thumb_file, self.kw['image_thumbnail_size'])], False)
                 yield {
                     'name': dst_file,
                     'file_dep': [src_file],
                     'targets': [dst_file, thumb_file],
-                    'actions': [(self.process_image, (src_file, dst_file, thumb_file))],
+                    'actions': [(self.image_pipeline.resize, (src_file,))],
                     'clean': True,
                 }
 
     def process_image(self, src, dst, thumb):
         """Resize an image."""
-        self.resize_image(src, dst, self.kw['max_image_size'], False)
-        self.resize_image(src, thumb, self.kw['image_thumbnail_size'], False)
+        self.image_pipeline.add(src, [(dst, self.kw['max_image_size']),
+                                      (thumb, self.kw['image_thumbnail_size'])], False)
+        self.image_pipeline.resize(src)
 
     def gen_tasks(self):
         """Copy static files into the output folder."""
@@ -86,6 +89,9 @@ class ScaleImage(Task, ImageProcessor):
 
         self.image_ext_list = self.image_ext_list_builtin
         self.image_ext_list.extend(self.site.config.get('EXTRA_IMAGE_EXTENSIONS', []))
+        if getattr(self, 'image_pipeline', None) is not None:
+            self.image_pipeline.close()
+        self.image_pipeline = ImagePipeline(self, self.site.config['IMAGE_PROCESSES'])
 
         yield self.group_task()
         for src in self.kw['image_folders']:
@@ -122,22 +122,15 @@ class RenderTags(Task):
                 sys.exit(1)
             categories[slug] = category
 
-        tag_list = list(self.site.posts_per_tag.items())
-        cat_list = list(self.site.posts_per_category.items())
+        timeline_index = self.site.timeline_index
 
-        def render_lists(tag, posts, is_category=True):
+        def render_lists(tag, is_category=True):
             """Render tag pages as RSS files and lists/indexes."""
-            post_list = sorted(posts, key=lambda a: a.date)
-            post_list.reverse()
+            kind = "category" if is_category else "tag"
             for lang in kw["translations"]:
-                if kw["show_untranslated_posts"]:
-                    filtered_posts = post_list
-                else:
-                    filtered_posts = [x for x in post_list
-                                      if x.is_translation_available(lang)]
+                filtered_posts = timeline_index.view(kind, tag, lang, not kw["show_untranslated_posts"])
                 if kw["generate_atom"] or kw["generate_rss"]:
                     targets = []
-                    kind = "category" if is_category else "tag"
                     atom_path = self.site.path(kind + "_atom", tag, lang)
                     if kw['generate_atom']:
                         atom_output_name = os.path.join(kw['output_folder'],
@@ -190,14 +183,14 @@ class RenderTags(Task):
                 if kw['category_pages_are_indexes'] if is_category else kw['tag_pages_are_indexes']:
                     yield self.tag_page_as_index(tag, lang, filtered_posts, kw, is_category)
                 else:
-                    yield self.tag_page_as_list(tag, lang, filtered_posts, kw, is_category)
+                    yield self.tag_page_as_list(tag, lang, list(filtered_posts), kw, is_category)
 
-        for tag, posts in tag_list:
-            for task in render_lists(tag, posts, False):
+        for tag in self.site.posts_per_tag:
+            for task in render_lists(tag, False):
                 yield task
 
-        for path, posts in cat_list:
-            for task in render_lists(path, posts, True):
+        for path in self.site.posts_per_category:
+            for task in render_lists(path, True):
                 yield task
 
         # Tag cloud json file
@@ -209,8 +202,7 @@ class RenderTags(Task):
                                      'date': post.date.strftime('%m/%d/%Y'),
                                      'isodate': post.date.isoformat(),
                                      'url': post.permalink(post.default_lang)}
-                                    for post in reversed(sorted(self.site.timeline, key=lambda post: post.date))
-                                    if tag in post.alltags])
+                                    for post in timeline_index.view('tag', tag)])
             tag_cloud_data[tag] = [len(posts), self.site.link(
                 'tag', tag, self.site.config['DEFAULT_LANG']), tag_posts]
         output_name = os.path.join(kw['output_folder'],
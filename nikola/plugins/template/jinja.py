@@ -28,6 +28,8 @@
 """Jinja template handler."""
 
 from __future__ import unicode_literals
+import hashlib
+import io
 import os
 import json
 from collections import deque
@@ -38,7 +40,9 @@ except ImportError:
     jinja2 = None  # NOQA
 
 from nikola.plugin_categories import TemplateSystem
-from nikola.utils import makedirs, req_missing
+from nikola.utils import makedirs, req_missing, get_logger, write_atomically, STDERR_HANDLER
+
+LOGGER = get_logger('jinja', STDERR_HANDLER)
 
 
 class JinjaTemplates(TemplateSystem):
@@ -47,6 +51,9 @@ class JinjaTemplates(TemplateSystem):
     name = "jinja"
     lookup = None
     dependency_cache = {}
+    cache_dir = None
+    reference_cache = None
+    reference_cache_changed = False
 
     def __init__(self):
         """Initialize Jinja2 environment with extended set of filters."""
@@ -65,8 +72,43 @@ class JinjaTemplates(TemplateSystem):
         if jinja2 is None:
             req_missing(['jinja2'], 'use this theme')
         self.directories = directories
+        # Bytecode is cached per theme chain (and by Jinja, per template source)
+        chain = hashlib.sha1('\0'.join(os.path.abspath(d) for d in directories).encode('utf-8'))
+        self.cache_dir = os.path.join(cache_folder, '.jinja.tmp', chain.hexdigest())
+        makedirs(self.cache_dir)
+        self.lookup.bytecode_cache = jinja2.FileSystemBytecodeCache(self.cache_dir)
+        self.load_reference_cache()
         self.create_lookup()
 
+    def load_reference_cache(self):
+        """Load the templates referenced by each template source, found in previous runs."""
+        try:
+            with io.open(os.path.join(self.cache_dir, 'deps.json'), 'r', encoding='utf-8') as inf:
+                self.reference_cache = json.load(inf)
+        except (IOError, OSError, ValueError):
+            self.reference_cache = {}
+        self.reference_cache_changed = False
+
+    def save_reference_cache(self):
+        """Save the referenced templates, if new ones were found."""
+        if not self.reference_cache_changed:
+            return
+        write_atomically(os.path.join(self.cache_dir, 'deps.json'), json.dumps(self.reference_cache, sort_keys=True))
+        self.reference_cache_changed = False
+
+    def precompile_templates(self):
+        """Compile all the templates of the theme chain ahead of time.
+
+        Compiled templates are kept by the environment and in the bytecode
+        cache, so processes forked later do not compile them again.
+        """
+        for template_name in self.lookup.list_templates(filter_func=lambda name: name.endswith('.tmpl')):
+            try:
+                self.lookup.get_template(template_name)
+            except jinja2.TemplateError as e:
+                # Reported if the template is ever used
+                LOGGER.debug('Cannot precompile {0}: {1}'.format(template_name, e))
+
     def inject_directory(self, directory):
         """Add a directory to the lookup and recreate it if it's not there yet."""
         if directory not in self.directories:
@@ -82,6 +124,8 @@ class JinjaTemplates(TemplateSystem):
         """Set the Nikola site."""
         self.site = site
         self.lookup.filters.update(self.site.config['TEMPLATE_FILTERS'])
+        if self.site.config['JINJA_PRECOMPILE_TEMPLATES']:
+            self.precompile_templates()
 
     def render_template(self, template_name, output_name, context):
         """Render the template into output_name using context."""
@@ -113,11 +157,23 @@ class JinjaTemplates(TemplateSystem):
                 source, filename = self.lookup.loader.get_source(self.lookup,
                                                                  curr)[:2]
                 deps.append(filename)
-                ast = self.lookup.parse(source)
-                dep_names = meta.find_referenced_templates(ast)
+                dep_names = self.referenced_templates(source)
                 for dep_name in dep_names:
                     if (dep_name not in visited_templates and dep_name is not None):
                         visited_templates.add(dep_name)
                         queue.append(dep_name)
             self.dependency_cache[template_name] = deps
+            self.save_reference_cache()
         return self.dependency_cache[template_name]
+
+    def referenced_templates(self, source):
+        """Find the templates a template source extends, includes or imports."""
+        key = hashlib.sha1(source.encode('utf-8')).hexdigest()
+        if self.reference_cache is None or key not in self.reference_cache:
+            ast = self.lookup.parse(source)
+            dep_names = list(meta.find_referenced_templates(ast))
+            if self.reference_cache is None:
+                return dep_names
+            self.reference_cache[key] = dep_names
+            self.reference_cache_changed = True
+        return self.reference_cache[key]
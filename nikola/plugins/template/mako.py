@@ -27,8 +27,11 @@
 """Mako template handler."""
 
 from __future__ import unicode_literals, print_function, absolute_import
+import errno
+import hashlib
+import io
+import json
 import os
-import shutil
 import sys
 import tempfile
 
@@ -38,7 +41,7 @@ from mako.template import Template
 from markupsafe import Markup  # It's ok, Mako requires it
 
 from nikola.plugin_categories import TemplateSystem
-from nikola.utils import makedirs, get_logger, STDERR_HANDLER
+from nikola.utils import makedirs, get_logger, write_atomically, STDERR_HANDLER
 
 LOGGER = get_logger('mako', STDERR_HANDLER)
 
@@ -53,10 +56,15 @@ class MakoTemplates(TemplateSystem):
     filters = {}
     directories = []
     cache_dir = None
+    deps_cache = None
+    deps_cache_changed = False
 
     def get_deps(self, filename):
         """Get dependencies for a template (internal function)."""
         text = util.read_file(filename)
+        digest = self.template_digest(filename, text)
+        if self.deps_cache is not None and digest in self.deps_cache:
+            return list(self.deps_cache[digest])
         lex = lexer.Lexer(text=text, filename=filename)
         lex.parse()
 
@@ -65,8 +73,48 @@ class MakoTemplates(TemplateSystem):
             keyword = getattr(n, 'keyword', None)
             if keyword in ["inherit", "namespace"] or isinstance(n, parsetree.IncludeTag):
                 deps.append(n.attributes['file'])
+        if self.deps_cache is not None:
+            self.deps_cache[digest] = deps
+            self.deps_cache_changed = True
         return deps
 
+    def template_digest(self, filename, text=None):
+        """Hash a template's path and contents."""
+        if text is None:
+            text = util.read_file(filename)
+        digest = hashlib.sha1(os.path.abspath(filename).encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(text)
+        return digest.hexdigest()
+
+    def module_filename(self, filename, uri):
+        """Get the path of the compiled module of a template.
+
+        Modules are named after the template's path and contents, so
+        they can be kept between runs: changed templates, or templates
+        found in another theme, get a new module.  Each template has its
+        own folder, and the modules of older contents are removed from it
+        (other processes may be writing the current one meanwhile).
+        """
+        path_digest = hashlib.sha1(os.path.abspath(filename).encode('utf-8')).hexdigest()
+        module_dir = os.path.join(self.cache_dir, path_digest[:2], path_digest)
+        digest = self.template_digest(filename)
+        module_path = os.path.join(module_dir, digest + '.py')
+        if not os.path.exists(module_path):
+            for folder in (module_dir, os.path.join(module_dir, '__pycache__')):
+                try:
+                    names = os.listdir(folder)
+                except OSError:
+                    continue
+                for name in names:
+                    if name.endswith(('.py', '.pyc')) and not name.startswith(digest + '.'):
+                        try:
+                            os.remove(os.path.join(folder, name))
+                        except OSError as e:
+                            if e.errno != errno.ENOENT:  # Removed by another process
+                                raise
+        return module_path
+
     def set_directories(self, directories, cache_folder):
         """Create a new template lookup with set directories."""
         cache_dir = os.path.join(cache_folder, '.mako.tmp')
@@ -77,12 +125,27 @@ class MakoTemplates(TemplateSystem):
             except UnicodeEncodeError:
                 cache_dir = tempfile.mkdtemp()
                 LOGGER.warning('Because of a Mako bug, setting cache_dir to {0}'.format(cache_dir))
-        if os.path.exists(cache_dir):
-            shutil.rmtree(cache_dir)
         self.directories = directories
         self.cache_dir = cache_dir
+        self.load_deps_cache()
         self.create_lookup()
 
+    def load_deps_cache(self):
+        """Load the template dependencies found in previous runs."""
+        try:
+            with io.open(os.path.join(self.cache_dir, 'deps.json'), 'r', encoding='utf-8') as inf:
+                self.deps_cache = json.load(inf)
+        except (IOError, OSError, ValueError):
+            self.deps_cache = {}
+        self.deps_cache_changed = False
+
+    def save_deps_cache(self):
+        """Save the template dependencies, if new ones were found."""
+        if not self.deps_cache_changed:
+            return
+        write_atomically(os.path.join(self.cache_dir, 'deps.json'), json.dumps(self.deps_cache, sort_keys=True))
+        self.deps_cache_changed = False
+
     def inject_directory(self, directory):
         """Add a directory to the lookup and recreate it if it's not there yet."""
         if directory not in self.directories:
@@ -94,6 +157,7 @@ class MakoTemplates(TemplateSystem):
         self.lookup = TemplateLookup(
             directories=self.directories,
             module_directory=self.cache_dir,
+            modulename_callable=self.module_filename,
             output_encoding='utf-8')
 
     def set_site(self, site):
@@ -128,6 +192,7 @@ class MakoTemplates(TemplateSystem):
             for fname in dep_filenames:
                 deps += self.template_deps(fname)
             self.cache[template_name] = tuple(deps)
+            self.save_deps_cache()
         return list(self.cache[template_name])
 
 
@@ -29,6 +29,7 @@
 from __future__ import unicode_literals, print_function, absolute_import
 
 import io
+import itertools
 from collections import defaultdict
 import datetime
 import hashlib
@@ -75,6 +76,23 @@ __all__ = ('Post',)
 TEASER_REGEXP = re.compile('<!--\s*TEASER_END(:(.+))?\s*-->', re.IGNORECASE)
 _UPGRADE_METADATA_ADVERTISED = False
 
+# Processed fragments of compiled posts, keyed by post, language, compiled
+# file and its mtime and size (the FRAGMENT_CACHE_SIZE most recently
+# used ones).  See Post.text.
+_FRAGMENT_CACHE = utils.LRUCache(1000)
+
+# Hyphenation dictionaries, by Nikola language (None when there is none);
+# each is loaded once per process.  See hyphenate.
+_HYPHENATORS = {}
+# Hyphenated words, by language; a memo is emptied when it gets
+# bigger than HYPHENATED_WORDS_SIZE
+_HYPHENATED_WORDS = {}
+HYPHENATED_WORDS_SIZE = 100000
+# Elements whose text is hyphenated (with their descendants), and those
+# that keep their parents from being hyphenated
+HYPHENATED_TAGS = ('p', 'li', 'span')
+UNHYPHENATED_TAGS = ('kbd', 'code', 'samp', 'mark', 'math', 'data', 'ruby', 'svg')
+
 
 class Post(object):
     """Represent a blog post or site page."""
@@ -87,13 +105,21 @@ class Post(object):
         use_in_feeds,
         messages,
         template_name,
-        compiler
+        compiler,
+        metadata=None,
+        dir_listings=None
     ):
         """Initialize post.
 
         The source path is the user created post file. From it we calculate
         the meta file, as well as any translations available, and
         the .html fragment file path.
+
+        If ``metadata`` is given, it must be the ``raw_metadata`` of a post
+        read earlier from the same files, and they are not read again.
+        If ``dir_listings`` is given, it is a dict used to list the
+        directories of the post files once for all the posts created
+        with it, instead of checking their files one by one.
         """
         self.config = config
         self.compiler = compiler
@@ -138,21 +164,24 @@ class Post(object):
         self._dependency_uptodate_fragment = defaultdict(list)
         self._dependency_uptodate_page = defaultdict(list)
 
-        default_metadata, self.newstylemeta = get_meta(self, self.config['FILE_METADATA_REGEXP'], self.config['UNSLUGIFY_TITLES'])
+        if metadata is None:
+            metadata = self._read_metadata(dir_listings)
+        self.raw_metadata = metadata
+        self.is_two_file = metadata['is_two_file']
+        self.newstylemeta = metadata['newstylemeta']
+        self.translated_to = set(metadata['translated_to'])
 
+        default_metadata = defaultdict(lambda: '')
+        default_metadata.update(metadata['meta'][self.default_lang])
         self.meta = Functionary(lambda: None, self.default_lang)
         self.meta[self.default_lang] = default_metadata
 
         # Load internationalized metadata
         for lang in self.translations:
-            if os.path.isfile(get_translation_candidate(self.config, self.source_path, lang)):
-                self.translated_to.add(lang)
             if lang != self.default_lang:
                 meta = defaultdict(lambda: '')
                 meta.update(default_metadata)
-                _meta, _nsm = get_meta(self, self.config['FILE_METADATA_REGEXP'], self.config['UNSLUGIFY_TITLES'], lang)
-                self.newstylemeta = self.newstylemeta and _nsm
-                meta.update(_meta)
+                meta.update(metadata['meta'][lang])
                 self.meta[lang] = meta
 
         if not self.is_translation_available(self.default_lang):
@@ -230,6 +259,31 @@ class Post(object):
         # Register potential extra dependencies
         self.compiler.register_extra_dependencies(self)
 
+    def _read_metadata(self, dir_listings=None):
+        """Read the metadata of the post and its translations from disk.
+
+        The result only holds plain data, so it can be cached or sent
+        between processes, and passed back to ``Post`` as ``metadata``.
+        """
+        default_metadata, newstylemeta = get_meta(self, self.config['FILE_METADATA_REGEXP'], self.config['UNSLUGIFY_TITLES'],
+                                                  dir_listings=dir_listings)
+        meta = {self.default_lang: dict(default_metadata)}
+        translated_to = []
+        for lang in self.translations:
+            if _file_exists(get_translation_candidate(self.config, self.source_path, lang), dir_listings):
+                translated_to.append(lang)
+            if lang != self.default_lang:
+                _meta, _nsm = get_meta(self, self.config['FILE_METADATA_REGEXP'], self.config['UNSLUGIFY_TITLES'], lang,
+                                       dir_listings)
+                newstylemeta = newstylemeta and _nsm
+                meta[lang] = dict(_meta)
+        return {
+            'meta': meta,
+            'translated_to': translated_to,
+            'newstylemeta': newstylemeta,
+            'is_two_file': self.is_two_file,
+        }
+
     def _get_hyphenate(self):
         return bool(self.config['HYPHENATE'] or self.meta('hyphenate'))
 
@@ -465,8 +519,12 @@ class Post(object):
         deps.append(utils.config_changed({1: sorted(self.compiler.config_dependencies)}, 'nikola.post.Post.deps_uptodate:compiler:' + self.source_path))
         return deps
 
-    def compile(self, lang):
-        """Generate the cache/ file with the compiled post."""
+    def compile(self, lang, compile_html=None):
+        """Generate the cache/ file with the compiled post.
+
+        ``compile_html`` replaces the compiler's ``compile_html`` method,
+        for example to write a fragment compiled in another process.
+        """
         def wrap_encrypt(path, password):
             """Wrap a post with encryption."""
             with io.open(path, 'r+', encoding='utf8') as inf:
@@ -480,7 +538,7 @@ class Post(object):
             return
         # Set the language to the right thing
         LocaleBorg().set_locale(lang)
-        self.compile_html(
+        (compile_html or self.compile_html)(
             self.translated_source_path(lang),
             dest,
             self.is_two_file),
@@ -566,9 +624,24 @@ class Post(object):
 
         All links in the returned HTML will be relative.
         The HTML returned is a bare fragment, not a full document.
+
+        The compiled file is parsed once per process (as long as it does
+        not change), and each variant of the text is only built once.
         """
         if lang is None:
             lang = nikola.utils.LocaleBorg().current_lang
+        fragment = self._fragment(lang)
+        key = (teaser_only, strip_html, show_read_more_link, feed_read_more_link, feed_links_append_query)
+        try:
+            return fragment['text'][key]
+        except KeyError:
+            data = self._text(fragment['data'], lang, teaser_only, strip_html, show_read_more_link,
+                              feed_read_more_link, feed_links_append_query)
+            fragment['text'][key] = data
+            return data
+
+    def _fragment(self, lang):
+        """Return the processed fragment for that language, from the fragment cache if possible."""
         file_name = self._translated_file_path(lang)
 
         # Yes, we compile it and screw it.
@@ -577,11 +650,27 @@ class Post(object):
         if not os.path.isfile(file_name):
             self.compile(lang)
 
+        st = os.stat(file_name)
+        key = (self, lang, file_name, st.st_mtime, st.st_size)
+        fragment = _FRAGMENT_CACHE.get(key)
+        if fragment is None:
+            data, paragraphs = self._read_fragment(file_name, lang)
+            fragment = {'data': data, 'text': {}, 'counts': {}}
+            if paragraphs is not None:
+                fragment['counts']['paragraphs'] = paragraphs
+            _FRAGMENT_CACHE[key] = fragment
+        return fragment
+
+    def _read_fragment(self, file_name, lang):
+        """Read and process the compiled file: absolute links and hyphenation.
+
+        Returns the processed HTML and its paragraph count (None if unknown).
+        """
         with io.open(file_name, "r", encoding="utf8") as post_file:
             data = post_file.read().strip()
 
         if self.compiler.extension() == '.php':
-            return data
+            return data, None
         try:
             document = html5lib.html5parser.parse(data, treebuilder='lxml',
                                                   namespaceHTMLElements=False)
@@ -590,9 +679,11 @@ class Post(object):
         except lxml.etree.ParserError as e:
             # if we don't catch this, it breaks later (Issue #374)
             if str(e) == "Document is empty":
-                return ""
+                return "", ""
             # let other errors raise
             raise(e)
+        # output is a float, for no real reason at all
+        paragraphs = int(document.xpath('count(//p)'))
         base_url = self.permalink(lang=lang)
         document.make_links_absolute(base_url)
 
@@ -603,6 +694,13 @@ class Post(object):
             data = lxml.html.tostring(document.body, encoding='unicode')
         except:
             data = lxml.html.tostring(document, encoding='unicode')
+        return data, paragraphs
+
+    def _text(self, data, lang, teaser_only, strip_html, show_read_more_link,
+              feed_read_more_link, feed_links_append_query):
+        """Build a variant of the processed fragment, see ``text``."""
+        if self.compiler.extension() == '.php':
+            return data
 
         if teaser_only:
             teaser_regexp = self.config.get('TEASER_REGEXP', TEASER_REGEXP)
@@ -648,18 +746,27 @@ class Post(object):
 
         return data
 
+    def _word_count(self, lang, teaser_only=False):
+        """Return the number of words in the text (or teaser) for that language."""
+        counts = self._fragment(lang)['counts']
+        key = ('words', teaser_only)
+        if key not in counts:
+            counts[key] = len(self.text(lang, teaser_only=teaser_only, strip_html=True).split())
+        return counts[key]
+
     @property
     def reading_time(self):
         """Reading time based on length of text."""
         if self._reading_time is None:
-            text = self.text(strip_html=True)
+            lang = nikola.utils.LocaleBorg().current_lang
             words_per_minute = 220
-            words = len(text.split())
-            markup = lxml.html.fromstring(self.text(strip_html=False))
-            embeddables = [".//img", ".//picture", ".//video", ".//audio", ".//object", ".//iframe"]
-            media_time = 0
-            for embedded in embeddables:
-                media_time += (len(markup.findall(embedded)) * 0.33)  # +20 seconds
+            words = self._word_count(lang)
+            counts = self._fragment(lang)['counts']
+            if 'media' not in counts:
+                markup = lxml.html.fromstring(self.text(lang, strip_html=False))
+                embeddables = [".//img", ".//picture", ".//video", ".//audio", ".//object", ".//iframe"]
+                counts['media'] = sum(len(markup.findall(embedded)) for embedded in embeddables)
+            media_time = counts['media'] * 0.33  # +20 seconds
             self._reading_time = int(ceil((words / words_per_minute) + media_time)) or 1
         return self._reading_time
 
@@ -667,9 +774,9 @@ class Post(object):
     def remaining_reading_time(self):
         """Remaining reading time based on length of text (does not include teaser)."""
         if self._remaining_reading_time is None:
-            text = self.text(teaser_only=True, strip_html=True)
+            lang = nikola.utils.LocaleBorg().current_lang
             words_per_minute = 220
-            words = len(text.split())
+            words = self._word_count(lang, teaser_only=True)
             self._remaining_reading_time = self.reading_time - int(ceil(words / words_per_minute)) or 1
         return self._remaining_reading_time
 
@@ -677,25 +784,28 @@ class Post(object):
     def paragraph_count(self):
         """Return the paragraph count for this post."""
         if self._paragraph_count is None:
-            # duplicated with Post.text()
             lang = nikola.utils.LocaleBorg().current_lang
-            file_name = self._translated_file_path(lang)
-            with io.open(file_name, "r", encoding="utf8") as post_file:
-                data = post_file.read().strip()
-            try:
-                document = html5lib.html5parser.parse(
-                    data, treebuilder='lxml', namespaceHTMLElements=False)
-                document = lxml.html.fragment_fromstring(
-                    lxml.html.tostring(document), "body")
-            except lxml.etree.ParserError as e:
-                # if we don't catch this, it breaks later (Issue #374)
-                if str(e) == "Document is empty":
-                    return ""
-                # let other errors raise
-                raise(e)
-
-            # output is a float, for no real reason at all
-            self._paragraph_count = int(document.xpath('count(//p)'))
+            counts = self._fragment(lang)['counts']
+            if 'paragraphs' not in counts:
+                # Only PHP fragments are not parsed by Post._read_fragment()
+                file_name = self._translated_file_path(lang)
+                with io.open(file_name, "r", encoding="utf8") as post_file:
+                    data = post_file.read().strip()
+                try:
+                    document = html5lib.html5parser.parse(
+                        data, treebuilder='lxml', namespaceHTMLElements=False)
+                    document = lxml.html.fragment_fromstring(
+                        lxml.html.tostring(document), "body")
+                except lxml.etree.ParserError as e:
+                    # if we don't catch this, it breaks later (Issue #374)
+                    if str(e) == "Document is empty":
+                        return ""
+                    # let other errors raise
+                    raise(e)
+
+                # output is a float, for no real reason at all
+                counts['paragraphs'] = int(document.xpath('count(//p)'))
+            self._paragraph_count = counts['paragraphs']
         return self._paragraph_count
 
     @property
@@ -897,16 +1007,75 @@ def _get_metadata_from_filename_by_regex(filename, metadata_regexp, unslugify_ti
     return meta
 
 
-def get_metadata_from_file(source_path, config=None, lang=None):
-    """Extract metadata from the file itself, by parsing contents."""
+def _file_exists(path, dir_listings=None):
+    """Check if a file exists, listing its directory only once.
+
+    ``dir_listings`` is a dict of the already listed directories, shared
+    by all the posts scanned together.  Without it, the file is checked
+    on its own.
+    """
+    if dir_listings is None:
+        return os.path.isfile(path)
+    dirname, basename = os.path.split(path)
+    names = dir_listings.get(dirname)
+    if names is None:
+        try:
+            names = set(os.listdir(dirname or '.'))
+        except OSError:
+            names = set([])
+        dir_listings[dirname] = names
+    return basename in names
+
+
+class _LineReader(object):
+    """The stripped lines of a file, read only as far as they are used.
+
+    Metadata is at the top of a file, so most of it is never read.
+    """
+
+    def __init__(self, lines):
+        """Initialize the reader with an iterable of lines."""
+        self._lines = iter(lines)
+        self._read = []
+
+    def __getitem__(self, index):
+        """Get a line, reading up to it."""
+        if index < 0:
+            raise IndexError(index)
+        while len(self._read) <= index:
+            try:
+                self._read.append(next(self._lines).strip())
+            except StopIteration:
+                raise IndexError(index)
+        return self._read[index]
+
+    def __iter__(self):
+        """Iterate over the lines, reading them as needed."""
+        index = 0
+        while True:
+            try:
+                yield self[index]
+            except IndexError:
+                return
+            index += 1
+
+
+def get_metadata_from_file(source_path, config=None, lang=None, dir_listings=None):
+    """Extract metadata from the file itself, by parsing contents.
+
+    Only the metadata header is read, unless the title has to be found
+    in the contents.  If ``dir_listings`` (a dict) is given, directory
+    listings are kept there and used to skip missing files.
+    """
     try:
         if lang and config:
             source_path = get_translation_candidate(config, source_path, lang)
         elif lang:
             source_path += '.' + lang
+        if dir_listings is not None and not _file_exists(source_path, dir_listings):
+            return {}
         with io.open(source_path, "r", encoding="utf-8-sig") as meta_file:
-            meta_data = [x.strip() for x in meta_file.readlines()]
-        return _get_metadata_from_file(meta_data)
+            return _get_metadata_from_file(iter(meta_file.readline, ''))
     except (UnicodeDecodeError, UnicodeEncodeError):
         raise ValueError('Error reading {0}: Nikola only supports UTF-8 files'.format(source_path))
     except Exception:  # The file may not exist, for multilingual sites
@@ -922,9 +1091,8 @@ re_rst_title = re.compile(r'^([{0}]{{4,}})'.format(re.escape(
 
 def _get_title_from_contents(meta_data):
     """Extract title from file contents, LAST RESOURCE."""
-    piece = meta_data[:]
     title = None
-    for i, line in enumerate(piece):
+    for i, line in enumerate(meta_data):
         if re_rst_title.findall(line) and i > 0:
             title = meta_data[i - 1].strip()
             break
@@ -939,14 +1107,23 @@ def _get_title_from_contents(meta_data):
 
 
 def _get_metadata_from_file(meta_data):
-    """Extract metadata from a post's source file."""
+    """Extract metadata from a post's source file.
+
+    ``meta_data`` is an iterable of the lines of the file, which are only
+    read as far as needed.
+    """
     meta = {}
-    if not meta_data:
+    lines = iter(meta_data)
+    for first in lines:
+        break
+    else:
         return meta
 
     # Skip up to one empty line at the beginning (for txt2tags)
-    if not meta_data[0]:
-        meta_data = meta_data[1:]
+    if first.strip():
+        meta_data = _LineReader(itertools.chain([first], lines))
+    else:
+        meta_data = _LineReader(lines)
 
     # First, get metadata from the beginning of the file,
     # up to first empty line
@@ -967,15 +1144,19 @@ def _get_metadata_from_file(meta_data):
     return meta
 
 
-def get_metadata_from_meta_file(path, config=None, lang=None):
-    """Take a post path, and gets data from a matching .meta file."""
+def get_metadata_from_meta_file(path, config=None, lang=None, dir_listings=None):
+    """Take a post path, and gets data from a matching .meta file.
+
+    If ``dir_listings`` (a dict) is given, directory listings are kept
+    there and used instead of checking files one by one.
+    """
     global _UPGRADE_METADATA_ADVERTISED
     meta_path = os.path.splitext(path)[0] + '.meta'
     if lang and config:
         meta_path = get_translation_candidate(config, meta_path, lang)
     elif lang:
         meta_path += '.' + lang
-    if os.path.isfile(meta_path):
+    if _file_exists(meta_path, dir_listings):
         with io.open(meta_path, "r", encoding="utf8") as meta_file:
             meta_data = meta_file.readlines()
 
@@ -990,7 +1171,7 @@ def get_metadata_from_meta_file(path, config=None, lang=None):
         if newstylemeta:
             # New-style metadata is basically the same as reading metadata from
             # a 1-file post.
-            return get_metadata_from_file(path, config, lang), newstylemeta
+            return get_metadata_from_file(path, config, lang, dir_listings), newstylemeta
         else:
             if not _UPGRADE_METADATA_ADVERTISED:
                 LOGGER.warn("Some posts on your site have old-style metadata. You should upgrade them to the new format, with support for extra fields.")
@@ -1024,12 +1205,12 @@ def get_metadata_from_meta_file(path, config=None, lang=None):
         # Metadata file doesn't exist, but not default language,
         # So, if default language metadata exists, return that.
         # This makes the 2-file format detection more reliable (Issue #525)
-        return get_metadata_from_meta_file(path, config, lang=None)
+        return get_metadata_from_meta_file(path, config, lang=None, dir_listings=dir_listings)
     else:
         return {}, True
 
 
-def get_meta(post, file_metadata_regexp=None, unslugify_titles=False, lang=None):
+def get_meta(post, file_metadata_regexp=None, unslugify_titles=False, lang=None, dir_listings=None):
     """Get post's meta from source.
 
     If ``file_metadata_regexp`` is given it will be tried to read
@@ -1037,6 +1218,9 @@ def get_meta(post, file_metadata_regexp=None, unslugify_titles=False, lang=None)
     If ``unslugify_titles`` is True, the extracted title (if any) will be unslugified, as is done in galleries.
     If any metadata is then found inside the file the metadata from the
     file will override previous findings.
+    If ``dir_listings`` (a dict) is given, the directories of the post
+    files are listed once and kept there, instead of checking for every
+    file.
     """
     meta = defaultdict(lambda: '')
 
@@ -1045,7 +1229,7 @@ def get_meta(post, file_metadata_regexp=None, unslugify_titles=False, lang=None)
     except AttributeError:
         config = None
 
-    _, newstylemeta = get_metadata_from_meta_file(post.metadata_path, config, lang)
+    _, newstylemeta = get_metadata_from_meta_file(post.metadata_path, config, lang, dir_listings)
     meta.update(_)
 
     if not meta:
@@ -1065,7 +1249,7 @@ def get_meta(post, file_metadata_regexp=None, unslugify_titles=False, lang=None)
     if not post.is_two_file and not compiler_meta:
         # Meta file has precedence over file, which can contain garbage.
         # Moreover, we should not to talk to the file if we have compiler meta.
-        meta.update(get_metadata_from_file(post.source_path, config, lang))
+        meta.update(get_metadata_from_file(post.source_path, config, lang, dir_listings))
 
     if lang is None:
         # Only perform these checks for the default language
@@ -1083,40 +1267,82 @@ def get_meta(post, file_metadata_regexp=None, unslugify_titles=False, lang=None)
     return meta, newstylemeta
 
 
-def hyphenate(dom, _lang):
-    """Hyphenate a post."""
+def get_hyphenator(_lang):
+    """Get the pyphen dictionary for a language, or None if there is none.
+
+    Dictionaries are loaded once per process.
+    """
+    try:
+        return _HYPHENATORS[_lang]
+    except KeyError:
+        pass
     # circular import prevention
     from .nikola import LEGAL_VALUES
-    lang = None
-    if pyphen is not None:
-        lang = LEGAL_VALUES['PYPHEN_LOCALES'].get(_lang, pyphen.language_fallback(_lang))
-    else:
+    hyphenator = None
+    if pyphen is None:
         utils.req_missing(['pyphen'], 'hyphenate texts', optional=True)
-    if pyphen is not None and lang is not None:
+    else:
+        lang = LEGAL_VALUES['PYPHEN_LOCALES'].get(_lang, pyphen.language_fallback(_lang))
         # If pyphen does exist, we tell the user when configuring the site.
         # If it does not support a language, we ignore it quietly.
+        if lang is not None:
+            try:
+                hyphenator = pyphen.Pyphen(lang=lang)
+            except KeyError:
+                LOGGER.error("Cannot find hyphenation dictoniaries for {0} (from {1}).".format(lang, _lang))
+                LOGGER.error("Pyphen cannot be installed to ~/.local (pip install --user).")
+    _HYPHENATORS[_lang] = hyphenator
+    return hyphenator
+
+
+def hyphenate(dom, _lang):
+    """Hyphenate a post.
+
+    The text of ``p``, ``li`` and ``span`` elements (except those in a
+    ``pre``, or with code, math and the like in them) is hyphenated, in
+    one walk over the document; each word is hyphenated once per process.
+    """
+    hyphenator = get_hyphenator(_lang)
+    if hyphenator is None:
+        return dom
+    words = _HYPHENATED_WORDS.setdefault(_lang, {})
+
+    def hyphenate_word(word):
         try:
-            hyphenator = pyphen.Pyphen(lang=lang)
+            return words[word]
         except KeyError:
-            LOGGER.error("Cannot find hyphenation dictoniaries for {0} (from {1}).".format(lang, _lang))
-            LOGGER.error("Pyphen cannot be installed to ~/.local (pip install --user).")
-        for tag in ('p', 'li', 'span'):
-            for node in dom.xpath("//%s[not(parent::pre)]" % tag):
-                skip_node = False
-                skippable_nodes = ['kbd', 'code', 'samp', 'mark', 'math', 'data', 'ruby', 'svg']
-                if node.getchildren():
-                    for child in node.getchildren():
-                        if child.tag in skippable_nodes or (child.tag == 'span' and 'math' in child.get('class', [])):
-                            skip_node = True
-                elif 'math' in node.get('class', []):
-                    skip_node = True
-                if not skip_node:
-                    insert_hyphens(node, hyphenator)
+            if len(words) >= HYPHENATED_WORDS_SIZE:
+                words.clear()
+            hyphenated = words[word] = hyphenator.inserted(word, hyphen='\u00AD')
+            return hyphenated
+
+    # (node, whether it is in a hyphenated element)
+    stack = [(dom.getroottree().getroot(), False)]
+    while stack:
+        node, inside = stack.pop()
+        if not inside and node.tag in HYPHENATED_TAGS and not _skip_hyphenation(node):
+            parent = node.getparent()
+            inside = parent is None or parent.tag != 'pre'
+        if inside:
+            _hyphenate_node_text(node, hyphenate_word)
+        for child in node.iterchildren():
+            stack.append((child, inside))
     return dom
 
 
-def insert_hyphens(node, hyphenator):
-    """Insert hyphens into a node."""
+def _skip_hyphenation(node):
+    """Check if an element has code, math and the like that must not be hyphenated."""
+    children = node.getchildren()
+    if children:
+        for child in children:
+            if child.tag in UNHYPHENATED_TAGS or (child.tag == 'span' and 'math' in child.get('class', [])):
+                return True
+        return False
+    return 'math' in node.get('class', [])
+
+
+def _hyphenate_node_text(node, hyphenate_word):
+    """Hyphenate the text and tail of a node (but not of its children)."""
     textattrs = ('text', 'tail')
     if isinstance(node, lxml.etree._Entity):
         # HTML entities have no .text
@@ -1125,8 +1351,7 @@ def insert_hyphens(node, hyphenator):
         text = getattr(node, attr)
         if not text:
             continue
-        new_data = ' '.join([hyphenator.inserted(w, hyphen='\u00AD')
-                             for w in text.split(' ')])
+        new_data = ' '.join([hyphenate_word(w) for w in text.split(' ')])
         # Spaces are trimmed, we have to add them manually back
         if text[0].isspace():
             new_data = ' ' + new_data
@@ -1134,6 +1359,10 @@ def insert_hyphens(node, hyphenator):
             new_data += ' '
         setattr(node, attr, new_data)
 
+
+def insert_hyphens(node, hyphenator):
+    """Insert hyphens into a node."""
+    _hyphenate_node_text(node, lambda word: hyphenator.inserted(word, hyphen='\u00AD'))
     for child in node.iterchildren():
         insert_hyphens(child, hyphenator)
 
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+
+# Copyright © 2012-2015 Roberto Alsina and others.
+
+# Permission is hereby granted, free of charge, to any
+# person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the
+# Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the
+# Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+# PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS
+# OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Date-ordered views of the timeline by tag, category, author and so on."""
+
+from __future__ import unicode_literals
+from array import array
+from collections import defaultdict, namedtuple
+import json
+try:
+    from collections.abc import Sequence
+except ImportError:
+    from collections import Sequence  # NOQA
+
+import natsort
+
+# What the index keeps about each post
+PostRecord = namedtuple('PostRecord', ['date', 'year', 'month', 'use_in_feeds', 'is_post',
+                                       'languages', 'tags', 'categories', 'author'])
+
+# Kinds of views, and the posts they are made of: 'timeline' has every
+# post and page, 'author' every post (like author pages), 'lang_tag' and
+# 'lang_category' every post and page by its lowercased tags and category
+# in a language (like the post-list directive matches them), and the
+# others the posts used in feeds (like ``Nikola.posts`` and
+# ``posts_per_tag``)
+KINDS = ('timeline', 'posts', 'tag', 'category', 'author', 'section', 'year', 'month',
+         'lang_tag', 'lang_category')
+
+# Kinds keyed by something that depends on the language
+PER_LANGUAGE_KINDS = ('section', 'lang_tag', 'lang_category')
+
+# Prefix of the dependencies recorded for post list queries
+POST_LIST_DEPENDENCY = '####MAGIC####POSTLIST:'
+
+
+class PostListQuery(namedtuple('PostListQuery', ['show_all', 'categories', 'tags', 'tag_lang',
+                                                 'slugs', 'sort', 'lang', 'start', 'stop', 'reverse'])):
+    """A query for a list of posts, like the post-list directive makes.
+
+    ``categories``, ``tags`` (both lowercase) and ``slugs`` are tuples;
+    empty ones do not filter.  Tags are matched in ``tag_lang``, and
+    categories and the ``sort`` metadata field in ``lang``.
+    """
+
+    __slots__ = ()
+
+    def dependency(self):
+        """Return the dependency to record for the results of this query."""
+        return POST_LIST_DEPENDENCY + json.dumps(list(self))
+
+    @classmethod
+    def from_dependency(cls, dependency):
+        """Get the query of a dependency made by ``dependency()``."""
+        values = json.loads(dependency[len(POST_LIST_DEPENDENCY):])
+        return cls(*[tuple(v) if isinstance(v, list) else v for v in values])
+
+
+class TimelineView(Sequence):
+    """Some posts of the timeline, newest first.
+
+    Only the positions of the posts in the timeline are stored; slicing
+    (and so getting a page of posts) takes time proportional to the size
+    of the slice.
+    """
+
+    def __init__(self, timeline, positions):
+        """Initialize the view."""
+        self._timeline = timeline
+        self.positions = positions
+
+    def __len__(self):
+        """Return the number of posts."""
+        return len(self.positions)
+
+    def __getitem__(self, i):
+        """Return a post, or a list of posts for a slice."""
+        if isinstance(i, slice):
+            return [self._timeline[p] for p in self.positions[i]]
+        return self._timeline[self.positions[i]]
+
+    def __iter__(self):
+        """Iterate over the posts."""
+        timeline = self._timeline
+        for p in self.positions:
+            yield timeline[p]
+
+    def page(self, i, per_page):
+        """Return the i-th page (from 0) of per_page posts."""
+        return self[i * per_page:(i + 1) * per_page]
+
+    def num_pages(self, per_page):
+        """Return the number of pages of per_page posts."""
+        return (len(self.positions) + per_page - 1) // per_page
+
+
+class TimelineIndex(object):
+    """Precomputed views of a site's timeline.
+
+    A view is the list of posts with a given tag, category, author,
+    section, year (``'2016'``) or month (``'2016/01'``), or of all posts
+    (``'posts'``, with ``key=None``) or all posts and pages
+    (``'timeline'``), in timeline order (newest first), optionally only
+    with the posts translated to a language.  The views of a kind are
+    built the first time one of them is used, for all languages at
+    once, and are kept until the index is dropped (after posts are
+    scanned again).
+    """
+
+    def __init__(self, site):
+        """Index the timeline of a site, which must be scanned and sorted."""
+        self.site = site
+        self.timeline = list(site.timeline)
+        self.languages = list(site.config['TRANSLATIONS'].keys())
+        default_lang = site.config['DEFAULT_LANG']
+        self.records = []
+        for post in self.timeline:
+            if post.use_in_feeds:
+                category_path = site.parse_category_name(post.meta('category'))
+                categories = tuple(site.category_path_to_category_name(category_path[:i + 1])
+                                   for i in range(len(category_path)))
+            else:
+                categories = ()
+            self.records.append(PostRecord(
+                post.date,
+                str(post.date.year),
+                '{0}/{1:02d}'.format(post.date.year, post.date.month),
+                post.use_in_feeds,
+                post.is_post,
+                frozenset(post.translated_to),
+                tuple(post.alltags),
+                categories,
+                post.author(default_lang)))
+        # {kind: {key: {lang: positions}}}, lang None being all posts
+        self._views = {}
+        # {PostListQuery: posts}
+        self._post_lists = {}
+
+    def view(self, kind, key=None, lang=None, translated_only=True):
+        """Return the posts of a view, as a TimelineView.
+
+        With a ``lang``, only posts translated to it are included, unless
+        ``translated_only`` is False.  Sections (and ``lang_tag`` and
+        ``lang_category``) are keyed by their value in ``lang``, which is
+        required for them.  Unknown keys give empty views.
+        """
+        views = self._get_views(kind, lang)
+        by_lang = views.get(key)
+        if by_lang is None:
+            positions = array(str('l'))
+        else:
+            positions = by_lang[lang if translated_only else None]
+        return TimelineView(self.timeline, positions)
+
+    def keys(self, kind, lang=None, translated_only=True):
+        """Return the keys of the views of a kind that are not empty.
+
+        ``lang`` and ``translated_only`` are used like in ``view``.
+        """
+        views = self._get_views(kind, lang)
+        if lang is None or not translated_only:
+            return list(views.keys())
+        return [key for key, by_lang in views.items() if by_lang[lang]]
+
+    def post_list(self, query):
+        """Return the posts matching a PostListQuery, as a tuple.
+
+        Results are kept, so identical queries (like the same post list
+        in several posts) are only run once.
+        """
+        posts = self._post_lists.get(query)
+        if posts is None:
+            posts = self._post_lists[query] = tuple(self._run_post_list(query))
+        return posts
+
+    def _run_post_list(self, query):
+        """Find the posts matching a PostListQuery."""
+        positions = self.view('timeline' if query.show_all else 'posts').positions
+        if query.categories:
+            matching = self._matching('lang_category', query.categories, query.lang)
+            positions = [p for p in positions if p in matching]
+        if query.tags:
+            matching = self._matching('lang_tag', query.tags, query.tag_lang)
+            positions = [p for p in positions if p in matching]
+        posts = [self.timeline[p] for p in positions]
+        if query.sort:
+            lang, sort = query.lang, query.sort
+            posts = natsort.natsorted(posts, key=lambda post: post.meta[lang][sort], alg=natsort.ns.F | natsort.ns.IC)
+        posts = posts[query.start:query.stop:-1 if query.reverse else None]
+        if query.slugs:
+            slugs = set(query.slugs)
+            posts = [post for post in posts if post.meta('slug') in slugs]
+        return posts
+
+    def _matching(self, kind, keys, lang):
+        """Return the timeline positions of posts with any of the keys."""
+        matching = set([])
+        for key in keys:
+            matching.update(self.view(kind, key, lang, False).positions)
+        return matching
+
+    def _get_views(self, kind, lang):
+        """Build the views of a kind if needed, and return them."""
+        if kind in PER_LANGUAGE_KINDS:
+            if lang is None:
+                raise ValueError('Timeline views of kind {0} need a language'.format(kind))
+            cache_key = (kind, lang)
+        elif kind in KINDS:
+            cache_key = kind
+        else:
+            raise ValueError('Unknown timeline view kind: {0}'.format(kind))
+        if cache_key not in self._views:
+            self._views[cache_key] = self._build(kind, lang)
+        return self._views[cache_key]
+
+    def _build(self, kind, key_lang=None):
+        """Build all the views of a kind."""
+        grouped = defaultdict(list)
+        for i, record in enumerate(self.records):
+            if kind == 'timeline':
+                grouped[None].append(i)
+            elif kind == 'lang_tag':
+                for tag in set(tag.lower() for tag in self.timeline[i].tags_for_language(key_lang)):
+                    grouped[tag].append(i)
+            elif kind == 'lang_category':
+                grouped[self.timeline[i].meta('category', lang=key_lang).lower()].append(i)
+            elif kind == 'author':
+                if record.is_post:
+                    grouped[record.author].append(i)
+            elif not record.use_in_feeds:
+                continue
+            elif kind == 'posts':
+                grouped[None].append(i)
+            elif kind == 'tag':
+                for tag in record.tags:
+                    grouped[tag].append(i)
+            elif kind == 'category':
+                for category in record.categories:
+                    grouped[category].append(i)
+            elif kind == 'section':
+                grouped[self.timeline[i].section_slug(key_lang)].append(i)
+            else:
+                grouped[getattr(record, kind)].append(i)
+
+        views = {}
+        for key, positions in grouped.items():
+            by_lang = {None: array(str('l'), positions)}
+            for lang in self.languages:
+                by_lang[lang] = array(str('l'), [i for i in positions if lang in self.records[i].languages])
+            views[key] = by_lang
+        return views
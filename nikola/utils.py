@@ -35,21 +35,23 @@ import husl
 import io
 import locale
 import logging
+import multiprocessing
 import natsort
 import os
 import re
 import json
 import shutil
 import socket
-import subprocess
 import sys
+import tempfile
 import dateutil.parser
 import dateutil.tz
 import logbook
 import urilib
 import warnings
 import PyRSS2Gen as rss
-from collections import defaultdict, Callable, OrderedDict
+from collections import defaultdict, OrderedDict
+from contextlib import contextmanager
 from logbook.compat import redirect_logging
 from logbook.more import ExceptionHandler, ColorizedStderrHandler
 from pygments.formatters import HtmlFormatter
@@ -66,10 +68,10 @@ from nikola import DEBUG
 
 __all__ = ('CustomEncoder', 'get_theme_path', 'get_theme_chain', 'load_messages', 'copy_tree',
            'copy_file', 'slugify', 'unslugify', 'to_datetime', 'apply_filters',
-           'config_changed', 'get_crumbs', 'get_tzname', 'get_asset_path',
+           'config_changed', 'config_json_memo', 'get_crumbs', 'get_tzname', 'get_asset_path',
            '_reload', 'unicode_str', 'bytes_str', 'unichr', 'Functionary',
            'TranslatableSetting', 'TemplateHookRegistry', 'LocaleBorg',
-           'sys_encode', 'sys_decode', 'makedirs', 'get_parent_theme_name',
+           'sys_encode', 'sys_decode', 'makedirs', 'write_atomically', 'fork_pool', 'LRUCache', 'get_parent_theme_name',
            'demote_headers', 'get_translation_candidate', 'write_metadata',
            'ask', 'ask_yesno', 'options2docstring', 'os_path_split',
            'get_displayed_page_number', 'adjust_name_for_index_path_list',
@@ -193,7 +195,6 @@ def req_missing(names, purpose, python=True, optional=False):
     return msg
 
 
-from nikola import filters as task_filters  # NOQA
 ENCODING = sys.getfilesystemencoding() or sys.stdin.encoding
 
 
@@ -229,6 +230,100 @@ def makedirs(path):
         raise
 
 
+def write_atomically(path, data):
+    """Write a file at once: readers (other processes too) never see part of it.
+
+    ``data`` is bytes, or text written as UTF-8.  The folder is created if
+    needed.
+    """
+    if isinstance(data, unicode_str):
+        data = data.encode('utf-8')
+    folder = os.path.dirname(path)
+    makedirs(folder)
+    # A new temporary file for every call, even in threads of one process
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + '.', suffix='.tmp', dir=folder or '.')
+    try:
+        with os.fdopen(fd, 'wb') as outf:
+            outf.write(data)
+        if hasattr(os, 'replace'):
+            os.replace(tmp_path, path)
+        else:  # Python 2 cannot replace files on Windows
+            if os.name == 'nt' and os.path.exists(path):
+                os.remove(path)
+            os.rename(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def fork_pool(processes):
+    """Start a pool of worker processes forked from this one, so they inherit its state.
+
+    Returns None with less than two processes, or where processes cannot
+    be forked (outside POSIX systems): the caller does the work itself.
+    """
+    if processes < 2 or os.name != 'posix':
+        return None
+    try:
+        context = multiprocessing.get_context('fork')
+    except AttributeError:  # Python 2 always forks on POSIX
+        context = multiprocessing
+    return context.Pool(processes)
+
+
+class LRUCache(object):
+    """A bounded mapping which forgets its least recently used entries.
+
+    It keeps at most ``size`` entries (none if ``size`` is 0); ``size`` can
+    be changed at any time, and applies when the next entry is added.
+    """
+
+    def __init__(self, size):
+        """Create an empty cache of ``size`` entries."""
+        self.size = size
+        self._data = OrderedDict()
+
+    def get(self, key, default=None):
+        """Return the entry for ``key`` (now the most recently used) or ``default``."""
+        try:
+            value = self._data.pop(key)
+        except KeyError:
+            return default
+        # Most recently used entries go last
+        self._data[key] = value
+        return value
+
+    def __setitem__(self, key, value):
+        """Add or replace an entry, forgetting the least recently used ones if full."""
+        self._data.pop(key, None)
+        while self._data and len(self._data) >= self.size:
+            self._data.popitem(last=False)
+        if self.size > 0:
+            self._data[key] = value
+
+    def __contains__(self, key):
+        """Tell if there is an entry for ``key`` (without using it)."""
+        return key in self._data
+
+    def __len__(self):
+        """Return the number of entries."""
+        return len(self._data)
+
+    def values(self):
+        """Return the entries, least recently used first."""
+        return list(self._data.values())
+
+    def clear(self):
+        """Forget all entries."""
+        self._data.clear()
+
+
+from nikola import filters as task_filters  # NOQA
+
+
 class Functionary(defaultdict):
     """Class that looks like a function, but is a defaultdict."""
 
@@ -510,6 +605,59 @@ class CustomEncoder(json.JSONEncoder):
             return s
 
 
+# config_changed objects made in a config_json_memo block, and the JSON of
+# the dicts and lists shared by their digests, by id, while they are computed
+CONFIG_JSON_CACHE_SIZE = 10000
+_CONFIG_JSON_PENDING = None
+_CONFIG_JSON_CACHE = None
+_CONFIG_JSON_SEEN = None
+
+
+@contextmanager
+def config_json_memo():
+    """Compute the digests of the config_changed objects made in this block at its end.
+
+    Dicts and lists shared by those digests (like the global context or
+    the template hooks, which are shared by most tasks) are serialized
+    once, and their JSON is forgotten as soon as the digests are computed.
+    Nikola generates its tasks in such a block.
+    """
+    global _CONFIG_JSON_PENDING, _CONFIG_JSON_CACHE, _CONFIG_JSON_SEEN
+    if _CONFIG_JSON_PENDING is not None:
+        yield
+        return
+    _CONFIG_JSON_PENDING = pending = []
+    try:
+        yield
+        _CONFIG_JSON_CACHE = {}
+        _CONFIG_JSON_SEEN = set([])
+        for item in pending:
+            item._digest = item._calc_digest()
+    finally:
+        _CONFIG_JSON_PENDING = _CONFIG_JSON_CACHE = _CONFIG_JSON_SEEN = None
+
+
+def _config_json(value):
+    """Serialize a value of a config_changed dict.
+
+    While a config_json_memo block computes its digests, dicts and lists
+    seen more than once are serialized once.
+    """
+    if _CONFIG_JSON_CACHE is None or not isinstance(value, (dict, list)):
+        return json.dumps(value, cls=CustomEncoder, sort_keys=True)
+    cached = _CONFIG_JSON_CACHE.get(id(value))
+    if cached is not None and cached[0] is value:
+        return cached[1]
+    data = json.dumps(value, cls=CustomEncoder, sort_keys=True)
+    if id(value) in _CONFIG_JSON_SEEN:
+        if len(_CONFIG_JSON_CACHE) < CONFIG_JSON_CACHE_SIZE:
+            # Keeping a reference to the value means its id is not reused
+            _CONFIG_JSON_CACHE[id(value)] = (value, data)
+    else:
+        _CONFIG_JSON_SEEN.add(id(value))
+    return data
+
+
 class config_changed(tools.config_changed):
     """A copy of doit's config_changed, using pickle instead of serializing manually."""
 
@@ -519,13 +667,18 @@ class config_changed(tools.config_changed):
         self.identifier = '_config_changed'
         if identifier is not None:
             self.identifier += ':' + identifier
+        self._digest = None
+        if _CONFIG_JSON_PENDING is not None:
+            _CONFIG_JSON_PENDING.append(self)
 
     def _calc_digest(self):
         """Calculate a config_changed digest."""
+        if self._digest is not None:
+            return self._digest
         if isinstance(self.config, str):
             return self.config
         elif isinstance(self.config, dict):
-            data = json.dumps(self.config, cls=CustomEncoder, sort_keys=True)
+            data = self._serialize()
             if isinstance(data, str):  # pragma: no cover # python3
                 byte_data = data.encode("utf-8")
             else:
@@ -538,6 +691,19 @@ class config_changed(tools.config_changed):
                             '{0}, must be string or dict'.format(type(
                                 self.config)))
 
+    def _serialize(self):
+        """Serialize the config, exactly like json.dumps with sorted keys does."""
+        try:
+            items = sorted(self.config.items(), key=lambda item: item[0])
+        except TypeError:
+            return json.dumps(self.config, cls=CustomEncoder, sort_keys=True)
+        parts = []
+        for key, value in items:
+            # The key, converted to a string as json.dumps does it
+            key = json.dumps({key: 0}, cls=CustomEncoder)[1:-4]
+            parts.append(key + ': ' + _config_json(value))
+        return '{' + ', '.join(parts) + '}'
+
     def configure_task(self, task):
         """Configure a task with a digest."""
         task.value_savers.append(lambda: {self.identifier: self._calc_digest()})
@@ -853,8 +1019,13 @@ def apply_filters(task, filters, skip_ext=None):
     """Apply filters to a task.
 
     If any of the targets of the given task has a filter that matches,
-    adds the filter commands to the commands of the task,
-    and the filter itself to the uptodate of the task.
+    adds an action running its filters to the commands of the task (see
+    ``filters.apply_filter_chain``).
+
+    If the target is rendered by ``Nikola.render_template`` in the last
+    action of the task, the filters at the start of its chain that can run
+    in memory (see ``filters.runs_in_memory``) are passed to that action
+    instead, so they run on the rendered page before it is written.
     """
     if '.php' in filters.keys():
         if task_filters.php_template_injection not in filters['.php']:
@@ -873,21 +1044,33 @@ def apply_filters(task, filters, skip_ext=None):
             else:
                 assert False, key
 
+    def render_action(target):
+        actions = task.get('actions', [])
+        if actions:
+            action = actions[-1]
+            if (isinstance(action, tuple) and
+                    getattr(action[0], '__name__', None) == 'render_template' and
+                    len(action[1]) >= 2 and action[1][1] == target):
+                return action
+
     for target in task.get('targets', []):
         ext = os.path.splitext(target)[-1].lower()
         if skip_ext and ext in skip_ext:
             continue
         filter_ = filter_matches(ext)
         if filter_:
-            for action in filter_:
-                def unlessLink(action, target):
-                    if not os.path.islink(target):
-                        if isinstance(action, Callable):
-                            action(target)
-                        else:
-                            subprocess.check_call(action % target, shell=True)
-
-                task['actions'].append((unlessLink, (action, target)))
+            chain = list(filter_)
+            render = render_action(target)
+            if render is not None and chain and task_filters.runs_in_memory(chain[0]):
+                func, args = render
+                args = list(args)
+                if len(args) < 4 or args[3] is None:
+                    args[3:] = [[]]
+                while chain and task_filters.runs_in_memory(chain[0]):
+                    args[3] = args[3] + [chain.pop(0)]
+                task['actions'][-1] = (func, args)
+            if chain:
+                task['actions'].append((task_filters.apply_filter_chain, (chain, target)))
     return task
 
 
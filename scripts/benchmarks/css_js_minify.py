@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Measure minifying the CSS and JavaScript assets of the bootstrap3 theme.
+
+The unminified ``.css`` and ``.js`` files of the bundled bootstrap3
+theme are copied to a temporary directory (``-c`` times), and minified
+in place with the ``rcssmin`` and ``rjsmin`` filters, and again with the
+filter cache filled.  (The ``cssminify`` and ``jsminify`` filters post
+every file to a web service instead.)  In a build, files are filtered by
+their own tasks, which doit runs in parallel with ``nikola build -n N``.
+
+Usage:
+
+$ css_js_minify.py [-c COPIES]
+"""
+
+from __future__ import print_function, unicode_literals
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import nikola
+from nikola import filters
+
+ASSETS = os.path.join(os.path.dirname(nikola.__file__), 'data', 'themes', 'bootstrap3', 'assets')
+
+
+def theme_assets():
+    """Find the unminified CSS and JavaScript files of the theme."""
+    found = []
+    for root, dirs, files in os.walk(ASSETS):
+        for name in files:
+            if name.endswith(('.css', '.js')) and '.min.' not in name and '-min.' not in name:
+                found.append(os.path.join(root, name))
+    return sorted(found)
+
+
+def copy_assets(assets, dest, copies):
+    """Copy the assets to dest, copies times."""
+    fnames = []
+    for i in range(copies):
+        for path in assets:
+            # Make each copy unique, so the filter cache cannot share results
+            fname = os.path.join(dest, '{0}-{1}'.format(i, os.path.basename(path)))
+            with open(path, 'rb') as inf:
+                data = inf.read()
+            with open(fname, 'wb') as outf:
+                outf.write('/* {0} */\n'.format(i).encode('ascii') + data)
+            fnames.append(fname)
+    return fnames
+
+
+def main():
+    """Run the benchmark."""
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument('-c', '--copies', type=int, default=5)
+    args = argparser.parse_args()
+
+    assets = theme_assets()
+    size = sum(os.path.getsize(path) for path in assets) * args.copies
+    print('{0} files, {1:.1f} kB'.format(len(assets) * args.copies, size / 1024.0))
+    tmpdir = tempfile.mkdtemp()
+    try:
+        filters.FILTER_CACHE_FOLDER = os.path.join(tmpdir, 'cache')
+        for label, cached in (('not cached', False), ('cached', True)):
+            work = os.path.join(tmpdir, 'work')
+            if os.path.isdir(work):
+                shutil.rmtree(work)
+            os.makedirs(work)
+            fnames = copy_assets(assets, work, args.copies)
+            if not cached:
+                shutil.rmtree(filters.FILTER_CACHE_FOLDER, ignore_errors=True)
+            filters._minified.clear()
+            start = time.time()
+            for fname in fnames:
+                filter_ = filters.rcssmin if fname.endswith('.css') else filters.rjsmin
+                filters.apply_filter_chain([filter_], fname)
+            elapsed = time.time() - start
+            minified = sum(os.path.getsize(f) for f in fnames)
+            print('{0:>14}: {1:7.3f} s ({2:.1f} kB)'.format(label, elapsed, minified / 1024.0))
+    finally:
+        filters.FILTER_CACHE_FOLDER = None
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
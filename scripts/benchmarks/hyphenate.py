@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Measure hyphenating a long multilingual corpus of posts.
+
+The corpus is made of the handbook (``docs/*.txt``, rendered with
+docutils), in English, and of the theme messages of every language
+pyphen has a dictionary for, each repeated to make long posts.  Posts
+are hyphenated like ``Post.text`` does for hyphenated posts: with
+Nikola's ``hyphenate``, which loads each dictionary once, remembers
+hyphenated words and walks each document once, and with the way it
+used to be done (a new dictionary for every post, one XPath scan per
+element kind and every word hyphenated again).
+
+Usage:
+
+$ hyphenate.py [-r REPEAT] [-p PARAGRAPHS]
+"""
+
+from __future__ import print_function, unicode_literals
+import argparse
+import glob
+import io
+import os
+import time
+
+import docutils.core
+import lxml.html
+import pyphen
+
+import nikola
+from nikola import post
+from nikola.nikola import LEGAL_VALUES
+
+DOCS = os.path.join(os.path.dirname(os.path.dirname(nikola.__file__)), 'docs')
+MESSAGES = os.path.join(os.path.dirname(nikola.__file__), 'data', 'themes', 'base', 'messages')
+
+
+def legacy_hyphenate(dom, _lang):
+    """Hyphenate a post the way Nikola used to."""
+    lang = LEGAL_VALUES['PYPHEN_LOCALES'].get(_lang, pyphen.language_fallback(_lang))
+    hyphenator = pyphen.Pyphen(lang=lang)
+    for tag in ('p', 'li', 'span'):
+        for node in dom.xpath("//%s[not(parent::pre)]" % tag):
+            skip_node = False
+            if node.getchildren():
+                for child in node.getchildren():
+                    if child.tag in post.UNHYPHENATED_TAGS or (child.tag == 'span' and 'math' in child.get('class', [])):
+                        skip_node = True
+            elif 'math' in node.get('class', []):
+                skip_node = True
+            if not skip_node:
+                post.insert_hyphens(node, hyphenator)
+    return dom
+
+
+def corpus(repeat, paragraphs):
+    """Make the posts to hyphenate, as (language, HTML) pairs."""
+    posts = []
+    for path in sorted(glob.glob(os.path.join(DOCS, '*.txt'))):
+        with io.open(path, 'r', encoding='utf-8') as inf:
+            body = docutils.core.publish_parts(inf.read(), writer_name='html', settings_overrides={
+                'report_level': 5, 'halt_level': 5, 'file_insertion_enabled': False})['body']
+        posts.append(('en', '<div>{0}</div>'.format(body)))
+    for lang in sorted(LEGAL_VALUES['PYPHEN_LOCALES']):
+        path = os.path.join(MESSAGES, 'messages_{0}.py'.format(lang))
+        if lang == 'en' or not os.path.isfile(path):
+            continue
+        scope = {}
+        with io.open(path, 'r', encoding='utf-8') as inf:
+            exec(compile(inf.read(), path, 'exec'), scope)
+        texts = sorted(t.replace('%s', '').replace('%d', '') for t in scope['MESSAGES'].values())
+        paragraph = '<p>{0}</p><ul>{1}</ul>'.format(
+            ' '.join(texts), ''.join('<li><span>{0}</span></li>'.format(t) for t in texts))
+        for i in range(repeat):
+            posts.append((lang, '<div>{0}</div>'.format(paragraph * paragraphs)))
+    return posts
+
+
+def run(posts, function):
+    """Hyphenate all posts, returning the time taken."""
+    start = time.time()
+    for lang, html in posts:
+        function(lxml.html.fragment_fromstring(html, 'body'), lang)
+    return time.time() - start
+
+
+def main():
+    """Run the benchmark."""
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument('-r', '--repeat', type=int, default=20)
+    argparser.add_argument('-p', '--paragraphs', type=int, default=10)
+    args = argparser.parse_args()
+
+    posts = corpus(args.repeat, args.paragraphs)
+    words = sum(len(lxml.html.fromstring(html).text_content().split()) for lang, html in posts)
+    print('{0} posts in {1} languages, {2} words'.format(
+        len(posts), len(set(lang for lang, html in posts)), words))
+    for label, function in (('legacy', legacy_hyphenate),
+                            ('hyphenate', post.hyphenate),
+                            ('hyphenate (warm)', post.hyphenate)):
+        elapsed = run(posts, function)
+        print('{0:>17}: {1:7.3f} s ({2:8.0f} words/s)'.format(label, elapsed, words / elapsed))
+
+
+if __name__ == '__main__':
+    main()
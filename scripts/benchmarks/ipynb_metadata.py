@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Measure reading the Nikola metadata of large notebooks.
+
+Synthetic notebooks with plots (long base64 outputs) are written to a
+temporary directory.  Their metadata is read by decoding whole
+notebooks with ``json.load`` (which ``nbformat.read`` does, before
+validating them), and by ``CompileIPynb.read_metadata``, which skips
+the cells and remembers the metadata of unchanged files, once per
+language like ``Post`` asks for it.
+
+Usage:
+
+$ ipynb_metadata.py [-n NOTEBOOKS] [-m MB] [-l LANGUAGES]
+"""
+
+from __future__ import print_function, unicode_literals
+import argparse
+import base64
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from nikola.plugins.compile.ipynb import CompileIPynb
+from nikola.utils import unicode_str
+
+
+class FakePost(object):
+    """The attributes of a post that reading notebook metadata uses."""
+
+    def __init__(self, source_path):
+        """Initialize the post."""
+        self.source_path = source_path
+
+
+def make_notebook(i, size):
+    """Make a notebook with about size bytes of plot outputs."""
+    plot = base64.b64encode(os.urandom(size // 20 * 3 // 4)).decode('ascii')
+    cells = []
+    for j in range(10):
+        cells.append({'cell_type': 'code', 'execution_count': j, 'metadata': {},
+                      'source': ['plot({0})\n'.format(j)],
+                      'outputs': [{'output_type': 'display_data', 'metadata': {},
+                                   'data': {'image/png': plot, 'text/plain': ['<Figure>']}}] * 2})
+    return {
+        'cells': cells,
+        'metadata': {'nikola': {'title': 'Notebook {0}'.format(i), 'slug': 'notebook-{0}'.format(i),
+                                'date': '2016-01-01 12:00:00 UTC'},
+                     'kernelspec': {'name': 'python3', 'display_name': 'Python 3'}},
+        'nbformat': 4,
+        'nbformat_minor': 0,
+    }
+
+
+def main():
+    """Run the benchmark."""
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument('-n', '--notebooks', type=int, default=20)
+    argparser.add_argument('-m', '--megabytes', type=float, default=10)
+    argparser.add_argument('-l', '--languages', type=int, default=3)
+    args = argparser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        paths = []
+        for i in range(args.notebooks):
+            path = os.path.join(tmpdir, 'notebook-{0}.ipynb'.format(i))
+            with io.open(path, 'w', encoding='utf-8') as outf:
+                outf.write(unicode_str(json.dumps(make_notebook(i, int(args.megabytes * 1e6)),
+                                                  sort_keys=True, indent=1)))
+            paths.append(path)
+        print('{0} notebooks of {1:.1f} MB, {2} languages'.format(
+            len(paths), os.path.getsize(paths[0]) / 1e6, args.languages))
+
+        start = time.time()
+        for path in paths:
+            for lang in range(args.languages):
+                with io.open(path, 'r', encoding='utf-8') as inf:
+                    json.load(inf).get('metadata', {}).get('nikola', {})
+        print('json.load:      {0:8.3f} s'.format(time.time() - start))
+
+        compiler = CompileIPynb()
+        start = time.time()
+        for path in paths:
+            for lang in range(args.languages):
+                compiler.read_metadata(FakePost(path), lang=lang)
+        print('read_metadata:  {0:8.3f} s'.format(time.time() - start))
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
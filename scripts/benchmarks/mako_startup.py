@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Measure Mako template startup with a cold and a warm template cache.
+
+A site using a child theme of ``bootstrap3`` (which inherits from
+``base``) is simulated.  Every round creates a new template system, like
+a new ``nikola`` process does, finds the dependencies of every template
+and compiles (or loads) it.  The "cold" rounds start from an empty
+cache, which is what every run did when the cache was removed at
+startup; the "warm" rounds reuse the compiled modules and dependencies
+of the previous round.
+
+Usage:
+
+$ mako_startup.py [-n ROUNDS]
+"""
+
+from __future__ import print_function, unicode_literals
+import argparse
+import io
+import os
+import shutil
+import tempfile
+import time
+
+from nikola.plugins.template.mako import MakoTemplates
+from nikola import utils
+
+
+def make_child_theme(path):
+    """Create a child theme overriding one template."""
+    templates = os.path.join(path, 'templates')
+    utils.makedirs(templates)
+    with io.open(os.path.join(path, 'parent'), 'w', encoding='utf-8') as outf:
+        outf.write('bootstrap3\n')
+    with io.open(os.path.join(templates, 'index.tmpl'), 'w', encoding='utf-8') as outf:
+        outf.write('<%inherit file="base.tmpl"/>\n<%block name="content">Child theme</%block>\n')
+    return templates
+
+
+def startup(directories, cache_folder):
+    """Set up a template system and load every template."""
+    MakoTemplates.cache = {}
+    templates = MakoTemplates()
+    templates.set_directories(list(directories), cache_folder)
+    names = set()
+    for directory in directories:
+        names.update(name for name in os.listdir(directory) if name.endswith('.tmpl'))
+    for name in sorted(names):
+        templates.template_deps(name)
+        templates.lookup.get_template(name)
+    return len(names)
+
+
+def main():
+    """Run the benchmark."""
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument('-n', '--rounds', type=int, default=5)
+    args = argparser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        child = make_child_theme(os.path.join(tmpdir, 'themes', 'child'))
+        directories = [child] + [os.path.join(utils.get_theme_path(theme), 'templates')
+                                 for theme in ('bootstrap3', 'base')]
+        cache_folder = os.path.join(tmpdir, 'cache')
+        for label, clear in (('cold', True), ('warm', False)):
+            startup(directories, cache_folder)
+            elapsed = 0
+            for _ in range(args.rounds):
+                if clear:
+                    shutil.rmtree(cache_folder)
+                start = time.time()
+                count = startup(directories, cache_folder)
+                elapsed += time.time() - start
+            print('{0}: {1:8.1f} ms per startup ({2} templates)'.format(label, elapsed * 1000 / args.rounds, count))
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
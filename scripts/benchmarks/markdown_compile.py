@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Check that compiling Markdown posts does not get slower over a build.
+
+Many short posts are compiled, one after another, by a single
+``CompileMarkdown`` with Nikola's Markdown extensions, like in a full
+build.  The average time per post is printed for every block of posts;
+it should stay flat.  (When the extension list grew with every post,
+each block was slower than the previous one.)
+
+Usage:
+
+$ markdown_compile.py [-n POSTS] [-b BLOCK]
+"""
+
+from __future__ import print_function, unicode_literals
+import argparse
+import io
+import os
+import shutil
+import tempfile
+import time
+
+from nikola.plugins.compile.markdown import CompileMarkdown
+from nikola.plugins.compile.markdown.mdx_gist import GistExtension
+from nikola.plugins.compile.markdown.mdx_nikola import NikolaExtension
+from nikola.plugins.compile.markdown.mdx_podcast import PodcastExtension
+
+POST = """Post {0}
+=========
+
+A short post with *some* **markup**, a [link](https://getnikola.com/)
+and some code:
+
+```python
+print({0})
+```
+
+* One
+* Two
+"""
+
+
+class ExtensionInfo(object):
+    """The parts of a plugin info the Markdown compiler uses."""
+
+    def __init__(self, plugin_object):
+        """Wrap an extension."""
+        self.plugin_object = plugin_object
+        self.name = plugin_object.__class__.__name__
+        self.description = ''
+
+
+class BenchmarkSite(object):
+    """The parts of a site the Markdown compiler uses."""
+
+    def __init__(self):
+        """Initialize the site."""
+        self.config = {'MARKDOWN_EXTENSIONS': ['fenced_code', 'codehilite']}
+        self.compiler_extensions = [ExtensionInfo(ext) for ext in
+                                    (NikolaExtension(), GistExtension(), PodcastExtension())]
+
+
+def main():
+    """Run the benchmark."""
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument('-n', '--posts', type=int, default=10000)
+    argparser.add_argument('-b', '--block', type=int, default=1000)
+    args = argparser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        source = os.path.join(tmpdir, 'post.md')
+        dest = os.path.join(tmpdir, 'post.html')
+        compiler = CompileMarkdown()
+        compiler.set_site(BenchmarkSite())
+        start = time.time()
+        for i in range(args.posts):
+            with io.open(source, 'w', encoding='utf-8') as outf:
+                outf.write(POST.format(i))
+            compiler.compile_html(source, dest)
+            if (i + 1) % args.block == 0:
+                now = time.time()
+                print('posts {0:6}-{1:6}: {2:6.3f} ms per post'.format(
+                    i + 2 - args.block, i + 1, (now - start) * 1000 / args.block))
+                start = now
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Compare the per-page cost of the HTML post-render pipeline.
+
+The "before" pipeline is the one ``Nikola.render_template`` used to run:
+parse the page twice (with html5lib, then with lxml after serializing
+it), rewrite links, write it, and then run the HTML filters on the
+written file (parsing it twice again for tree filters, and once more
+for ``normalize_html``).  The "after" pipeline parses the page once,
+with lxml, runs the filters on the tree it parsed to rewrite links, and
+serializes it once.  The filters are a tree filter (adding
+``loading="lazy"`` to images) and ``normalize_html``.
+
+Usage:
+
+$ render_pipeline.py [page.html ...] [-n ROUNDS]
+
+Without arguments, a synthetic page with a few hundred links is used.
+"""
+
+from __future__ import print_function, unicode_literals
+import argparse
+import io
+import os
+import shutil
+import tempfile
+import timeit
+
+import html5lib
+import lxml.html
+
+from nikola import filters, nikola
+
+
+def synthetic_page(entries=200):
+    """Return a page that looks like a long index page."""
+    body = ''.join(
+        '<article><h2><a href="/posts/post-{0}/">Post {0}</a></h2>'
+        '<p>Some <em>text</em> with a <a href="link://root/">link</a> '
+        'and <img src="/images/{0}.png" srcset="/images/{0}.png 1x, /images/{0}@2x.png 2x"></p>'
+        '</article>\n'.format(i) for i in range(entries))
+    return ('<!DOCTYPE html><html><head><title>Benchmark</title>'
+            '<link rel="stylesheet" href="/assets/css/all.css"></head><body>'
+            '<nav><ul><li><a href="/">Home</a></li><li><a href="/archive.html">Archive</a></li></ul></nav>'
+            '{0}</body></html>'.format(body))
+
+
+@filters.apply_to_html_tree
+def lazy_images(doc):
+    """Make images load lazily."""
+    for img in doc.iter('img'):
+        img.set('loading', 'lazy')
+
+
+FILTERS = [lazy_images, filters.normalize_html]
+
+
+def write(output_name, data):
+    """Write a page."""
+    with open(output_name, 'wb+') as outf:
+        outf.write(data)
+
+
+def parse_twice(data):
+    """Parse a page the way render_template used to."""
+    doc = html5lib.html5parser.parse(data, treebuilder='lxml',
+                                     namespaceHTMLElements=False)
+    parser = lxml.html.HTMLParser(remove_blank_text=True)
+    return lxml.html.document_fromstring(lxml.html.tostring(doc), parser)
+
+
+def before(site, data, src, output_name):
+    """Run the old pipeline, filtering the written file."""
+    doc = parse_twice(data)
+    site.rewrite_links(doc, src, site.default_lang)
+    write(output_name, filters.serialize_html(doc))
+    with open(output_name, 'rb') as inf:
+        doc = parse_twice(inf.read())
+    lazy_images.tree_filter(doc)
+    text = filters._normalize_html(filters.serialize_html(doc).decode('utf-8'))
+    write(output_name, text.encode('utf-8'))
+
+
+def after(site, data, src, output_name):
+    """Run the pipeline filtering the parsed page."""
+    doc = filters.parse_html(data)
+    site.rewrite_links(doc, src, site.default_lang)
+    write(output_name, filters.filter_html(doc, FILTERS))
+
+
+def main():
+    """Run the benchmark."""
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument('pages', nargs='*', help='HTML files to use as rendered pages')
+    argparser.add_argument('-n', '--rounds', type=int, default=20)
+    args = argparser.parse_args()
+
+    site = nikola.Nikola()
+    site.init_plugins()
+    site.scan_posts()
+
+    if args.pages:
+        pages = []
+        for path in args.pages:
+            with io.open(path, 'r', encoding='utf-8') as inf:
+                pages.append(inf.read())
+    else:
+        pages = [synthetic_page()]
+
+    # Measure filtering, not the filter cache
+    filters.FILTER_CACHE_FOLDER = None
+    src = '/posts/benchmark/index.html'
+    tmpdir = tempfile.mkdtemp()
+    output_name = os.path.join(tmpdir, 'index.html')
+    try:
+        for func in (before, after):
+            elapsed = timeit.timeit(lambda: [func(site, page, src, output_name) for page in pages], number=args.rounds)
+            print('{0:>8}: {1:8.2f} ms/page'.format(func.__name__, elapsed * 1000 / (args.rounds * len(pages))))
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
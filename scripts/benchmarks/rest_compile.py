@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Measure the per-post overhead of compiling short reST posts.
+
+The "fresh" rounds set up docutils for every post (reader, option parser,
+settings and transforms), which is what ``rst2html`` used to do; the
+"shared" rounds use the shared ``RestContext``, so only per-document
+state is set up.  The settings are the ones ``CompileRest`` uses.
+
+Usage:
+
+$ rest_compile.py [-n POSTS]
+"""
+
+from __future__ import print_function, unicode_literals
+import argparse
+import time
+
+import logbook
+
+from nikola.plugins.compile.rest import rst2html, NikolaReader
+
+POST = """Post {0}
+=========
+
+A short post with *some* **markup**, a `link <https://getnikola.com/>`_
+and a footnote [#]_.
+
+* One
+* Two
+
+.. [#] The footnote.
+"""
+
+SETTINGS = {
+    'initial_header_level': 1,
+    'record_dependencies': True,
+    'stylesheet_path': None,
+    'link_stylesheet': True,
+    'syntax_highlight': 'short',
+    'math_output': 'mathjax',
+}
+
+
+def compile_fresh(data, logger):
+    """Compile a post setting up docutils from scratch."""
+    reader = NikolaReader(transforms=[])
+    reader.l_settings = {'logger': logger, 'source': 'post.rst', 'add_ln': 0}
+    return rst2html(data, settings_overrides=SETTINGS, logger=logger, source_path='post.rst', reader=reader)
+
+
+def compile_shared(data, logger):
+    """Compile a post with the shared docutils setup."""
+    return rst2html(data, settings_overrides=SETTINGS, logger=logger, source_path='post.rst', transforms=[])
+
+
+def main():
+    """Run the benchmark."""
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument('-n', '--posts', type=int, default=1000)
+    args = argparser.parse_args()
+    logger = logbook.Logger('rest_compile')
+    posts = [POST.format(i) for i in range(args.posts)]
+
+    results = {}
+    for label, function in (('fresh', compile_fresh), ('shared', compile_shared)):
+        function(posts[0], logger)  # Import and set up everything once
+        start = time.time()
+        for data in posts:
+            function(data, logger)
+        results[label] = (time.time() - start) * 1000 / len(posts)
+        print('{0:>8}: {1:6.2f} ms per post'.format(label, results[label]))
+    print('overhead: {0:6.2f} ms per post'.format(results['fresh'] - results['shared']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Measure reading the metadata of many multilingual posts.
+
+Synthetic one-file posts (with a metadata header and a long body) are
+created in several languages; some have a ``.meta`` file instead.  The
+"before" reader reads every file completely and checks every candidate
+file separately, like scanning did before; the "after" reader is the one
+``Post`` uses, which stops at the end of the metadata header, and lists
+the post directory once for all posts, like scanning does.
+
+Usage:
+
+$ scan_metadata.py [-p POSTS] [-k BODY_KB] [-l LANG ...]
+"""
+
+from __future__ import print_function, unicode_literals
+import argparse
+import io
+import os
+import shutil
+import tempfile
+import time
+
+from nikola import post as post_module
+from nikola.utils import get_translation_candidate
+
+HEADER = """.. title: Post {0} ({1})
+.. slug: post-{0}
+.. date: 2016-01-01 12:00:00 UTC
+.. tags: benchmark, tag-{2}
+.. description: Synthetic post number {0}
+
+"""
+
+
+class FakePost(object):
+    """The attributes of a post that metadata reading uses."""
+
+    def __init__(self, source_path, config):
+        """Initialize the post."""
+        self.source_path = source_path
+        self.metadata_path = os.path.splitext(source_path)[0] + '.meta'
+        self.config = config
+        self.is_two_file = True
+
+
+def make_posts(path, count, body_kb, langs, config):
+    """Create the posts and return their source paths."""
+    paragraph = 'Lorem ipsum dolor sit amet, consectetur adipiscing elit. ' * 8 + '\n\n'
+    body = paragraph * max(1, body_kb * 1024 // len(paragraph))
+    sources = []
+    for i in range(count):
+        source = os.path.join(path, 'post-{0}.rst'.format(i))
+        sources.append(source)
+        # Every other post is translated to every language
+        post_langs = langs if i % 2 == 0 else langs[:1]
+        for lang in post_langs:
+            translation = get_translation_candidate(config, source, lang)
+            with io.open(translation, 'w', encoding='utf-8') as outf:
+                if i % 5 == 0:  # A two-file post
+                    meta = get_translation_candidate(config, os.path.splitext(source)[0] + '.meta', lang)
+                    with io.open(meta, 'w', encoding='utf-8') as metaf:
+                        metaf.write(HEADER.format(i, lang, i % 10))
+                else:
+                    outf.write(HEADER.format(i, lang, i % 10))
+                outf.write(body)
+    return sources
+
+
+def read_before(source, config, langs, dir_listings):
+    """Read the metadata of a post like scanning used to."""
+    def read_file(path):
+        try:
+            with io.open(path, 'r', encoding='utf-8-sig') as inf:
+                return post_module._get_metadata_from_file([x.strip() for x in inf.readlines()])
+        except IOError:
+            return {}
+
+    meta = {}
+    for lang in langs:
+        path = get_translation_candidate(config, source, lang)
+        meta_path = get_translation_candidate(config, os.path.splitext(source)[0] + '.meta', lang)
+        os.path.isfile(path)
+        if os.path.isfile(meta_path):
+            meta[lang] = read_file(meta_path)
+        else:
+            meta[lang] = read_file(path)
+    return meta
+
+
+def read_after(source, config, langs, dir_listings):
+    """Read the metadata of a post like ``Post`` does while scanning."""
+    post = FakePost(source, config)
+    meta = {}
+    for lang in langs:
+        post_module._file_exists(get_translation_candidate(config, source, lang), dir_listings)
+        meta[lang] = post_module.get_meta(post, lang=None if lang == langs[0] else lang,
+                                          dir_listings=dir_listings)[0]
+    return meta
+
+
+def main():
+    """Run the benchmark."""
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument('-p', '--posts', type=int, default=10000)
+    argparser.add_argument('-k', '--body-kb', type=int, default=32)
+    argparser.add_argument('-l', '--lang', action='append', dest='langs')
+    args = argparser.parse_args()
+    langs = args.langs or ['en', 'es', 'de']
+    config = {
+        'TRANSLATIONS_PATTERN': '{path}.{lang}.{ext}',
+        'DEFAULT_LANG': langs[0],
+        'TRANSLATIONS': dict((lang, lang) for lang in langs),
+    }
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        sources = make_posts(tmpdir, args.posts, args.body_kb, langs, config)
+        print('{0} posts, {1} languages, {2} KB bodies'.format(len(sources), len(langs), args.body_kb))
+        for label, reader in (('before', read_before), ('after', read_after)):
+            dir_listings = {}
+            start = time.time()
+            for source in sources:
+                reader(source, config, langs, dir_listings)
+            print('{0}: {1:8.2f} s'.format(label, time.time() - start))
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
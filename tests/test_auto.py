@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, absolute_import
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from blinker import signal
+from doit.doit_cmd import DoitMain
+from doit.task import Task
+import mock
+
+from nikola.__main__ import NikolaTaskLoader
+from nikola.plugins.command.auto import CommandAuto, LoadedTaskLoader, affected_tasks
+from nikola.utils import get_logger, STDERR_HANDLER
+
+
+class AffectedTasksTest(unittest.TestCase):
+    """Tasks depending on changed files, directly or through other tasks."""
+
+    def setUp(self):
+        self.tasks = [
+            Task('render_posts:a', None, file_dep=['posts/a.rst'], targets=['cache/posts/a.html']),
+            Task('render_pages:a', None, file_dep=['cache/posts/a.html', 'templates/post.tmpl'],
+                 targets=['output/posts/a/index.html']),
+            Task('render_posts:b', None, file_dep=['posts/b.rst'], targets=['cache/posts/b.html']),
+            Task('sitemap', None, file_dep=['output/posts/a/index.html', 'output/posts/b/index.html'],
+                 targets=['output/sitemap.xml']),
+            Task('render_site', None, task_dep=['render_posts:a']),
+        ]
+
+    def test_dependencies(self):
+        self.assertEqual(affected_tasks(self.tasks, ['posts/a.rst']),
+                         ['render_posts:a', 'render_pages:a', 'sitemap'])
+        self.assertEqual(affected_tasks(self.tasks, ['posts/b.rst']), ['render_posts:b'])
+        self.assertEqual(affected_tasks(self.tasks, ['./templates/post.tmpl']), ['render_pages:a', 'sitemap'])
+
+    def test_unknown_path(self):
+        self.assertEqual(affected_tasks(self.tasks, ['files/robots.txt']), [])
+
+
+class LoadedTaskLoaderTest(unittest.TestCase):
+    """Tasks generated once are run by several doit runs."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.runs = []
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def task(self, name):
+        def action():
+            self.runs.append(name)
+        return Task(name, [(action,)], uptodate=[False])
+
+    def test_runs_tasks_again(self):
+        tasks = [self.task('first'), self.task('second')]
+        doit_config = {'default_tasks': ['first', 'second'], 'verbosity': 0, 'reporter': 'zero',
+                       'dep_file': os.path.join(self.tmpdir, '.doit.db')}
+        loader = LoadedTaskLoader(tasks, doit_config)
+        self.assertEqual(loader.load_tasks(None, {}, []), (tasks, doit_config))
+        self.assertEqual(DoitMain(loader).run(['run', 'second', 'first']), 0)
+        self.assertEqual(DoitMain(loader).run(['run']), 0)
+        self.assertEqual(self.runs, ['second', 'first', 'first', 'second'])
+
+
+class RebuildInProcessTest(unittest.TestCase):
+    """Rebuilds in the nikola auto process."""
+
+    def setUp(self):
+        self.site = mock.Mock(_doit_config={})
+        self.site.gen_tasks.side_effect = lambda *args: (task for task in [])
+        self.received = []
+        signal('initialized').connect(self.receiver, sender=self.site)
+
+    def tearDown(self):
+        signal('initialized').disconnect(self.receiver, sender=self.site)
+
+    def receiver(self, site):
+        self.received.append(site)
+
+    def test_initialized_once(self):
+        loader = NikolaTaskLoader(self.site, quiet=True)
+        for _ in range(3):
+            loader.load_tasks(None, {}, [])
+        self.assertEqual(self.received, [self.site])
+
+    def test_doit_exit(self):
+        auto = CommandAuto()
+        auto.site = self.site
+        auto.logger = get_logger('test_auto', STDERR_HANDLER)
+        self.site.doit.task_loader.load_tasks.return_value = ([], {'default_tasks': []})
+        with mock.patch.object(DoitMain, 'run', side_effect=SystemExit(3)):
+            self.assertFalse(auto.build_in_process())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, absolute_import
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+try:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from SocketServer import ThreadingMixIn
+except ImportError:
+    from http.server import HTTPServer, BaseHTTPRequestHandler  # NOQA
+    from socketserver import ThreadingMixIn  # NOQA
+
+from nikola.plugins.command.check import RemoteLinkChecker
+
+
+class StandInServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Answer like a few remote sites would, counting concurrent requests."""
+
+    def do_HEAD(self):
+        server = self.server
+        with server.lock:
+            server.requests.append(self.path)
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        time.sleep(0.05)
+        if self.path == '/moved':
+            self.send_response(301)
+            self.send_header('Location', '/ok')
+        elif self.path.startswith('/ok'):
+            self.send_response(200)
+        else:
+            self.send_response(404)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+        with server.lock:
+            server.active -= 1
+
+    do_GET = do_HEAD
+
+    def log_message(self, *args):
+        pass
+
+
+class RemoteLinkCheckerTest(unittest.TestCase):
+    def setUp(self):
+        self.server = StandInServer(('127.0.0.1', 0), StandInHandler)
+        self.server.lock = threading.Lock()
+        self.server.requests = []
+        self.server.active = self.server.max_active = 0
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.base = 'http://127.0.0.1:{0}'.format(self.server.server_address[1])
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.tmpdir)
+
+    def checker(self, **kw):
+        kw.setdefault('cache_path', os.path.join(self.tmpdir, 'check_links.json'))
+        return RemoteLinkChecker(delay=0, **kw)
+
+    def test_statuses_and_redirects(self):
+        results = self.checker(threads=4).check(
+            [self.base + '/ok', self.base + '/missing', self.base + '/moved'])
+        self.assertEqual(results[self.base + '/ok']['status'], 200)
+        self.assertEqual(results[self.base + '/missing']['status'], 404)
+        self.assertEqual(results[self.base + '/moved']['redirect'], 301)
+        self.assertEqual(results[self.base + '/moved']['status'], 200)
+        self.assertEqual(results[self.base + '/moved']['url'], self.base + '/ok')
+
+    def test_per_host_limit(self):
+        targets = [self.base + '/ok/{0}'.format(i) for i in range(12)]
+        results = self.checker(threads=8, per_host=2).check(targets)
+        self.assertTrue(all(results[t]['status'] == 200 for t in targets))
+        self.assertTrue(self.server.max_active <= 2)
+
+    def test_working_links_are_cached(self):
+        targets = [self.base + '/ok', self.base + '/missing']
+        self.checker(ttl=3600).check(targets)
+        count = len(self.server.requests)
+        results = self.checker(ttl=3600).check(targets)
+        self.assertEqual(results[self.base + '/ok']['status'], 200)
+        # Only the broken link is checked again
+        self.assertEqual(self.server.requests[count:], ['/missing', '/missing'])
+
+    def test_connection_errors(self):
+        result = self.checker().check(['http://127.0.0.1:1/'])['http://127.0.0.1:1/']
+        self.assertTrue(result['error'])
+
+
+if __name__ == '__main__':
+    unittest.main()
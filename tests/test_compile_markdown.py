@@ -103,6 +103,13 @@ Cool, eh?
         actual_output = self.compile(input_str)
         self.assertEquals(actual_output.strip(), expected_output.strip())
 
+    def test_compile_html_reuses_converter(self):
+        extensions = list(self.compiler.extensions)
+        self.compile('[Nikola]: https://getnikola.com/\n\n[Nikola] rocks.')
+        actual_output = self.compile('[Nikola] rocks.')
+        self.assertEquals(actual_output.strip(), '<p>[Nikola] rocks.</p>')
+        self.assertEquals(self.compiler.extensions, extensions)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, absolute_import
+
+import io
+import json
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import unittest
+
+from nikola.plugins.compile.pandoc import CompilePandoc
+
+# A stand-in for pandoc, which "converts" documents by uppercasing them
+# and logs how it was run.  With the batch Lua filter, it converts the
+# documents listed by the filter's environment, like the filter does.
+STUB_PANDOC = '''#!{python}
+import io, json, os, sys
+args = sys.argv[1:]
+with io.open(os.environ['STUB_PANDOC_LOG'], 'a', encoding='utf-8') as log:
+    log.write(json.dumps(args) + '\\n')
+if args == ['--version']:
+    print('pandoc 0.stub')
+    sys.exit(0)
+output = args[args.index('-o') + 1]
+inputs = [a for i, a in enumerate(args) if not a.startswith('-') and args[i - 1] != '-o']
+def convert(name):
+    with io.open(name, encoding='utf-8') as f:
+        return '<p>' + f.read().strip().upper() + '</p>'
+if '--lua-filter=batch.lua' in args:
+    with io.open(os.environ['NIKOLA_PANDOC_BATCH'], encoding='utf-8') as f:
+        names = f.read().split()
+    text = ('\\n' + os.environ['NIKOLA_PANDOC_MARKER'] + '\\n').join(convert(n) for n in names)
+else:
+    text = convert(inputs[0])
+with io.open(output, 'w', encoding='utf-8') as f:
+    f.write(text + '\\n')
+'''
+
+
+class FakePost(object):
+    def __init__(self, compiler, source):
+        self.compiler = compiler
+        self.source = source
+        self.translated_to = set(['en'])
+
+    def translated_source_path(self, lang):
+        return self.source
+
+    def translated_base_path(self, lang):
+        return self.source + '.html'
+
+
+class FakeSite(object):
+    def __init__(self, cache_folder):
+        self.config = {
+            'CACHE_FOLDER': cache_folder,
+            'PANDOC_OPTIONS': ['--mathjax'],
+            'PANDOC_BATCH_SIZE': 2,
+            'PANDOC_PROCESSES': 2,
+        }
+        self.timeline = []
+
+
+@unittest.skipIf(os.name != 'posix', 'The pandoc stand-in is a script')
+class CompilePandocTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        bin_dir = os.path.join(self.tmpdir, 'bin')
+        os.makedirs(bin_dir)
+        stub = os.path.join(bin_dir, 'pandoc')
+        with io.open(stub, 'w', encoding='utf-8') as outf:
+            outf.write(STUB_PANDOC.format(python=sys.executable))
+        os.chmod(stub, os.stat(stub).st_mode | stat.S_IEXEC)
+        self.log = os.path.join(self.tmpdir, 'log')
+        self.environ = dict(os.environ)
+        os.environ['PATH'] = bin_dir + os.pathsep + os.environ.get('PATH', '')
+        os.environ['STUB_PANDOC_LOG'] = self.log
+        self.site = FakeSite(os.path.join(self.tmpdir, 'cache'))
+
+    def tearDown(self):
+        os.environ.clear()
+        os.environ.update(self.environ)
+        shutil.rmtree(self.tmpdir)
+
+    def runs(self):
+        if not os.path.exists(self.log):
+            return []
+        with io.open(self.log, encoding='utf-8') as inf:
+            runs = [json.loads(l) for l in inf]
+        os.remove(self.log)
+        return [r for r in runs if r != ['--version']]
+
+    def compiler(self):
+        compiler = CompilePandoc()
+        compiler.set_site(self.site)
+        return compiler
+
+    def write_post(self, compiler, name, text):
+        source = os.path.join(self.tmpdir, name)
+        with io.open(source, 'w', encoding='utf-8') as outf:
+            outf.write(text)
+        return FakePost(compiler, source)
+
+    def compile(self, compiler, post):
+        compiler.compile_html(post.source, post.translated_base_path('en'))
+        with io.open(post.translated_base_path('en'), encoding='utf-8') as inf:
+            return inf.read()
+
+    def test_batches_and_cache(self):
+        compiler = self.compiler()
+        self.site.timeline = [self.write_post(compiler, 'post{0}.md'.format(i), 'Post {0}'.format(i)) for i in range(5)]
+        compiler.prefetch_posts([(post, 'en') for post in self.site.timeline])
+        runs = self.runs()
+        self.assertEqual(len(runs), 3)
+        self.assertEqual(len([r for r in runs if '--lua-filter=batch.lua' in r]), 2)
+        for i, post in enumerate(self.site.timeline):
+            self.assertEqual(self.compile(compiler, post), '<p>POST {0}</p>\n'.format(i))
+        self.assertEqual(self.runs(), [])
+
+        # Compiled posts are in the cache, for this pandoc and these options
+        post = self.write_post(compiler, 'new.md', 'New')
+        self.assertEqual(self.compile(compiler, post), '<p>NEW</p>\n')
+        self.assertEqual(len(self.runs()), 1)
+        self.assertEqual(self.compile(self.compiler(), post), '<p>NEW</p>\n')
+        self.assertEqual(self.runs(), [])
+        self.site.config['PANDOC_OPTIONS'] = ['--mathml']
+        self.assertEqual(self.compile(self.compiler(), post), '<p>NEW</p>\n')
+        self.assertEqual(len(self.runs()), 1)
+
+    def test_unsafe_options(self):
+        self.site.config['PANDOC_OPTIONS'] = ['-s', '--toc']
+        compiler = self.compiler()
+        self.site.timeline = [self.write_post(compiler, 'post{0}.md'.format(i), 'Post') for i in range(3)]
+        compiler.prefetch_posts([(post, 'en') for post in self.site.timeline])
+        self.assertEqual(self.runs(), [])
+        self.assertEqual(self.compile(compiler, self.site.timeline[0]), '<p>POST</p>\n')
+        self.assertEqual(len(self.runs()), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, absolute_import
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+from nikola.compile_pipeline import CompilePipeline
+
+
+class Compiler(object):
+    """Write a fragment, a side file and a .dep file, like some compilers do."""
+
+    name = 'fake'
+    # Posts compiled in this process
+    compiled = []
+
+    def compile_html(self, source, dest, is_two_file=True):
+        self.compiled.append(source)
+        with io.open(source, 'r', encoding='utf8') as inf:
+            data = inf.read()
+        with io.open(dest, 'w', encoding='utf8') as outf:
+            outf.write(data.upper())
+        side_path = os.path.join(os.path.dirname(dest), 'images', os.path.basename(dest) + '.svg')
+        os.mkdir(os.path.dirname(side_path))
+        with io.open(side_path, 'w', encoding='utf8') as outf:
+            outf.write('<svg>{0}</svg>'.format(data))
+        with io.open(dest + '.dep', 'w', encoding='utf8') as outf:
+            outf.write('\n'.join([source, side_path]))
+
+
+class Post(object):
+    is_two_file = True
+    compiler = Compiler()
+
+    def __init__(self, source_path, dest):
+        self.source_path = source_path
+        self.dest = dest
+
+    def translated_base_path(self, lang):
+        return self.dest
+
+    def translated_source_path(self, lang):
+        return self.source_path
+
+    def compile(self, lang, compile_html=None):
+        (compile_html or self.compiler.compile_html)(self.source_path, self.dest, self.is_two_file)
+
+
+@unittest.skipIf(os.name != 'posix', 'Posts are compiled in worker processes on POSIX only')
+class CompilePipelineTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.site = mock.Mock()
+        self.site.get_compiler.return_value = Post.compiler
+        self.sources = []
+        for i in range(12):
+            self.sources.append(os.path.join(self.tmpdir, 'post{0}.txt'.format(i)))
+            with io.open(self.sources[-1], 'w', encoding='utf8') as outf:
+                outf.write('post {0}'.format(i))
+        del Compiler.compiled[:]
+        mock.patch('nikola.utils.LocaleBorg').start()
+
+    def tearDown(self):
+        mock.patch.stopall()
+        shutil.rmtree(self.tmpdir)
+
+    def posts(self, kind):
+        posts = []
+        for source in self.sources:
+            name = os.path.splitext(os.path.basename(source))[0]
+            os.makedirs(os.path.join(self.tmpdir, kind, name))
+            posts.append(Post(source, os.path.join(self.tmpdir, kind, name, 'post.html')))
+        return posts
+
+    def pipeline(self, posts, processes):
+        pipeline = CompilePipeline(self.site, processes)
+        for post in posts:
+            pipeline.add(post, 'en', [post.source_path])
+        return pipeline
+
+    def read(self, kind):
+        files = {}
+        folder = os.path.join(self.tmpdir, kind)
+        for root, _, names in os.walk(folder):
+            for name in names:
+                with io.open(os.path.join(root, name), 'r', encoding='utf8') as inf:
+                    files[os.path.relpath(os.path.join(root, name), folder)] = inf.read().replace(folder, '')
+        return files
+
+    def test_same_as_serial(self):
+        atexit_register = mock.patch('atexit.register').start()
+        serial = self.pipeline(self.posts('serial'), 1)
+        for post in serial.jobs.values():
+            serial.compile(post[0], 'en')
+        self.assertEqual(len(Compiler.compiled), len(self.sources))
+        del Compiler.compiled[:]
+
+        pipeline = self.pipeline(self.posts('pool'), 2)
+        for post in [job[0] for job in pipeline.jobs.values()]:
+            pipeline.compile(post, 'en')
+        # Compiled by the workers, which stop when everything is compiled
+        self.assertEqual(Compiler.compiled, [])
+        self.assertIsNone(pipeline._pool)
+        self.assertEqual(atexit_register.call_args_list, [mock.call(pipeline.close)])
+
+        files = self.read('pool')
+        self.assertEqual(len(files), 3 * len(self.sources))
+        self.assertEqual(files, self.read('serial'))
+
+    def test_prefetch_posts(self):
+        posts = self.posts('serial')
+        pipeline = self.pipeline(posts, 1)
+        with mock.patch.object(Compiler, 'prefetch_posts', create=True) as prefetch_posts:
+            pipeline.compile(posts[0], 'en')
+            pipeline.compile(posts[1], 'en')
+        # Once, with every job, when the first task runs
+        prefetch_posts.assert_called_once_with([(post, 'en') for post in posts])
+
+    def test_closed_when_a_task_fails(self):
+        mock.patch('atexit.register').start()
+        posts = self.posts('pool')
+        pipeline = self.pipeline(posts[:1], 2)
+        with mock.patch.object(Post, 'compile', side_effect=IOError):
+            self.assertRaises(IOError, pipeline.compile, posts[0], 'en')
+        self.assertIsNone(pipeline._pool)
+
+    def test_close(self):
+        mock.patch('atexit.register').start()
+        posts = self.posts('pool')
+        pipeline = self.pipeline(posts, 2)
+        pipeline.compile(posts[0], 'en')
+        self.assertIsNotNone(pipeline._pool)
+        pipeline.close()
+        self.assertIsNone(pipeline._pool)
+        self.assertEqual(pipeline._pending, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
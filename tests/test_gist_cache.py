@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, absolute_import
+
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+try:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from SocketServer import ThreadingMixIn
+except ImportError:
+    from http.server import HTTPServer, BaseHTTPRequestHandler  # NOQA
+    from socketserver import ThreadingMixIn  # NOQA
+
+from nikola.gist_cache import GistCache, GistFetchException, find_gists
+
+
+class StandInServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Serve raw gists like GitHub, with ETags, counting concurrent requests."""
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append((self.path, self.headers.get('If-None-Match')))
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        time.sleep(0.05)
+        text = server.gists.get(self.path)
+        etag = '"{0}"'.format(hashlib.md5((text or '').encode('utf-8')).hexdigest())
+        if text is None:
+            self.send_response(404)
+            body = b''
+        elif self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            body = b''
+        else:
+            self.send_response(200)
+            body = text.encode('utf-8')
+            self.send_header('Content-Type', 'text/plain; charset=utf-8')
+            self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        with server.lock:
+            server.active -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+class GistCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.server = StandInServer(('127.0.0.1', 0), StandInHandler)
+        self.server.lock = threading.Lock()
+        self.server.requests = []
+        self.server.active = self.server.max_active = 0
+        self.server.gists = {
+            '/raw/1': 'import this',
+            '/raw/2/cow.txt': 'Moo',
+            '/raw/3': 'print("three")',
+            '/raw/4': 'print("four")',
+        }
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.raw_url = 'http://127.0.0.1:{0}/raw/'.format(self.server.server_address[1])
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.tmpdir)
+
+    def cache(self, **kw):
+        return GistCache(self.tmpdir, raw_url=self.raw_url, **kw)
+
+    def test_cached_between_builds(self):
+        self.assertEqual(self.cache().get('1'), 'import this')
+        self.assertEqual(self.cache().get('2', 'cow.txt'), 'Moo')
+        self.assertEqual(self.cache().get('1'), 'import this')
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertRaises(GistFetchException, self.cache().get, '0')
+
+    def test_revalidated_with_etag(self):
+        self.cache().get('1')
+        self.assertEqual(self.cache(ttl=0).get('1'), 'import this')
+        self.assertEqual(self.server.requests[-1][1], '"{0}"'.format(hashlib.md5(b'import this').hexdigest()))
+        self.server.gists['/raw/1'] = 'import that'
+        self.assertEqual(self.cache(ttl=0).get('1'), 'import that')
+
+    def test_cached_copy_on_errors(self):
+        self.cache().get('1')
+        del self.server.gists['/raw/1']
+        self.assertEqual(self.cache(ttl=0).get('1'), 'import this')
+        self.assertRaises(GistFetchException, self.cache(ttl=0).get, '3', 'missing.py')
+
+    def test_prefetch_missing_texts(self):
+        self.cache().get('1')
+        self.assertEqual(self.cache().prefetch([('1', None)]), [])
+        for name in os.listdir(self.tmpdir):
+            if name.endswith('.txt'):
+                os.remove(os.path.join(self.tmpdir, name))
+        self.assertEqual(self.cache().prefetch([('1', None)]), [self.raw_url + '1'])
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_offline(self):
+        self.cache().get('1')
+        cache = self.cache(ttl=0, offline=True)
+        self.assertEqual(cache.get('1'), 'import this')
+        self.assertRaises(GistFetchException, cache.get, '3')
+        self.assertEqual(cache.prefetch([('3', None)]), [])
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_prefetch_concurrently(self):
+        text = '[:gist: 1]\n\n[:gist: 2 cow.txt]\n\n.. gist:: 3\n\n[:gist: 4]\n'
+        gists = find_gists(text, 'markdown')
+        self.assertEqual(gists, set([('1', None), ('2', 'cow.txt'), ('3', None), ('4', None)]))
+        self.assertEqual(len(self.cache(threads=4).prefetch(gists)), 4)
+        self.assertGreater(self.server.max_active, 1)
+        self.assertEqual(self.cache(threads=4).prefetch(gists), [])
+        self.assertEqual(self.cache().get('2', 'cow.txt'), 'Moo')
+        self.assertEqual(len(self.server.requests), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, absolute_import
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+from nikola import image_processing, utils
+from nikola.image_processing import Image, ImageIndex, ImagePipeline, ImageProcessor
+
+
+class Processor(ImageProcessor):
+    logger = utils.get_logger('test_image_processing', utils.STDERR_HANDLER)
+
+
+@unittest.skipIf(Image is None, 'PIL is not installed')
+class ImagePipelineTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.sources = []
+        for i, (ext, size) in enumerate((('.jpg', (640, 480)), ('.png', (300, 900)),
+                                         ('.jpg', (2000, 500)), ('.png', (50, 40)))):
+            src = os.path.join(self.tmpdir, 'image{0}{1}'.format(i, ext))
+            im = Image.new('RGB', size)
+            for x in range(0, size[0], 7):
+                for y in range(0, size[1], 5):
+                    im.putpixel((x, y), ((x * 3) % 256, (y * 5) % 256, (x + y + i) % 256))
+            im.save(src)
+            self.sources.append(src)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def targets(self, src, kind):
+        base = os.path.join(self.tmpdir, kind + '-' + os.path.basename(src))
+        return [(base + '.thumbnail' + os.path.splitext(src)[1], 100), (base, 400)]
+
+    def read(self, path):
+        with open(path, 'rb') as inf:
+            return inf.read()
+
+    def test_same_as_serial(self):
+        processor = Processor()
+        for src in self.sources:
+            for dst, max_size in self.targets(src, 'serial'):
+                processor.resize_image(src, dst, max_size)
+
+        pipeline = ImagePipeline(processor, 3)
+        for src in self.sources:
+            pipeline.add(src, self.targets(src, 'pool'))
+        for src in self.sources:
+            thumbnail, image = [dst for dst, _ in self.targets(src, 'pool')]
+            # Like galleries, which write each size in its own task
+            pipeline.resize(src, [thumbnail])
+            pipeline.resize(src, [image])
+        # The workers are kept for the next galleries, until close()
+        self.assertIsNotNone(pipeline._pool)
+        self.assertEqual(pipeline._results, {})
+        pipeline.close()
+        self.assertIsNone(pipeline._pool)
+
+        for src in self.sources:
+            for (serial, _), (pooled, _) in zip(self.targets(src, 'serial'), self.targets(src, 'pool')):
+                self.assertEqual(self.read(serial), self.read(pooled))
+
+    def test_close_forgets_unused_results(self):
+        pipeline = ImagePipeline(Processor(), 2)
+        for src in self.sources:
+            pipeline.add(src, self.targets(src, 'pool'))
+        src = self.sources[0]
+        pipeline.resize(src, [self.targets(src, 'pool')[0][0]])
+        pipeline.close()
+        self.assertIsNone(pipeline._pool)
+        self.assertEqual(pipeline._results, {})
+        self.assertEqual(pipeline._pending, {})
+
+
+@unittest.skipIf(Image is None, 'PIL is not installed')
+class ImageIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.index_path = os.path.join(self.tmpdir, 'cache', 'image_index.json')
+        self.images = []
+        for i in range(2):
+            self.images.append(os.path.join(self.tmpdir, 'image{0}.png'.format(i)))
+            Image.new('RGB', (10 + i, 20)).save(self.images[-1])
+        # Indexes are saved when the process exits, which tests do explicitly
+        self.atexit_register = mock.patch('atexit.register').start()
+
+    def tearDown(self):
+        mock.patch.stopall()
+        shutil.rmtree(self.tmpdir)
+
+    def test_cached_between_runs(self):
+        index = ImageIndex(self.index_path)
+        self.assertEqual(index.get(self.images[0])['width'], 10)
+        index.get(self.images[1])
+        # Saved once, when the process exits
+        self.assertFalse(os.path.exists(self.index_path))
+        self.assertEqual(self.atexit_register.call_args_list, [mock.call(index.save)])
+        index.save()
+        self.assertEqual(os.listdir(os.path.dirname(self.index_path)), ['image_index.json'])
+
+        with mock.patch.object(image_processing, 'read_image_info') as read:
+            self.assertEqual(ImageIndex(self.index_path).get(self.images[1]),
+                             {'date': None, 'orientation': None, 'width': 11, 'height': 20,
+                              'format': 'PNG', 'stamp': index.get(self.images[1])['stamp']})
+            self.assertFalse(read.called)
+
+    def test_entries_of_older_versions_are_read_again(self):
+        index = ImageIndex(self.index_path)
+        entry = index.get(self.images[0])
+        del entry['orientation']
+        index.changed[self.images[0]] = entry
+        index.save()
+        with mock.patch.object(image_processing, 'read_image_info', return_value={'orientation': None}) as read:
+            ImageIndex(self.index_path).get(self.images[0])
+            self.assertTrue(read.called)
+
+    @unittest.skipIf(not hasattr(Image, 'Exif'), 'Pillow cannot write EXIF data')
+    def test_size_as_shown(self):
+        for orientation, size in ((1, (10, 20)), (3, (10, 20)), (5, (20, 10)), (6, (20, 10)), (8, (20, 10))):
+            path = os.path.join(self.tmpdir, 'photo{0}.jpg'.format(orientation))
+            exif = Image.Exif()
+            exif[0x0112] = orientation
+            Image.new('RGB', (10, 20)).save(path, exif=exif)
+            info = ImageIndex(self.index_path).get(path)
+            self.assertEqual((info['orientation'], info['width'], info['height']), (orientation,) + size)
+
+    def test_changed_image(self):
+        index = ImageIndex(self.index_path)
+        index.get(self.images[0])
+        index.save()
+        Image.new('RGB', (30, 40)).save(self.images[0])
+        os.utime(self.images[0], (0, 0))
+        self.assertEqual(ImageIndex(self.index_path).get(self.images[0])['width'], 30)
+
+    def test_save_keeps_entries_of_other_processes(self):
+        first, second = ImageIndex(self.index_path), ImageIndex(self.index_path)
+        first.get(self.images[0])
+        second.get(self.images[1])
+        first.save()
+        second.save()
+        with open(self.index_path) as inf:
+            self.assertEqual(sorted(json.load(inf)), sorted(self.images))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, absolute_import
+
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from nikola.plugins.compile.ipynb import CompileIPynb, read_notebook_metadata
+from nikola.utils import unicode_str
+
+
+class FakePost(object):
+    def __init__(self, source_path):
+        self.source_path = source_path
+
+
+class NotebookMetadataTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.metadata = {'nikola': {'title': 'Plots "and" \\ more', 'tags': 'a, b'},
+                         'kernelspec': {'name': 'python3', 'display_name': 'Python 3'}}
+        output = {'output_type': 'display_data', 'metadata': {},
+                  'data': {'image/png': 'iVBORw0KGgo' * 5000, 'text/plain': ['<Figure {1} [2]>\\"\n']}}
+        self.notebook = {
+            'cells': [{'cell_type': 'code', 'execution_count': 1, 'metadata': {'nikola': 'not this'},
+                       'source': ['plot("}]")\n'], 'outputs': [output] * 3}] * 4,
+            'metadata': self.metadata,
+            'nbformat': 4,
+            'nbformat_minor': 0,
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def read(self, text, chunk_size=7):
+        return read_notebook_metadata(io.BytesIO(unicode_str(text).encode('utf-8')), chunk_size)
+
+    def test_metadata_after_cells(self):
+        text = json.dumps(self.notebook, sort_keys=True, indent=1)
+        self.assertEqual(self.read(text), self.metadata)
+        self.assertEqual(self.read(text, 65536), self.metadata)
+        self.assertEqual(self.read(json.dumps(self.notebook, sort_keys=True, ensure_ascii=False)), self.metadata)
+
+    def test_no_metadata(self):
+        del self.notebook['metadata']
+        self.assertEqual(self.read(json.dumps(self.notebook, sort_keys=True)), {})
+        self.assertEqual(self.read(' { } '), {})
+        self.assertRaises(ValueError, self.read, '{"cells": [')
+
+    def test_read_metadata_cached(self):
+        path = os.path.join(self.tmpdir, 'post.ipynb')
+        with io.open(path, 'w', encoding='utf-8') as outf:
+            outf.write(unicode_str(json.dumps(self.notebook, sort_keys=True, indent=1, ensure_ascii=False)))
+        compiler = CompileIPynb()
+        post = FakePost(path)
+        meta = compiler.read_metadata(post)
+        self.assertEqual(meta, self.metadata['nikola'])
+        meta['title'] = 'Changed'
+        self.assertEqual(compiler.read_metadata(post, lang='es'), self.metadata['nikola'])
+        self.assertEqual(len(compiler._metadata_cache), 1)
+        self.notebook['metadata']['nikola']['title'] = 'New title'
+        with io.open(path, 'w', encoding='utf-8') as outf:
+            outf.write(unicode_str(json.dumps(self.notebook, sort_keys=True, ensure_ascii=False)))
+        self.assertEqual(compiler.read_metadata(post)['title'], 'New title')
+
+
+if __name__ == '__main__':
+    unittest.main()
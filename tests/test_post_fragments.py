@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, absolute_import
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+from nikola import post as post_module
+from nikola.nikola import Nikola
+from nikola.post import Post
+
+from .base import cd
+
+POST = '''<!--
+.. title: {slug}
+.. slug: {slug}
+.. date: 2016-01-{day:02d} 00:00:00 UTC
+-->
+{text}
+'''
+
+
+class FragmentCacheTest(unittest.TestCase):
+    """Compiled fragments are read and processed once, until they change."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.tmpdir, 'posts'))
+        for day, slug in enumerate('abc', 1):
+            with io.open(os.path.join(self.tmpdir, 'posts', slug + '.html'), 'w', encoding='utf-8') as outf:
+                outf.write(POST.format(slug=slug, day=day, text='<p>Text of <a href="x.html">{0}</a></p>'.format(slug)))
+        with cd(self.tmpdir):
+            self.site = Nikola(
+                POSTS=(('posts/*.html', 'posts', 'post.tmpl'),),
+                PAGES=(),
+                COMPILERS={'html': ('.html',)},
+                CACHE_FOLDER=os.path.join(self.tmpdir, 'cache'),
+                SCAN_POSTS_CACHE=False)
+            self.site.init_plugins()
+            self.site.scan_posts()
+            self.posts = sorted(self.site.timeline, key=lambda post: post.meta('slug'))
+            for post in self.posts:
+                post.compile('en')
+        post_module._FRAGMENT_CACHE.clear()
+        self.read_fragment = mock.patch.object(Post, '_read_fragment', autospec=True,
+                                               side_effect=Post._read_fragment).start()
+
+    def tearDown(self):
+        mock.patch.stopall()
+        post_module._FRAGMENT_CACHE.clear()
+        shutil.rmtree(self.tmpdir)
+
+    def read(self):
+        reads = [call[0][0].meta('slug') for call in self.read_fragment.call_args_list]
+        self.read_fragment.reset_mock()
+        return reads
+
+    def edit(self, post, text):
+        file_name = post._translated_file_path('en')
+        with io.open(file_name, 'w', encoding='utf-8') as outf:
+            outf.write(text)
+        # Even if the modification time looks the same
+        st = os.stat(file_name)
+        os.utime(file_name, (st.st_atime, st.st_mtime))
+
+    def test_read_once(self):
+        post = self.posts[0]
+        text = post.text('en')
+        # Links are made absolute
+        self.assertIn('<p>Text of <a href="/posts/x.html">a</a></p>', text)
+        self.assertEqual(post.text('en', strip_html=True), 'Text of a')
+        self.assertEqual(post.paragraph_count, 1)
+        self.assertEqual(post.text('en'), text)
+        self.assertEqual(self.read(), ['a'])
+        # Each variant of the text is built once
+        self.assertEqual(len(post._fragment('en')['text']), 2)
+
+    def test_posts_have_their_own_fragments(self):
+        self.assertEqual([post.text('en', strip_html=True) for post in self.posts],
+                         ['Text of a', 'Text of b', 'Text of c'])
+        self.assertEqual(self.read(), ['a', 'b', 'c'])
+
+    def test_edited_fragment(self):
+        post = self.posts[0]
+        post.text('en')
+        self.edit(post, '<p>Edited text</p>')
+        self.assertEqual(post.text('en', strip_html=True), 'Edited text')
+        self.assertEqual(self.read(), ['a', 'a'])
+        self.assertEqual(post.text('en', strip_html=True), 'Edited text')
+        self.assertEqual(self.read(), [])
+
+    def test_least_recently_used_fragments_go_first(self):
+        with mock.patch.object(post_module._FRAGMENT_CACHE, 'size', 2):
+            a, b, c = self.posts
+            a.text('en')
+            b.text('en')
+            a.text('en')
+            c.text('en')
+            self.assertEqual(self.read(), ['a', 'b', 'c'])
+            self.assertEqual(len(post_module._FRAGMENT_CACHE), 2)
+            # b was used less recently than a
+            a.text('en')
+            b.text('en')
+            self.assertEqual(self.read(), ['b'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, absolute_import
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import html5lib
+import lxml.html
+import mock
+
+from nikola import filters
+from nikola.nikola import Nikola
+
+PAGES = {
+    'page': '<!DOCTYPE html><html><head><title>Page</title>'
+            '<link rel="stylesheet" href="/assets/css/all.css"></head>'
+            '<body><nav><a href="/">Home</a></nav>'
+            '<p>Some <em>text</em> and <img src="/a.png" srcset="/a.png 1x, /a@2x.png 2x"></p>'
+            '<pre>  keep\n  spaces</pre><script>if (a < b) {}</script></body></html>',
+    'no_head': '<title>No head</title><p>One<p>Two <a href="/x/">x</a>',
+    'no_tbody': '<html><body><table><tr><td><a href="/t/">t</a></td></tr></table></body></html>',
+    'stray_table_content': '<body><table>stray<tr><td>cell</td></tr><div>misplaced</div></table></body>',
+    'svg': '<body><p>Icon <svg viewBox="0 0 10 10"><path d="M0 0L10 10"/>'
+           '<foreignObject><p>html</p></foreignObject></svg></p>'
+           '<math><mi>x</mi></math></body>',
+    'unclosed': '<div><ul><li>one<li><b>two <i>three</b> four</i></ul><p>end',
+}
+# Pages lxml parses without errors, and leaves to browsers to repair
+REPAIRED_BY_BROWSERS = ('no_tbody', 'stray_table_content')
+
+
+def old_pipeline(data, rewrite_links):
+    """Process a rendered page the way render_template always did."""
+    parser = lxml.html.HTMLParser(remove_blank_text=True)
+    doc = html5lib.html5parser.parse(data, treebuilder='lxml',
+                                     namespaceHTMLElements=False)
+    doc = lxml.html.document_fromstring(lxml.html.tostring(doc), parser)
+    rewrite_links(doc)
+    return b'<!DOCTYPE html>\n' + lxml.html.tostring(doc, encoding='utf8', method='html', pretty_print=True)
+
+
+def rewrite_links(doc):
+    doc.rewrite_links(lambda dst: 'rewritten' + dst, resolve_base_href=False)
+
+
+class RenderTemplateTest(unittest.TestCase):
+    """Rendered pages are parsed once, with the same output."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.site = mock.Mock(spec=Nikola)
+        self.site.GLOBAL_CONTEXT = {'template_hooks': {}}
+        self.site._GLOBAL_CONTEXT_TRANSLATABLE = []
+        self.site.config = {'GLOBAL_CONTEXT_FILLER': [], 'OUTPUT_FOLDER': self.tmpdir}
+        self.site.rewrite_links.side_effect = lambda doc, src, lang: rewrite_links(doc)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def render(self, page, page_filters=None):
+        self.site.template_system.render_template.return_value = page
+        output_name = os.path.join(self.tmpdir, 'index.html')
+        Nikola.render_template(self.site, 'page.tmpl', output_name, {'lang': 'en'}, page_filters)
+        with open(output_name, 'rb') as inf:
+            return inf.read()
+
+    def test_same_output(self):
+        for name, page in PAGES.items():
+            if name in REPAIRED_BY_BROWSERS or name == 'svg':
+                continue
+            self.assertEqual(self.render(page), old_pipeline(page, rewrite_links), name)
+
+    def test_same_page_for_browsers(self):
+        for name in REPAIRED_BY_BROWSERS:
+            page = PAGES[name]
+            self.assertEqual(old_pipeline(self.render(page), lambda doc: None),
+                             old_pipeline(old_pipeline(page, rewrite_links), lambda doc: None), name)
+
+    def test_svg_keeps_its_tags(self):
+        output = self.render(PAGES['svg'])
+        self.assertIn(b'<svg viewbox="0 0 10 10"><path', output)
+        self.assertNotIn(b'ns0:', output)
+
+    def test_parsed_once(self):
+        with mock.patch('html5lib.html5parser.parse', wraps=html5lib.html5parser.parse) as parse:
+            self.render(PAGES['page'])
+            self.assertEqual(parse.call_count, 0)
+            # Broken markup is repaired by html5lib
+            self.render(PAGES['unclosed'])
+            self.assertEqual(parse.call_count, 1)
+
+    def test_same_output_as_filtering_the_file(self):
+        @filters.apply_to_text_file
+        def upper(data):
+            return data.upper()
+
+        def add_class(doc):
+            for p in doc.xpath('//p'):
+                p.set('class', 'filtered')
+
+        # Tree filters at the start work on the page parsed to rewrite links
+        def rewrite_and_filter(doc):
+            rewrite_links(doc)
+            add_class(doc)
+
+        tree_filter = filters.apply_to_html_tree(add_class)
+        for name, page in PAGES.items():
+            path = os.path.join(self.tmpdir, 'old.html')
+            doc = filters.parse_html(page)
+            rewrite_and_filter(doc)
+            with io.open(path, 'wb') as outf:
+                outf.write(filters.serialize_html(doc))
+            for action in (upper, tree_filter, filters.normalize_html):
+                action(path)
+            with io.open(path, 'rb') as inf:
+                self.assertEqual(self.render(page, [tree_filter, upper, tree_filter, filters.normalize_html]),
+                                 inf.read(), name)
+
+    def test_tree_serializer(self):
+        # normalize_html serializes the parsed page itself
+        for name, page in PAGES.items():
+            path = os.path.join(self.tmpdir, 'old.html')
+            doc = filters.parse_html(page)
+            rewrite_links(doc)
+            with io.open(path, 'wb') as outf:
+                outf.write(filters.serialize_html(doc))
+            filters.normalize_html(path)
+            with mock.patch.object(filters.normalize_html, 'text_filter') as normalize:
+                output = self.render(page, [filters.normalize_html])
+            self.assertFalse(normalize.called)
+            with io.open(path, 'rb') as inf:
+                self.assertEqual(output, inf.read(), name)
+
+
+if __name__ == '__main__':
+    unittest.main()
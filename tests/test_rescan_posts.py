@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, absolute_import
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from blinker import signal
+
+from nikola.nikola import Nikola
+
+from .base import cd
+
+POST = '''<!--
+.. title: {title}
+.. slug: {slug}
+.. date: 2016-01-{day:02d} 00:00:00 UTC
+.. tags: {tags}
+-->
+<p>Text</p>
+'''
+
+
+class RescanPostsTest(unittest.TestCase):
+    """Scan again only the posts using changed files."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.tmpdir, 'posts'))
+        self.write('posts/a.html', 'A', 1, 'python')
+        self.write('posts/a.es.html', 'A es', 1, 'python')
+        self.write('posts/b.html', 'B', 2, 'nikola')
+        with cd(self.tmpdir):
+            self.site = Nikola(
+                POSTS=(('posts/*.html', 'posts', 'post.tmpl'),),
+                PAGES=(),
+                TRANSLATIONS={'en': '', 'es': './es'},
+                TRANSLATIONS_PATTERN='{path}.{lang}.{ext}',
+                COMPILERS={'html': ('.html',)},
+                CACHE_FOLDER=os.path.join(self.tmpdir, 'cache'),
+                SCAN_POSTS_CACHE=False)
+            self.site.init_plugins()
+            self.site.scan_posts()
+        self.senders = []
+        self.deltas = []
+        signal('scanned').connect(self.receiver, sender=self.site)
+
+    def tearDown(self):
+        signal('scanned').disconnect(self.receiver, sender=self.site)
+        shutil.rmtree(self.tmpdir)
+
+    def receiver(self, sender, delta=None, **kwargs):
+        self.senders.append(sender)
+        self.deltas.append(delta)
+
+    def write(self, path, title, day, tags=''):
+        slug = os.path.basename(path).split('.')[0]
+        with io.open(os.path.join(self.tmpdir, path), 'w', encoding='utf-8') as outf:
+            outf.write(POST.format(title=title, slug=slug, day=day, tags=tags))
+
+    def rescan(self, *paths):
+        with cd(self.tmpdir):
+            self.site.scan_posts(changed=paths)
+        self.assertEqual(self.senders, [self.site])
+        delta = self.deltas.pop()
+        del self.senders[:]
+        return delta
+
+    def sources(self):
+        return [post.source_path for post in self.site.timeline]
+
+    def test_add_post(self):
+        self.write('posts/c.html', 'C', 3, 'python')
+        delta = self.rescan('posts/c.html')
+        self.assertEqual([p.source_path for p in delta['added']], ['posts/c.html'])
+        self.assertEqual(delta['removed'], [])
+        self.assertEqual(self.sources(), ['posts/c.html', 'posts/b.html', 'posts/a.html'])
+        self.assertEqual(sorted(p.source_path for p in self.site.posts_per_tag['python']), ['posts/a.html', 'posts/c.html'])
+
+    def test_edit_post(self):
+        self.write('posts/b.html', 'B edited', 2, 'python')
+        delta = self.rescan('posts/b.html')
+        self.assertEqual([p.source_path for p in delta['removed']], ['posts/b.html'])
+        self.assertEqual([p.title() for p in delta['added']], ['B edited'])
+        self.assertEqual(self.sources(), ['posts/b.html', 'posts/a.html'])
+        self.assertNotIn('nikola', self.site.posts_per_tag)
+        self.assertEqual(len(self.site.posts_per_tag['python']), 2)
+
+    def test_delete_post(self):
+        os.remove(os.path.join(self.tmpdir, 'posts/b.html'))
+        delta = self.rescan('posts/b.html')
+        self.assertEqual([p.source_path for p in delta['removed']], ['posts/b.html'])
+        self.assertEqual(delta['added'], [])
+        self.assertEqual(self.sources(), ['posts/a.html'])
+
+    def test_delete_translation(self):
+        self.assertEqual(sorted(self.site.timeline[1].translated_to), ['en', 'es'])
+        os.remove(os.path.join(self.tmpdir, 'posts/a.es.html'))
+        delta = self.rescan('posts/a.es.html')
+        self.assertEqual([p.source_path for p in delta['added']], ['posts/a.html'])
+        self.assertEqual(self.sources(), ['posts/b.html', 'posts/a.html'])
+        self.assertEqual(sorted(self.site.timeline[1].translated_to), ['en'])
+
+    def test_delete_meta(self):
+        self.write('posts/c.html', 'C', 3)
+        with io.open(os.path.join(self.tmpdir, 'posts/c.meta'), 'w', encoding='utf-8') as outf:
+            outf.write('C meta\nc\n2016-01-03 00:00:00 UTC\n')
+        self.rescan('posts/c.html', 'posts/c.meta')
+        self.assertEqual(self.site.timeline[0].title(), 'C meta')
+        os.remove(os.path.join(self.tmpdir, 'posts/c.meta'))
+        delta = self.rescan('posts/c.meta')
+        self.assertEqual([p.title() for p in delta['added']], ['C'])
+        self.assertEqual(self.sources(), ['posts/c.html', 'posts/b.html', 'posts/a.html'])
+
+    def test_full_scan_has_no_delta(self):
+        with cd(self.tmpdir):
+            self.site.scan_posts(really=True)
+        self.assertEqual(self.senders, [self.site])
+        self.assertEqual(self.deltas, [None])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, absolute_import
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+from nikola.plugins.compile import rest
+from nikola.plugins.compile.rest import get_rest_context, rst2html
+from nikola.utils import get_logger, STDERR_HANDLER
+
+# Like CompileRest
+SETTINGS = {'initial_header_level': 1, 'record_dependencies': True, 'stylesheet_path': None,
+            'link_stylesheet': True, 'syntax_highlight': 'short'}
+DOCUMENT = '''Introduction.
+
+Section
+=======
+
+Text with a footnote [#]_ and a `link`_.
+
+.. _link: http://example.com/
+
+.. [#] Footnote
+'''
+
+
+class RestContextTest(unittest.TestCase):
+    """reST documents share their docutils setup, but nothing else."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.logger = get_logger('test_rest_context', STDERR_HANDLER)
+        self.contexts = mock.patch.object(rest, '_contexts', {}).start()
+
+    def tearDown(self):
+        mock.patch.stopall()
+        shutil.rmtree(self.tmpdir)
+
+    def compile(self, source, source_path='doc.rst', **kwargs):
+        output, error_level, deps = rst2html(source, source_path=source_path, settings_overrides=SETTINGS,
+                                             logger=self.logger, transforms=[], **kwargs)
+        return output, error_level, deps.list
+
+    def compile_alone(self, source):
+        """Compile a document with its own docutils setup."""
+        with mock.patch.object(rest, 'get_rest_context', return_value=None):
+            return self.compile(source)
+
+    def test_shared_context(self):
+        context = get_rest_context(settings_overrides=SETTINGS)
+        self.assertIs(get_rest_context(settings_overrides=dict(SETTINGS)), context)
+        self.assertIsNot(get_rest_context(settings_overrides={'initial_header_level': 2}), context)
+        self.compile(DOCUMENT)
+        self.assertEqual(len(self.contexts), 2)
+
+    def test_context_in_use(self):
+        context = get_rest_context(settings_overrides=SETTINGS)
+        context.busy = True
+        self.assertIsNone(get_rest_context(settings_overrides=SETTINGS))
+        # Documents compiled meanwhile get their own setup
+        self.assertEqual(self.compile(DOCUMENT), self.compile_alone(DOCUMENT))
+
+    def test_same_as_own_setup(self):
+        shared = self.compile(DOCUMENT)
+        self.assertEqual(len(self.contexts), 1)
+        self.assertEqual(shared, self.compile_alone(DOCUMENT))
+        self.assertLess(shared[1], 2)  # No warnings
+
+    def test_documents_are_independent(self):
+        include = os.path.join(self.tmpdir, 'included.rst')
+        with io.open(include, 'w', encoding='utf-8') as outf:
+            outf.write('Included text.\n')
+        first, _, first_deps = self.compile(DOCUMENT + '\n.. include:: {0}\n'.format(include), 'first.rst')
+        second, _, second_deps = self.compile(DOCUMENT, 'second.rst')
+        # Ids and footnote numbers start again
+        self.assertEqual(first.replace('<p>Included text.</p>\n', ''), second)
+        self.assertIn('id="section"', second)
+        self.assertNotIn('section-1', second)
+        # Dependencies are recorded for each document (relative to the
+        # working directory with recent docutils)
+        self.assertEqual([os.path.abspath(dep) for dep in first_deps], [os.path.abspath(include)])
+        self.assertEqual(second_deps, [])
+
+    def test_settings_are_copied(self):
+        context = get_rest_context(settings_overrides=SETTINGS)
+        first = context.publish(DOCUMENT, 'first.rst', None, None,
+                                {'logger': self.logger, 'source': 'first.rst', 'add_ln': 0})
+        second = context.publish(DOCUMENT, 'second.rst', None, None,
+                                 {'logger': self.logger, 'source': 'second.rst', 'add_ln': 0})
+        self.assertIsNot(first.settings, second.settings)
+        self.assertEqual(first.settings._nikola_source_path, 'first.rst')
+        self.assertEqual(second.settings._nikola_source_path, 'second.rst')
+        self.assertFalse(hasattr(context.settings, '_nikola_source_path'))
+        self.assertIsNot(first.settings.record_dependencies, context.settings.record_dependencies)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,17 +7,24 @@ import sys
 
 
 from collections import defaultdict
+from datetime import datetime
 from io import StringIO
+import io
 import os
 import re
+import shutil
+import tempfile
 import unittest
 
 import dateutil.tz
+from feedgen.entry import FeedEntry
+from feedgen.feed import FeedGenerator
 from lxml import etree
 import mock
 
 from .base import LocaleSupportInTesting
 import nikola
+from nikola.feedutil import FeedUtil
 
 fake_conf = defaultdict(str)
 fake_conf['TIMEZONE'] = 'UTC'
@@ -152,5 +159,76 @@ class RSSFeedTest(unittest.TestCase):
 
         self.assertTrue(xmlschema.validate(document))
 
+
+class StreamedFeedTest(unittest.TestCase):
+    """Feeds written entry by entry are the same as feedgen's whole feeds."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.feedutil = FeedUtil(mock.Mock())
+        self.updated = datetime(2016, 1, 1, tzinfo=dateutil.tz.tzutc())
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def feed(self):
+        fg = FeedGenerator()
+        fg.load_extension('dc')
+        fg.id('urn:uuid:feed')
+        fg.title('Feed')
+        fg.updated(self.updated)
+        fg.link(href='http://some.blog/', rel='alternate')
+        fg.description('Description')
+        return fg
+
+    def entry(self, i):
+        fe = FeedEntry()
+        fe.load_extension('dc')
+        fe.id('urn:uuid:{0}'.format(i))
+        fe.title('Entry {0} & more'.format(i))
+        fe.updated(self.updated)
+        fe.link(href='http://some.blog/{0}.html'.format(i))
+        fe.description('<p>Text {0}</p>'.format(i))
+        fe.content('<p>Text {0}</p>'.format(i), type='CDATA')
+        fe.dc.dc_creator('Nikola Tesla')
+        return fe
+
+    def write(self, renderer, fg, entries):
+        output_path = os.path.join(self.tmpdir, 'feed.xml')
+        renderer(fg, output_path, '/feed.xml', '/feed.xsl', entries)
+        with io.open(output_path, encoding='utf-8') as inf:
+            return inf.read()
+
+    def expected(self, feed):
+        feed = feed.decode('utf-8') if isinstance(feed, bytes) else feed
+        return (nikola.feedutil.xml_dec_line + nikola.feedutil.xsl_line.format('/feed.xsl') +
+                nikola.feedutil.xml_dec_re.sub('', feed))
+
+    def test_same_as_whole_feed(self):
+        for kind, renderer in (('atom', self.feedutil.atom_renderer),
+                               ('rss', self.feedutil.rss_renderer)):
+            full, empty = self.feed(), self.feed()
+            entries = {}
+            for i in range(3):
+                fe = self.entry(i)
+                full.add_entry(fe)
+                entries['urn:uuid:{0}'.format(i)] = (getattr(fe, kind + '_entry')(), {})
+            whole = getattr(full, kind + '_str')(pretty=True)
+            # In the order feedgen writes them
+            ids = [element.text for element in etree.fromstring(whole).iter()
+                   if element.text in entries and element.tag.endswith(('id', 'guid'))]
+            self.assertEqual(len(ids), 3)
+            streamed = [entries[entry_id] for entry_id in ids]
+            self.assertEqual(self.write(renderer, empty, streamed), self.expected(whole), kind)
+            # Serializations are kept for the next feed
+            self.assertEqual(self.write(renderer, empty, streamed), self.expected(whole), kind)
+            self.assertTrue(all(serialized for _, serialized in streamed))
+
+    def test_empty_feed(self):
+        fg = self.feed()
+        self.assertEqual(self.write(self.feedutil.atom_renderer, fg, []), self.expected(fg.atom_str(pretty=True)))
+        self.assertEqual(self.write(self.feedutil.rss_renderer, fg, []), self.expected(fg.rss_str(pretty=True)))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -40,12 +40,14 @@ import tempfile
 
 import docutils
 from lxml import html
+import mock
 import pytest
 import unittest
 
 import nikola.plugins.compile.rest
 from nikola.plugins.compile.rest import gist
 from nikola.plugins.compile.rest import vimeo
+from nikola.gist_cache import GistFetchException
 import nikola.plugins.compile.rest.listing
 from nikola.plugins.compile.rest.doc import Plugin as DocPlugin
 from nikola.utils import _reload
@@ -178,6 +180,20 @@ class GistIntegrationTestCase(ReSTExtensionTestCase):
         self.assertHTMLContains('pre', text=text)
 
 
+class GistFetchErrorTestCase(ReSTExtensionTestCase):
+    """ A gist that cannot be fetched is only embedded, with a warning """
+
+    sample = '.. gist:: fake_id3'
+
+    def test_gist_fetch_error(self):
+        error = GistFetchException('https://gist.githubusercontent.com/raw/fake_id3', 404)
+        with mock.patch('nikola.gist_cache.GistCache.get', side_effect=error):
+            self.basic_test()
+        self.assertHTMLContains("script", attributes={"src": 'https://gist.github.com/fake_id3.js'})
+        self.assertIn('<!-- WARNING: Received a 404 response from Gist URL', self.html)
+        self.assertRaises(Exception, self.assertHTMLContains, "pre")
+
+
 class SlidesTestCase(ReSTExtensionTestCase):
     """ Slides test case """
 
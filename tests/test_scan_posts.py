@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, absolute_import
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+from nikola.nikola import Nikola
+from nikola.post import Post
+
+from .base import cd
+
+POST = '''<!--
+.. title: {title}
+.. slug: {slug}
+.. date: 2016-01-{day:02d} 00:00:00 UTC
+-->
+<p>Text</p>
+'''
+
+
+class ScanPostsCacheTest(unittest.TestCase):
+    """Post metadata is cached between runs, and read in worker processes."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.tmpdir, 'posts'))
+        for day, slug in enumerate('abcd', 1):
+            self.write('posts/{0}.html'.format(slug), slug.upper(), day)
+        self.read_metadata = mock.patch.object(Post, '_read_metadata', autospec=True,
+                                               side_effect=Post._read_metadata).start()
+
+    def tearDown(self):
+        mock.patch.stopall()
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, path, title, day):
+        slug = os.path.basename(path).split('.')[0]
+        with io.open(os.path.join(self.tmpdir, path), 'w', encoding='utf-8') as outf:
+            outf.write(POST.format(title=title, slug=slug, day=day))
+
+    def scan(self, **config):
+        config.setdefault('SCAN_POSTS_CACHE', True)
+        with cd(self.tmpdir):
+            site = Nikola(
+                POSTS=(('posts/*.html', 'posts', 'post.tmpl'),),
+                PAGES=(),
+                COMPILERS={'html': ('.html',)},
+                CACHE_FOLDER=os.path.join(self.tmpdir, 'cache'),
+                **config)
+            site.init_plugins()
+            self.read_metadata.reset_mock()
+            site.scan_posts()
+        return sorted((post.source_path, post.title()) for post in site.timeline)
+
+    def read(self):
+        return sorted(call[0][0].source_path for call in self.read_metadata.call_args_list)
+
+    def test_cache_hits(self):
+        posts = self.scan()
+        self.assertEqual(len(self.read()), 4)
+        self.assertEqual(os.listdir(os.path.join(self.tmpdir, 'cache')), ['scan_posts.json'])
+        self.assertEqual(self.scan(), posts)
+        self.assertEqual(self.read(), [])
+
+    def test_changed_file(self):
+        self.scan()
+        self.write('posts/b.html', 'B edited', 2)
+        os.utime(os.path.join(self.tmpdir, 'posts/b.html'), (0, 0))
+        self.assertIn(('posts/b.html', 'B edited'), self.scan())
+        self.assertEqual(self.read(), ['posts/b.html'])
+
+    def test_changed_config(self):
+        self.scan()
+        self.scan(UNSLUGIFY_TITLES=True)
+        self.assertEqual(len(self.read()), 4)
+        self.scan(UNSLUGIFY_TITLES=True)
+        self.assertEqual(self.read(), [])
+
+    def test_changed_compiler_config(self):
+        with mock.patch('nikola.plugin_categories.PageCompiler.config_dependencies', ['old']):
+            self.scan()
+            self.scan()
+            self.assertEqual(self.read(), [])
+        with mock.patch('nikola.plugin_categories.PageCompiler.config_dependencies', ['new']):
+            self.scan()
+            self.assertEqual(len(self.read()), 4)
+
+    @unittest.skipIf(os.name != 'posix', 'Metadata is read in worker processes on POSIX only')
+    def test_processes(self):
+        serial = self.scan(SCAN_POSTS_CACHE=False)
+        # Read in forked workers, not in this process
+        self.assertEqual(self.scan(SCAN_POSTS_CACHE=False, SCAN_POSTS_PROCESSES=2), serial)
+        self.assertEqual(self.read(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
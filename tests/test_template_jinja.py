@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, absolute_import
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+from nikola.plugins.template import jinja
+from nikola.plugins.template.jinja import JinjaTemplates, jinja2
+
+BASE = '<html>{% block content %}{% endblock %}</html>'
+INDEX = ('{% extends "base.tmpl" %}{% import "macros.tmpl" as macros %}'
+         '{% block content %}{{ macros.hello() }}{% include "footer.tmpl" %}'
+         '{% include name %}{% endblock %}')
+TEMPLATES = {
+    'base.tmpl': BASE,
+    'index.tmpl': INDEX,
+    'macros.tmpl': '{% macro hello() %}Hello{% endmacro %}',
+    'footer.tmpl': 'Footer',
+    'broken.tmpl': '{% block %}',
+}
+
+
+@unittest.skipIf(jinja2 is None, 'Jinja2 is not installed')
+class JinjaTemplatesTest(unittest.TestCase):
+    """Template dependencies and compiled templates are kept between runs."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.templates = os.path.join(self.tmpdir, 'templates')
+        self.cache_folder = os.path.join(self.tmpdir, 'cache')
+        os.mkdir(self.templates)
+        for name, text in TEMPLATES.items():
+            with io.open(os.path.join(self.templates, name), 'w', encoding='utf-8') as outf:
+                outf.write(text)
+
+    def tearDown(self):
+        JinjaTemplates.dependency_cache = {}
+        shutil.rmtree(self.tmpdir)
+
+    def startup(self, precompile=False):
+        """Set up the templates like a new nikola process."""
+        JinjaTemplates.dependency_cache = {}
+        templates = JinjaTemplates()
+        templates.set_directories([self.templates], self.cache_folder)
+        site = mock.Mock()
+        site.config = {'TEMPLATE_FILTERS': {}, 'JINJA_PRECOMPILE_TEMPLATES': precompile}
+        templates.set_site(site)
+        return templates
+
+    def test_referenced_templates(self):
+        templates = self.startup()
+        self.assertEqual(sorted(templates.referenced_templates(INDEX), key=str),
+                         sorted(['base.tmpl', 'macros.tmpl', 'footer.tmpl', None], key=str))
+        self.assertEqual(templates.referenced_templates(BASE), [])
+
+    def test_template_deps(self):
+        templates = self.startup()
+        self.assertEqual(templates.template_deps('index.tmpl'),
+                         [os.path.join(self.templates, name)
+                          for name in ('index.tmpl', 'base.tmpl', 'macros.tmpl', 'footer.tmpl')])
+        # Found again from deps.json, without parsing the templates
+        with mock.patch.object(jinja2.Environment, 'parse') as parse:
+            self.assertEqual(self.startup().template_deps('index.tmpl'),
+                             templates.template_deps('index.tmpl'))
+            self.assertFalse(parse.called)
+
+    def test_bytecode_cache(self):
+        templates = self.startup()
+        self.assertEqual(templates.render_template('index.tmpl', None, {'name': 'macros.tmpl'}),
+                         '<html>HelloFooter</html>')
+        with mock.patch.object(jinja2.Environment, 'compile') as compile:
+            templates = self.startup()
+            self.assertEqual(templates.render_template('index.tmpl', None, {'name': 'macros.tmpl'}),
+                             '<html>HelloFooter</html>')
+            self.assertFalse(compile.called)
+        # Each theme chain has its own cache
+        self.assertEqual(len(os.listdir(os.path.join(self.cache_folder, '.jinja.tmp'))), 1)
+
+    def test_precompile(self):
+        with mock.patch.object(jinja, 'LOGGER') as logger:
+            templates = self.startup(precompile=True)
+        self.assertEqual(logger.debug.call_count, 1)
+        self.assertIn('broken.tmpl', logger.debug.call_args[0][0])
+        with mock.patch.object(jinja2.Environment, 'compile') as compile:
+            templates.lookup.get_template('index.tmpl')
+            self.assertFalse(compile.called)
+
+
+if __name__ == '__main__':
+    unittest.main()
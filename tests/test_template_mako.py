@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, absolute_import
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+from mako import lexer
+
+from nikola.plugins.template.mako import MakoTemplates
+
+BASE = '<html><%block name="content"></%block></html>'
+INDEX = '<%inherit file="base.tmpl"/><%block name="content">{0}</%block>'
+
+
+class MakoStartupTest(unittest.TestCase):
+    """Compiled templates and their dependencies are kept between runs."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.templates = os.path.join(self.tmpdir, 'templates')
+        self.cache_folder = os.path.join(self.tmpdir, 'cache')
+        os.mkdir(self.templates)
+        self.write('base.tmpl', BASE)
+        self.write('index.tmpl', INDEX.format('Index'))
+
+    def tearDown(self):
+        MakoTemplates.cache = {}
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, name, text):
+        with io.open(os.path.join(self.templates, name), 'w', encoding='utf-8') as outf:
+            outf.write(text)
+
+    def startup(self):
+        """Load the templates like a new nikola process."""
+        MakoTemplates.cache = {}
+        templates = MakoTemplates()
+        templates.set_directories([self.templates], self.cache_folder)
+        deps = templates.template_deps('index.tmpl')
+        self.assertEqual(deps, [os.path.join(self.templates, name) for name in ('index.tmpl', 'base.tmpl')])
+        return templates.render_template('index.tmpl', None, {})
+
+    def modules(self):
+        modules = []
+        for root, _, names in os.walk(os.path.join(self.cache_folder, '.mako.tmp')):
+            modules.extend(os.path.join(root, name) for name in names if name.endswith('.py'))
+        return sorted(modules)
+
+    def test_warm_startup(self):
+        self.assertEqual(self.startup(), '<html>Index</html>')
+        modules = self.modules()
+        self.assertEqual(len(modules), 2)
+        mtimes = [os.stat(path).st_mtime for path in modules]
+        with mock.patch.object(lexer.Lexer, 'parse') as parse:
+            self.assertEqual(self.startup(), '<html>Index</html>')
+            self.assertFalse(parse.called)
+        self.assertEqual(self.modules(), modules)
+        self.assertEqual([os.stat(path).st_mtime for path in modules], mtimes)
+
+    def test_changed_template(self):
+        self.startup()
+        old_modules = self.modules()
+        # Modules being written by other processes
+        writing = [os.path.join(os.path.dirname(path), 'tmpwriting') for path in old_modules]
+        for path in writing:
+            open(path, 'w').close()
+        self.write('index.tmpl', INDEX.format('Edited'))
+        self.assertEqual(self.startup(), '<html>Edited</html>')
+        # The module of base.tmpl is kept, the old one of index.tmpl is gone
+        modules = self.modules()
+        self.assertEqual(len(modules), 2)
+        self.assertEqual(len(set(modules) & set(old_modules)), 1)
+        self.assertTrue(all(os.path.exists(path) for path in writing))
+
+
+if __name__ == '__main__':
+    unittest.main()
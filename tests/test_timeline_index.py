@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, absolute_import
+
+import datetime
+import unittest
+
+from nikola.timeline_index import PostListQuery, TimelineIndex
+
+
+class IndexedPost(object):
+    """The attributes of a post that the timeline index uses."""
+
+    def __init__(self, day, tags=(), category='', author='Alice', translated_to=('en',),
+                 use_in_feeds=True, is_post=True):
+        self.slug = 'post-{0}'.format(day)
+        self.date = datetime.datetime(2016, 1 + day // 28, 1 + day % 28)
+        self._tags = list(tags)
+        self._category = category
+        self._author = author
+        self.translated_to = set(translated_to)
+        self.use_in_feeds = use_in_feeds
+        self.is_post = is_post
+
+    @property
+    def alltags(self):
+        return self._tags
+
+    def tags_for_language(self, lang):
+        return self._tags
+
+    def meta(self, key, lang=None):
+        return {'category': self._category, 'slug': self.slug}[key]
+
+    def author(self, lang=None):
+        return self._author
+
+    def section_slug(self, lang=None):
+        return self._category.split('/')[0].lower() or 'uncategorized'
+
+
+class IndexedSite(object):
+    def __init__(self, timeline):
+        self.timeline = sorted(timeline, key=lambda p: p.date, reverse=True)
+        self.config = {'TRANSLATIONS': {'en': '', 'es': './es'}, 'DEFAULT_LANG': 'en'}
+
+    def parse_category_name(self, name):
+        return name.split('/') if name else []
+
+    def category_path_to_category_name(self, path):
+        return '/'.join(path)
+
+
+class TimelineIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.posts = [
+            IndexedPost(0, tags=['Python'], category='Code/Python'),
+            IndexedPost(10, tags=['python', 'nikola'], category='Code', translated_to=('en', 'es')),
+            IndexedPost(40, tags=['Python'], author='Bob'),
+            IndexedPost(50, tags=['Python'], use_in_feeds=False),
+            IndexedPost(60, tags=['Python'], use_in_feeds=False, is_post=False),
+        ]
+        self.index = TimelineIndex(IndexedSite(self.posts))
+
+    def test_views(self):
+        p = self.posts
+        self.assertEqual(list(self.index.view('posts')), [p[2], p[1], p[0]])
+        self.assertEqual(list(self.index.view('timeline')), [p[4], p[3], p[2], p[1], p[0]])
+        self.assertEqual(list(self.index.view('tag', 'Python')), [p[2], p[0]])
+        self.assertEqual(list(self.index.view('category', 'Code')), [p[1], p[0]])
+        self.assertEqual(list(self.index.view('category', 'Code/Python')), [p[0]])
+        self.assertEqual(list(self.index.view('author', 'Alice')), [p[3], p[1], p[0]])
+        self.assertEqual(list(self.index.view('year', '2016')), [p[2], p[1], p[0]])
+        self.assertEqual(list(self.index.view('month', '2016/02')), [p[2]])
+        self.assertEqual(list(self.index.view('section', 'code', 'en')), [p[1], p[0]])
+        self.assertEqual(list(self.index.view('lang_tag', 'python', 'en')), [p[4], p[3], p[2], p[1], p[0]])
+        self.assertEqual(list(self.index.view('tag', 'Missing')), [])
+        self.assertEqual(sorted(self.index.keys('month')), ['2016/01', '2016/02'])
+
+    def test_languages(self):
+        p = self.posts
+        self.assertEqual(list(self.index.view('posts', None, 'es')), [p[1]])
+        self.assertEqual(list(self.index.view('posts', None, 'es', False)), [p[2], p[1], p[0]])
+        self.assertEqual(sorted(self.index.keys('tag', 'es')), ['nikola', 'python'])
+        self.assertEqual(sorted(self.index.keys('tag', 'es', False)), ['Python', 'nikola', 'python'])
+
+    def test_pages(self):
+        view = self.index.view('timeline')
+        self.assertEqual(view.num_pages(2), 3)
+        self.assertEqual(view.page(1, 2), [self.posts[2], self.posts[1]])
+        self.assertEqual(view.page(2, 2), [self.posts[0]])
+        self.assertEqual(view[1:3], [self.posts[3], self.posts[2]])
+
+    def test_post_list(self):
+        p = self.posts
+
+        def query(show_all=False, categories=(), tags=(), slugs=(), start=None, stop=None, reverse=False):
+            return PostListQuery(show_all, categories, tags, 'en', slugs, None, 'en', start, stop, reverse)
+
+        self.assertEqual(self.index.post_list(query()), (p[2], p[1], p[0]))
+        self.assertEqual(self.index.post_list(query(True, tags=('python',))), (p[4], p[3], p[2], p[1], p[0]))
+        self.assertEqual(self.index.post_list(query(categories=('code',), tags=('nikola', 'python'))), (p[1],))
+        self.assertEqual(self.index.post_list(query(start=1, reverse=True)), (p[1], p[2]))
+        self.assertEqual(self.index.post_list(query(slugs=('post-0', 'post-40'), stop=2)), (p[2],))
+        q = query(tags=('python',), start=-2)
+        self.assertIs(self.index.post_list(q), self.index.post_list(PostListQuery.from_dependency(q.dependency())))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, absolute_import
+
+import unittest
+
+from nikola.nikola import Nikola
+
+# Pages in the same directory, and a page elsewhere
+SOURCES = ['/posts/a.html', '/posts/b.html', '/posts/a.html?page=2', '/posts/', '/pages/c/index.html',
+           '/pages/c/', '/index.html']
+LINKS = ['/posts/a.html', '/posts/b.html', 'a.html', './a.html', 'a.html?page=2', 'b.html', '', '?page=3',
+         ';params', '#top', '/posts/a.html#top', '/posts/', '.', '..', '/pages/c/', 'index.html',
+         'http://example.com/x', 'mailto:x@example.com']
+
+
+class UrlReplacerTest(unittest.TestCase):
+    """Memoized url_replacer results are the same as computed ones."""
+
+    def setUp(self):
+        self.site = Nikola(BASE_URL='http://example.com/blog/')
+
+    def test_examples(self):
+        self.assertEqual(self.site.url_replacer('/posts/a.html', '/posts/a.html'), '#')
+        self.assertEqual(self.site.url_replacer('/posts/b.html', '/posts/a.html'), 'a.html')
+        self.assertEqual(self.site.url_replacer('/posts/b.html', '/posts/b.html'), '#')
+        self.assertEqual(self.site.url_replacer('/posts/a.html', '?page=3'), 'a.html?page=3')
+        self.assertEqual(self.site.url_replacer('/posts/b.html', '?page=3'), 'b.html?page=3')
+        self.assertEqual(self.site.url_replacer('/posts/a.html', '#top'), '#top')
+        self.assertEqual(self.site.url_replacer('/posts/b.html', '/posts/a.html#top'), 'a.html#top')
+        self.assertEqual(self.site.url_replacer('/posts/a.html', '/posts/a.html#top'), 'a.html#top')
+
+    def test_same_as_computed(self):
+        cases = [(src, dst, url_type) for url_type in ('rel_path', 'full_path', 'absolute')
+                 for src in SOURCES for dst in LINKS]
+        expected = []
+        for src, dst, url_type in cases:
+            self.site._clear_url_caches()
+            expected.append(self.site.url_replacer(src, dst, 'en', url_type))
+        # Whichever page of a folder fills the cache first
+        for order in (1, -1):
+            self.site._clear_url_caches()
+            for _ in range(2):
+                for case, result in list(zip(cases, expected))[::order]:
+                    self.assertEqual(self.site.url_replacer(case[0], case[1], 'en', case[2]), result, case)
+            info = self.site.url_replacer_cache_info()
+            self.assertEqual(info['misses'], info['size'])
+            self.assertGreater(info['hits'], len(cases))
+
+    def test_cache_info(self):
+        self.site._clear_url_caches()
+        for dst in LINKS:
+            self.site.url_replacer('/posts/a.html', dst)
+        self.site.url_replacer('/posts/a.html', LINKS[0])
+        info = self.site.url_replacer_cache_info()
+        self.assertEqual(info['hits'], 1)
+        self.assertEqual(info['misses'], len(LINKS))
+        self.assertEqual(info['size'], len(LINKS))
+
+    def test_shared_by_folder(self):
+        self.site._clear_url_caches()
+        # Links to other files are shared by the pages of a folder
+        self.assertEqual(self.site.url_replacer('/posts/a.html', '/pages/c/'), '../pages/c/')
+        self.assertEqual(self.site.url_replacer('/posts/b.html', '/pages/c/'), '../pages/c/')
+        self.assertEqual(self.site.url_replacer_cache_info()['hits'], 1)
+        # but not links to the page itself
+        self.assertEqual(self.site.url_replacer('/posts/a.html', '?page=3'), 'a.html?page=3')
+        self.assertEqual(self.site.url_replacer('/posts/b.html', '?page=3'), 'b.html?page=3')
+        self.assertEqual(self.site.url_replacer('/posts/b.html', 'a.html'), 'a.html')
+        self.assertEqual(self.site.url_replacer('/posts/a.html', 'a.html'), '#')
+        self.assertEqual(self.site.url_replacer('/posts/a.html', '.'), '.')
+        self.assertEqual(self.site.url_replacer('/posts/', '.'), '#')
+        self.assertEqual(self.site.url_replacer_cache_info()['hits'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
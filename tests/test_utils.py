@@ -331,5 +331,277 @@ def test_get_metadata_from_file():
     assert 'title' in g(["",".. title: FooBar"])
     assert 'title' in g([".. foo: bar","","FooBar", "------"])
 
+
+def test_get_metadata_from_file_reads_header_only():
+    from nikola.post import _get_metadata_from_file
+
+    def lines():
+        yield ".. title: FooBar\n"
+        yield ".. slug: foo\n"
+        yield "\n"
+        raise AssertionError("The post content was read")
+
+    assert _get_metadata_from_file(lines()) == {'title': 'FooBar', 'slug': 'foo'}
+
+
+def test_apply_filters_passes_filters_to_render_action():
+    from nikola.filters import apply_to_html_tree, apply_to_text_file
+    from nikola.utils import apply_filters
+
+    def render_template(template_name, output_name, context, page_filters=None):
+        pass
+
+    def add_class(doc):
+        doc.body.set('class', 'filtered')
+
+    def command(fname):
+        pass
+
+    tree_filter = apply_to_html_tree(add_class)
+    text_filter = apply_to_text_file(lambda data: data.upper())
+
+    def render_task(target='output/index.html', actions=()):
+        return {
+            'targets': [target],
+            'actions': list(actions) + [(render_template, ['index.tmpl', target, {}])],
+        }
+
+    # Filters that run in memory, in their order
+    task = apply_filters(render_task(), {'.html': [text_filter, tree_filter]})
+    assert len(task['actions']) == 1
+    assert task['actions'][0][1][3] == [text_filter, tree_filter]
+
+    # Filters after one that needs the file stay after it
+    task = apply_filters(render_task(), {'.html': [tree_filter, command, text_filter]})
+    assert task['actions'][0][1][3] == [tree_filter]
+    assert task['actions'][1][1] == ([command, text_filter], 'output/index.html')
+
+    task = apply_filters(render_task(), {'.html': [command, tree_filter]})
+    assert len(task['actions'][0][1]) == 3
+    assert task['actions'][1][1] == ([command, tree_filter], 'output/index.html')
+
+    # Only for the action writing the target last
+    task = render_task()
+    task['actions'].append((command, []))
+    task = apply_filters(task, {'.html': [tree_filter]})
+    assert len(task['actions'][0][1]) == 3
+    assert task['actions'][2][1] == ([tree_filter], 'output/index.html')
+
+    task = {
+        'targets': ['output/copied.html'],
+        'actions': [],
+    }
+    task = apply_filters(task, {'.html': [tree_filter]})
+    assert len(task['actions']) == 1
+
+
+def test_config_changed_digest_with_shared_values():
+    import hashlib
+    import json
+    from nikola.utils import config_changed, config_json_memo, CustomEncoder
+    shared = {'BLOG_TITLE': 'Nikola', 'hooks': [1, 2, {'set': set([3, 1])}]}
+    configs = ({'global': shared, 'title': 'a', 'number': 1},
+               {'global': shared, 'title': 'b', 'hooks': shared['hooks']},
+               {'global': shared, 'title': 'b', 'hooks': shared['hooks']})
+    with config_json_memo():
+        checks = [config_changed(config) for config in configs]
+        # Digests are computed at the end of the block
+        shared['hooks'].append('b')
+    for config, check in zip(configs, checks):
+        expected = hashlib.md5(json.dumps(config, cls=CustomEncoder, sort_keys=True).encode('utf-8')).hexdigest()
+        assert check._calc_digest() == expected
+
+
+def test_config_changed_digest_after_shared_value_changes():
+    import hashlib
+    import json
+    from nikola.utils import config_changed, config_json_memo, CustomEncoder
+
+    def digests(config):
+        expected = hashlib.md5(json.dumps(config, cls=CustomEncoder, sort_keys=True).encode('utf-8')).hexdigest()
+        with config_json_memo():
+            check = config_changed(config)
+        return check._calc_digest(), expected
+
+    shared = {'BLOG_TITLE': 'Nikola', 'hooks': ['a']}
+    config = {'global': shared, 'title': 'a'}
+    for i in range(2):
+        digest, expected = digests(config)
+        assert digest == expected
+    # Tasks are generated again (like in nikola auto) after the change
+    shared['hooks'].append('b')
+    digest, expected = digests(config)
+    assert digest == expected
+
+
+FILTER_CALLS = []
+
+
+def upper_filter(data):
+    FILTER_CALLS.append('upper')
+    return data.upper()
+
+
+def exclaim_filter(data):
+    FILTER_CALLS.append('exclaim')
+    return data + b'!'
+
+
+def file_filter(fname):
+    FILTER_CALLS.append('file')
+    with open(fname, 'ab') as outf:
+        outf.write(b'?')
+
+
+def test_apply_filter_chain_in_memory_with_cache():
+    import shutil
+    import tempfile
+    from nikola import filters
+    from nikola.filters import apply_filter_chain, apply_to_binary_file, apply_to_text_file
+
+    chain = [apply_to_text_file(upper_filter), apply_to_binary_file(exclaim_filter), file_filter, apply_to_text_file(upper_filter)]
+    tmpdir = tempfile.mkdtemp()
+    try:
+        filters.FILTER_CACHE_FOLDER = os.path.join(tmpdir, 'cache')
+        for name in ('a.txt', 'b.txt'):
+            target = os.path.join(tmpdir, name)
+            with open(target, 'wb') as outf:
+                outf.write('caf\u00e9\n'.encode('utf-8'))
+            apply_filter_chain(chain, target)
+            with open(target, 'rb') as inf:
+                assert inf.read() == 'CAF\u00c9\n!?'.encode('utf-8')
+        # b.txt has the same contents as a.txt, so it was not filtered again
+        assert FILTER_CALLS == ['upper', 'exclaim', 'file', 'upper']
+
+        # Filters are told apart by their code
+        for suffix_filter, expected in ((lambda data: data + b'.', b'?.'), (lambda data: data + b',', b'?,')):
+            with open(target, 'wb') as outf:
+                outf.write(b'?')
+            apply_filter_chain([apply_to_binary_file(suffix_filter)], target)
+            with open(target, 'rb') as inf:
+                assert inf.read() == expected
+    finally:
+        filters.FILTER_CACHE_FOLDER = None
+        shutil.rmtree(tmpdir)
+
+
+def test_minify():
+    import shutil
+    import tempfile
+    from nikola import filters
+    if filters.rcssmin_module is None or filters.rjsmin_module is None:
+        return  # rcssmin and rjsmin are optional
+
+    sources = {
+        'a.css': '/*! License */\nbody {\n    color: red;  /* comment */\n}\n',
+        'b.css': '/*! License */\nbody {\n    color: red;  /* comment */\n}\n',
+        'c.js': '/*! License */\nfunction f(a, b) {\n    // comment\n    return a + b;\n}\n',
+    }
+    tmpdir = tempfile.mkdtemp()
+    try:
+        results = {}
+        for name, text in sources.items():
+            fname = os.path.join(tmpdir, name)
+            with open(fname, 'wb') as outf:
+                outf.write(text.encode('utf-8'))
+            filter_ = filters.rcssmin if name.endswith('.css') else filters.rjsmin
+            filters.apply_filter_chain([filter_], fname)
+            with open(fname, 'rb') as inf:
+                results[name] = inf.read().decode('utf-8')
+        assert results['a.css'] == results['b.css'] == '/*! License */body{color:red}'
+        assert results['c.js'] == '/*! License */function f(a,b){return a+b;}'
+    finally:
+        shutil.rmtree(tmpdir)
+
+    # The least recently used results are forgotten
+    with mock.patch.object(filters._minified, 'size', 2):
+        filters._minified.clear()
+        filters.minify('css', 'a {}')
+        filters.minify('css', 'b {}')
+        filters.minify('css', 'a {}')
+        filters.minify('css', 'c {}')
+        assert filters._minified.values() == ['a{}', 'c{}']
+        filters._minified.clear()
+
+
+def test_hyphenate():
+    from nikola import post
+    if post.pyphen is None:
+        return  # pyphen is optional
+
+    dom = lxml.html.fragment_fromstring(
+        '<div><ul><li>International <p>internationalization</p></li></ul>'
+        '<pre><span>internationalization</span></pre>'
+        '<p>internationalization <code>internationalization</code> <span>internationalization</span></p></div>', 'body')
+    post.hyphenate(dom, 'en')
+    hyphenated = 'in\u00adter\u00adna\u00adtion\u00adal\u00adiz\u00ada\u00adtion'
+    # Nested elements are hyphenated once
+    assert dom.xpath('//li')[0].text.strip() == 'In\u00adter\u00adna\u00adtion\u00adal'
+    assert dom.xpath('//li/p')[0].text == hyphenated
+    assert dom.xpath('//pre/span')[0].text == 'internationalization'
+    assert dom.xpath('//div/p')[0].text.strip() == 'internationalization'
+    assert dom.xpath('//code')[0].text == 'internationalization'
+    assert dom.xpath('//div/p/span')[0].text == hyphenated
+    assert post.get_hyphenator('en') is post.get_hyphenator('en')
+
+
+
+def test_write_atomically():
+    import shutil
+    import tempfile
+    from nikola.utils import write_atomically
+    tmpdir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmpdir, 'cache', 'index.json')
+        write_atomically(path, '{"caf\u00e9": 1}')
+        with open(path, 'rb') as inf:
+            assert inf.read() == '{"caf\u00e9": 1}'.encode('utf-8')
+        write_atomically(path, b'{}')
+        with open(path, 'rb') as inf:
+            assert inf.read() == b'{}'
+        # No temporary file is left behind, even on errors
+        with mock.patch('os.fdopen', side_effect=IOError):
+            try:
+                write_atomically(path, b'[]')
+            except IOError:
+                pass
+        assert os.listdir(os.path.dirname(path)) == ['index.json']
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+def test_lru_cache():
+    from nikola.utils import LRUCache
+    cache = LRUCache(2)
+    cache['a'] = 1
+    cache['b'] = 2
+    assert cache.get('a') == 1
+    cache['c'] = 3
+    # b was used less recently than a
+    assert 'b' not in cache
+    assert cache.get('b', 'missing') == 'missing'
+    assert cache.values() == [1, 3]
+    cache.size = 1
+    cache['d'] = 4
+    assert cache.values() == [4]
+    cache.size = 0
+    cache['e'] = 5
+    assert len(cache) == 0
+
+
+def test_fork_pool():
+    from nikola.utils import fork_pool
+    assert fork_pool(1) is None
+    with mock.patch('os.name', 'nt'):
+        assert fork_pool(4) is None
+    if os.name == 'posix':
+        pool = fork_pool(2)
+        try:
+            assert pool.map(abs, [-1, -2, 3]) == [1, 2, 3]
+        finally:
+            pool.close()
+            pool.join()
+
+
 if __name__ == '__main__':
     unittest.main()